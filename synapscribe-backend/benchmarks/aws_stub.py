@@ -0,0 +1,139 @@
+"""
+Local S3 and DynamoDB stand-in for benchmarks (moto server)
+AgentCore reaches it through AWS_ENDPOINT_URL; buckets, tables and fixtures are seeded here
+"""
+
+import io
+import json
+import logging
+import math
+import struct
+import wave
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+REGION = "us-east-1"
+CREDENTIALS = {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing", "AWS_DEFAULT_REGION": REGION}
+
+
+class AWSStub:
+    """
+    moto's threaded server with the SynapScribe bucket, sessions and turns tables
+
+    Requires `pip install "moto[server]"`. Everything lives in memory and
+    disappears with the process.
+    """
+
+    def __init__(self, host: str, port: int, bucket: str, table: str, turns_table: str):
+        self.host = host
+        self.port = port
+        self.bucket = bucket
+        self.table = table
+        self.turns_table = turns_table
+        self._server = None
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        try:
+            from moto.server import ThreadedMotoServer
+        except ImportError:
+            raise RuntimeError('The AWS stand-in needs moto: pip install "moto[server]"')
+
+        self._server = ThreadedMotoServer(ip_address=self.host, port=self.port, verbose=False)
+        self._server.start()
+        logger.info(f"S3/DynamoDB stand-in listening on {self.endpoint_url}")
+
+        self.s3 = self._client("s3")
+        self.dynamodb = self._client("dynamodb")
+        self.s3.create_bucket(Bucket=self.bucket)
+        # Same key schemas as template.yaml
+        self.dynamodb.create_table(
+            TableName=self.table,
+            AttributeDefinitions=[{"AttributeName": "sessionId", "AttributeType": "S"}],
+            KeySchema=[{"AttributeName": "sessionId", "KeyType": "HASH"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        self.dynamodb.create_table(
+            TableName=self.turns_table,
+            AttributeDefinitions=[
+                {"AttributeName": "sessionId", "AttributeType": "S"},
+                {"AttributeName": "turn", "AttributeType": "N"}
+            ],
+            KeySchema=[
+                {"AttributeName": "sessionId", "KeyType": "HASH"},
+                {"AttributeName": "turn", "KeyType": "RANGE"}
+            ],
+            BillingMode="PAY_PER_REQUEST"
+        )
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+    def seed_lecture(self, lecture_id: str, segments: int = 60, words_per_segment: int = 40):
+        """
+        A lecture whose transcript is ready, as left by the lecture pipeline
+
+        Questions then use the text prefix, so no lecture audio is needed.
+        """
+        transcript = {
+            "version": 1,
+            "lectureId": lecture_id,
+            "duration": segments * 20.0,
+            "segments": [
+                {
+                    "start": i * 20.0,
+                    "end": (i + 1) * 20.0,
+                    "text": " ".join(f"topic{(i * 7 + j) % 97}" for j in range(words_per_segment))
+                }
+                for i in range(segments)
+            ]
+        }
+        transcript_key = f"transcripts/{lecture_id}.json"
+        self.s3.put_object(Bucket=self.bucket, Key=transcript_key, Body=json.dumps(transcript).encode("utf-8"))
+        self.dynamodb.put_item(
+            TableName=self.table,
+            Item={
+                "sessionId": {"S": f"lecture-{lecture_id}"},
+                "lectureId": {"S": lecture_id},
+                "status": {"S": "ready"},
+                "s3Key": {"S": f"lectures/{lecture_id}.mp3"},
+                "transcriptStatus": {"S": "ready"},
+                "transcriptKey": {"S": transcript_key},
+                "transcriptSegments": {"N": str(segments)}
+            }
+        )
+
+    def seed_query_audio(self, key: str, seconds: float = 4.0) -> str:
+        """A short 16 kHz WAV "question": a tone between stretches of silence"""
+        rate = 16000
+        samples = []
+        for i in range(int(rate * seconds)):
+            t = i / rate
+            voiced = seconds * 0.2 <= t < seconds * 0.8
+            samples.append(int(6000 * math.sin(2 * math.pi * 220 * t)) if voiced else 0)
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=buffer.getvalue())
+        return key
+
+    def _client(self, service: str):
+        return boto3.client(
+            service,
+            endpoint_url=self.endpoint_url,
+            region_name=REGION,
+            aws_access_key_id=CREDENTIALS["AWS_ACCESS_KEY_ID"],
+            aws_secret_access_key=CREDENTIALS["AWS_SECRET_ACCESS_KEY"]
+        )
@@ -0,0 +1,164 @@
+"""
+Concurrent load client for AgentCore /invoke and /end_session
+Records per-stage timings of each streamed answer
+"""
+
+import asyncio
+import json
+import logging
+import statistics
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+async def run_query(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    session_id: str,
+    lecture_id: str,
+    s3_key: str
+) -> Dict:
+    """
+    One /invoke query with NDJSON framing
+
+    Stage boundaries follow the Phase 0 e2e benchmark: "asr" ends at the
+    query_text message, "query" at the last answer_text, "tts" at
+    audio_complete. With streaming Q&A the stages overlap, so first_audio
+    (time to the first audio chunk) is recorded as well.
+    """
+    payload = {
+        "type": "query",
+        "sessionId": session_id,
+        "lectureId": lecture_id,
+        "s3Key": s3_key,
+        "connectionId": f"bench-{session_id}"
+    }
+    started = time.monotonic()
+    marks = {}
+    audio_bytes = 0
+    error = None
+
+    async with session.post(f"{base_url}/invoke", json=payload) as response:
+        if response.status != 200:
+            return {"ok": False, "status": response.status, "error": await response.text()}
+
+        async for raw_line in response.content:
+            line = raw_line.strip()
+            if not line:
+                continue
+            message = json.loads(line)
+            elapsed = time.monotonic() - started
+            kind = message.get("type")
+            if kind == "query_text":
+                marks["asr"] = elapsed
+            elif kind == "answer_text":
+                marks["answer"] = elapsed
+            elif kind == "audio_chunk":
+                marks.setdefault("first_audio", elapsed)
+                audio_bytes += len(message.get("data", "")) * 3 // 4
+            elif kind == "audio_complete":
+                marks["complete"] = elapsed
+            elif kind == "error":
+                error = message.get("message")
+
+    total = time.monotonic() - started
+    if error or "complete" not in marks:
+        return {"ok": False, "status": 200, "error": error or "stream ended early", "total": total}
+
+    asr = marks["asr"]
+    answer = marks.get("answer", asr)
+    return {
+        "ok": True,
+        "asr": asr,
+        "query": answer - asr,
+        "tts": marks["complete"] - answer,
+        "first_audio": marks.get("first_audio", total),
+        "total": total,
+        "audio_bytes": audio_bytes
+    }
+
+
+async def run_end_session(session: aiohttp.ClientSession, base_url: str, session_id: str, lecture_id: str) -> Dict:
+    started = time.monotonic()
+    async with session.post(
+        f"{base_url}/end_session",
+        json={"sessionId": session_id, "lectureId": lecture_id}
+    ) as response:
+        body = await response.text()
+    elapsed = time.monotonic() - started
+    if response.status != 200:
+        return {"ok": False, "status": response.status, "error": body, "total": elapsed}
+    return {"ok": True, "total": elapsed}
+
+
+async def run_load(
+    base_url: str,
+    lecture_id: str,
+    s3_key: str,
+    sessions: int,
+    turns: int,
+    concurrency: int,
+    end_sessions: bool = True
+) -> Dict:
+    """
+    Drive `sessions` conversations of `turns` queries each, at most
+    `concurrency` sessions at a time, then end every session
+
+    Turns within a session run in order (a user waits for the answer
+    before asking again); sessions run concurrently.
+    """
+    limit = asyncio.Semaphore(concurrency)
+    queries: List[Dict] = []
+    ends: List[Dict] = []
+
+    async def conversation(client: aiohttp.ClientSession):
+        session_id = f"bench-{uuid.uuid4()}"
+        async with limit:
+            for _ in range(turns):
+                queries.append(await run_query(client, base_url, session_id, lecture_id, s3_key))
+            if end_sessions:
+                ends.append(await run_end_session(client, base_url, session_id, lecture_id))
+
+    timeout = aiohttp.ClientTimeout(total=300)
+    connector = aiohttp.TCPConnector(limit=max(concurrency * 2, 10))
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(conversation(client) for _ in range(sessions)))
+        total_time = time.monotonic() - started
+
+    completed = [result for result in queries if result["ok"]]
+    failed = [result for result in queries if not result["ok"]]
+    for result in failed[:3]:
+        logger.warning(f"Query failed: {result.get('status')} {result.get('error')}")
+
+    return {
+        "total_time_sec": total_time,
+        "queries": queries,
+        "completed": len(completed),
+        "failed": len(failed),
+        "end_sessions": ends
+    }
+
+
+def summarize(values: List[float]) -> Optional[Dict]:
+    """mean/median/min/max as in the Phase 0 statistics blocks"""
+    if not values:
+        return None
+    return {
+        "mean": statistics.mean(values),
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values)
+    }
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
@@ -0,0 +1,158 @@
+"""
+In-memory Redis stand-in (RESP2) for benchmarks
+Implements the commands RedisSessionStore uses, so SESSION_BACKEND=redis runs without a server
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RedisStub:
+    """Strings and lists with TTLs, MULTI/EXEC, one keyspace per process"""
+
+    def __init__(self):
+        self._data: Dict[bytes, object] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self.commands = 0
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        logger.info(f"Redis stand-in listening on redis://{host}:{port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await asyncio.gather(*self._clients.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients[writer] = asyncio.current_task()
+        queued: Optional[List[List[bytes]]] = None
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                name = command[0].upper()
+                self.commands += 1
+
+                if name == b"MULTI":
+                    queued = []
+                    writer.write(b"+OK\r\n")
+                elif name == b"EXEC":
+                    replies = [self._execute(queued_command) for queued_command in queued or []]
+                    queued = None
+                    writer.write(b"*%d\r\n" % len(replies) + b"".join(replies))
+                elif name == b"DISCARD":
+                    queued = None
+                    writer.write(b"+OK\r\n")
+                elif queued is not None:
+                    queued.append(command)
+                    writer.write(b"+QUEUED\r\n")
+                else:
+                    writer.write(self._execute(command))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # Inline command (e.g. redis-cli PING)
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _execute(self, command: List[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        try:
+            handler = getattr(self, f"_cmd_{name.decode('ascii').lower()}", None)
+            if handler is None:
+                return b"-ERR unknown command '%s'\r\n" % name
+            return handler(*args)
+        except (TypeError, ValueError) as e:
+            return f"-ERR {e}\r\n".encode("utf-8")
+
+    def _get(self, key: bytes):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _cmd_ping(self, *args) -> bytes:
+        return b"+PONG\r\n"
+
+    def _cmd_auth(self, *args) -> bytes:
+        return b"+OK\r\n"
+
+    def _cmd_select(self, db) -> bytes:
+        return b"+OK\r\n"
+
+    def _cmd_get(self, key) -> bytes:
+        value = self._get(key)
+        if isinstance(value, list):
+            return b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n"
+        return self._bulk(value)
+
+    def _cmd_set(self, key, value) -> bytes:
+        self._data[key] = value
+        self._expires.pop(key, None)
+        return b"+OK\r\n"
+
+    def _cmd_incr(self, key) -> bytes:
+        value = int(self._get(key) or b"0") + 1
+        self._data[key] = str(value).encode("ascii")
+        return b":%d\r\n" % value
+
+    def _cmd_del(self, *keys) -> bytes:
+        removed = 0
+        for key in keys:
+            if self._get(key) is not None:
+                removed += 1
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return b":%d\r\n" % removed
+
+    def _cmd_rpush(self, key, *values) -> bytes:
+        items = self._get(key)
+        if items is None:
+            items = self._data[key] = []
+        items.extend(values)
+        return b":%d\r\n" % len(items)
+
+    def _cmd_lrange(self, key, start, stop) -> bytes:
+        items = self._get(key) or []
+        start, stop = int(start), int(stop)
+        stop = len(items) if stop == -1 else stop + 1
+        selected = items[start:stop]
+        return b"*%d\r\n" % len(selected) + b"".join(self._bulk(item) for item in selected)
+
+    def _cmd_expire(self, key, seconds) -> bytes:
+        if self._get(key) is None:
+            return b":0\r\n"
+        self._expires[key] = time.monotonic() + int(seconds)
+        return b":1\r\n"
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+SynapScribe orchestration benchmark
+Runs AgentCore against local vLLM/gTTS/AWS stand-ins and writes Phase 0 style results
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, fields
+from datetime import datetime
+from typing import Dict, List
+
+import aiohttp
+
+from aws_stub import CREDENTIALS, AWSStub
+from load_client import percentile, run_load, run_query, summarize
+from redis_stub import RedisStub
+from stubs import GTTSStub, StubConfig, VLLMStub, start_app
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("benchmark")
+logging.getLogger("werkzeug").setLevel(logging.WARNING)  # moto request log
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENTCORE_DIR = os.path.join(BACKEND_DIR, "services", "agentcore")
+
+LECTURE_ID = "bench-lecture"
+QUERY_KEY = "queries/bench/query.wav"
+
+# (file, metric path, higher is better)
+REGRESSION_METRICS = [
+    ("e2e_qa_latency.json", ("statistics", "total", "mean"), False),
+    ("e2e_qa_latency.json", ("statistics", "first_audio", "mean"), False),
+    ("e2e_qa_latency.json", ("p95_total_sec",), False),
+    ("concurrent_throughput.json", ("concurrent", "throughput_rps"), True),
+    ("end_session_latency.json", ("statistics", "end_session", "mean"), False),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--vllm-port", type=int, default=18000)
+    parser.add_argument("--gtts-port", type=int, default=18001)
+    parser.add_argument("--aws-port", type=int, default=15000)
+    parser.add_argument("--agentcore-port", type=int, default=15001)
+    parser.add_argument("--redis-port", type=int, default=16379)
+    parser.add_argument("--workers", type=int, default=1, help="AgentCore uvicorn workers")
+    parser.add_argument("--session-backend", choices=("memory", "sqlite", "redis"), default="memory",
+                        help="AgentCore SESSION_BACKEND (redis uses the local stand-in)")
+    parser.add_argument("--sessions", type=int, default=16, help="Conversations in the load run")
+    parser.add_argument("--turns", type=int, default=3, help="Queries per conversation")
+    parser.add_argument("--concurrency", type=int, default=5, help="Concurrent conversations")
+    parser.add_argument("--output", default=os.path.join(BACKEND_DIR, "benchmarks", "results"))
+    parser.add_argument("--baseline", help="Directory of earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression before failing (0.2 = 20%%)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra AgentCore environment (repeatable)")
+    for field in fields(StubConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=field.default)
+    return parser.parse_args()
+
+
+def agentcore_env(args: argparse.Namespace, aws: AWSStub, work_dir: str) -> Dict[str, str]:
+    env = {
+        **os.environ,
+        **CREDENTIALS,
+        "AWS_ENDPOINT_URL": aws.endpoint_url,
+        "S3_BUCKET": aws.bucket,
+        "DYNAMODB_TABLE": aws.table,
+        "DYNAMODB_TURNS_TABLE": aws.turns_table,
+        "VLLM_ENDPOINT": f"http://{args.host}:{args.vllm_port}",
+        "GTTS_ENDPOINT": f"http://{args.host}:{args.gtts_port}",
+        "LECTURE_PIPELINE_ENABLED": "false",
+        "QUERY_AUDIO_PREPROCESS_ENABLED": "true" if shutil.which(os.getenv("FFMPEG_PATH", "ffmpeg")) else "false",
+        "LECTURE_CACHE_DIR": os.path.join(work_dir, "lectures"),
+        "LECTURE_INDEX_DIR": os.path.join(work_dir, "indexes"),
+        "LECTURE_PIPELINE_DIR": os.path.join(work_dir, "pipeline"),
+        "TTS_CACHE_DIR": os.path.join(work_dir, "tts"),
+        "METRICS_DIR": os.path.join(work_dir, "metrics"),
+        "SESSION_BACKEND": args.session_backend,
+        "SESSION_SQLITE_PATH": os.path.join(work_dir, "sessions.db"),
+        "SESSION_REDIS_URL": f"redis://{args.host}:{args.redis_port}/0",
+        "AGENTCORE_WORKERS": str(args.workers),
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+async def wait_for_ready(url: str, timeout: float = 60.0) -> Dict:
+    """Poll /ready until AgentCore has warmed up; returns the readiness report"""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{url}/ready") as response:
+                    if response.status == 200:
+                        return await response.json()
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"AgentCore did not become ready at {url}")
+            await asyncio.sleep(0.5)
+
+
+async def fetch_stats(url: str) -> Dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/stats") as response:
+            return await response.json()
+
+
+async def fetch_metrics(url: str) -> str:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/metrics") as response:
+            return await response.text() if response.status == 200 else ""
+
+
+def throughput(run: Dict) -> Dict:
+    totals = [result["total"] for result in run["queries"] if result["ok"]]
+    return {
+        "total_time_sec": run["total_time_sec"],
+        "throughput_rps": run["completed"] / run["total_time_sec"] if run["total_time_sec"] else 0.0,
+        "avg_latency_sec": sum(totals) / len(totals) if totals else None
+    }
+
+
+def write_json(directory: str, name: str, data):
+    with open(os.path.join(directory, name), "w") as f:
+        json.dump(data, f, indent=2)
+    logger.info(f"Wrote {os.path.join(directory, name)}")
+
+
+def compare(output: str, baseline: str, tolerance: float) -> List[str]:
+    """Metrics that regressed by more than tolerance against the baseline results"""
+    regressions = []
+    for name, path, higher_is_better in REGRESSION_METRICS:
+        try:
+            with open(os.path.join(baseline, name)) as f:
+                before = json.load(f)
+            with open(os.path.join(output, name)) as f:
+                after = json.load(f)
+            for key in path:
+                before, after = before[key], after[key]
+        except (OSError, KeyError, TypeError):
+            logger.warning(f"Skipping {name}:{'.'.join(path)} (missing in baseline or results)")
+            continue
+        if not before:
+            continue
+
+        change = (after - before) / before
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        logger.info(f"{name}:{'.'.join(path)} {before:.3f} -> {after:.3f} ({change:+.1%})")
+        if regressed:
+            regressions.append(f"{name}:{'.'.join(path)} {change:+.1%}")
+    return regressions
+
+
+async def benchmark(args: argparse.Namespace) -> int:
+    config = StubConfig(**{field.name: getattr(args, field.name) for field in fields(StubConfig)})
+    work_dir = tempfile.mkdtemp(prefix="synapscribe-bench-")
+    aws = AWSStub(args.host, args.aws_port, bucket="synapscribe-bench", table="SynapScribe-Sessions-bench",
+                  turns_table="SynapScribe-Turns-bench")
+    runners = []
+    redis = RedisStub()
+    agentcore = None
+    url = f"http://{args.host}:{args.agentcore_port}"
+
+    try:
+        aws.start()
+        aws.seed_lecture(LECTURE_ID)
+        aws.seed_query_audio(QUERY_KEY)
+
+        vllm, gtts = VLLMStub(config), GTTSStub(config)
+        runners.append(await start_app(vllm.app(), args.host, args.vllm_port))
+        runners.append(await start_app(gtts.app(), args.host, args.gtts_port))
+        if args.session_backend == "redis":
+            await redis.start(args.host, args.redis_port)
+
+        output = args.output
+        os.makedirs(output, exist_ok=True)
+
+        env = agentcore_env(args, aws, work_dir)
+        log_path = os.path.join(output, "agentcore.log")
+        with open(log_path, "w") as log:
+            agentcore = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app:app", "--host", args.host,
+                 "--port", str(args.agentcore_port), "--workers", str(args.workers), "--log-level", "warning"],
+                cwd=AGENTCORE_DIR,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT
+            )
+        logger.info(f"AgentCore started (log: {log_path})")
+        readiness = await wait_for_ready(url)
+        logger.info(f"AgentCore ready after {readiness.get('warmup_seconds', 0):.1f}s warmup")
+
+        # Warm up: lecture prefix, HTTP sessions, scheduler metrics
+        async with aiohttp.ClientSession() as session:
+            warmup = await run_query(session, url, "bench-warmup", LECTURE_ID, QUERY_KEY)
+        if not warmup["ok"]:
+            raise RuntimeError(f"Warm-up query failed: {warmup.get('error')}")
+
+        logger.info(f"Throughput: {args.concurrency} queries sequentially, then concurrently")
+        sequential = await run_load(url, LECTURE_ID, QUERY_KEY, args.concurrency, 1, 1, end_sessions=False)
+        concurrent = await run_load(url, LECTURE_ID, QUERY_KEY, args.concurrency, 1, args.concurrency,
+                                    end_sessions=False)
+
+        logger.info(f"Load: {args.sessions} sessions x {args.turns} turns, {args.concurrency} concurrent")
+        load = await run_load(url, LECTURE_ID, QUERY_KEY, args.sessions, args.turns, args.concurrency)
+        agentcore_stats = await fetch_stats(url)
+        agentcore_metrics = await fetch_metrics(url)
+
+        completed = [result for result in load["queries"] if result["ok"]]
+        ends = [result["total"] for result in load["end_sessions"] if result["ok"]]
+        environment = {
+            "stub_config": asdict(config),
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "session_backend": args.session_backend,
+            "query_audio_preprocess": env["QUERY_AUDIO_PREPROCESS_ENABLED"],
+            "timestamp": datetime.now().isoformat()
+        }
+
+        baseline_rate, concurrent_rate = throughput(sequential), throughput(concurrent)
+        concurrent_rate["speedup"] = (
+            baseline_rate["total_time_sec"] / concurrent_rate["total_time_sec"]
+            if concurrent_rate["total_time_sec"] else None
+        )
+        write_json(output, "concurrent_throughput.json", {
+            "num_concurrent": args.concurrency,
+            "baseline": baseline_rate,
+            "concurrent": concurrent_rate,
+            "gpu_memory_mb": None,
+            "endpoint": "agentcore_invoke",
+            "benchmark": environment
+        })
+
+        write_json(output, "e2e_qa_latency.json", {
+            "statistics": {
+                stage: summarize([result[stage] for result in completed])
+                for stage in ("asr", "query", "tts", "total", "first_audio")
+            },
+            "p95_total_sec": percentile([result["total"] for result in completed], 0.95),
+            "completed": load["completed"],
+            "failed": load["failed"],
+            "throughput_rps": throughput(load)["throughput_rps"],
+            "gpu_memory_mb": None,
+            "architecture": "AgentCore + stub vLLM (ASR + Q&A) + stub gTTS (TTS) + moto S3/DynamoDB",
+            "benchmark": environment
+        })
+
+        write_json(output, "end_session_latency.json", {
+            "statistics": {"end_session": summarize(ends)},
+            "completed": len(ends),
+            "failed": len(load["end_sessions"]) - len(ends),
+            "turns_per_session": args.turns,
+            "benchmark": environment
+        })
+
+        write_json(output, "agentcore_stats.json", agentcore_stats)
+        write_json(output, "agentcore_ready.json", readiness)
+        with open(os.path.join(output, "agentcore_metrics.txt"), "w") as f:
+            f.write(agentcore_metrics)
+
+        if load["failed"]:
+            logger.error(f"{load['failed']} of {len(load['queries'])} queries failed")
+            return 1
+
+        if args.baseline:
+            regressions = compare(output, args.baseline, args.tolerance)
+            if regressions:
+                logger.error(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+                return 1
+            logger.info("No regressions against baseline")
+        return 0
+
+    finally:
+        if agentcore is not None:
+            agentcore.terminate()
+            try:
+                agentcore.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                agentcore.kill()
+        for runner in runners:
+            await runner.cleanup()
+        await redis.stop()
+        aws.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(benchmark(parse_args())))
@@ -0,0 +1,177 @@
+"""
+Local stand-ins for the vLLM and gTTS services
+Same HTTP APIs as the real servers, with configurable latency and token rates
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Vocabulary for generated questions/answers; varied text keeps the
+# AgentCore answer and TTS caches from short-circuiting every request
+WORDS = (
+    "entropy energy galaxy cell protein market theorem proof lattice neuron "
+    "species climate orbit molecule algorithm network gradient vector signal "
+    "empire treaty revolution migration language ritual harvest river mountain"
+).split()
+
+
+@dataclass
+class StubConfig:
+    asr_latency: float = 0.3          # Seconds per transcription request
+    ttft: float = 0.15                # Seconds to first Q&A token
+    tokens_per_second: float = 60.0   # Q&A decode rate
+    answer_tokens: int = 120          # Q&A answer length (words)
+    prime_latency: float = 0.5        # Prefill of a max_tokens=1 request
+    tts_latency: float = 0.1          # Seconds to first TTS byte
+    tts_bytes_per_char: int = 200     # ~ 16 kbps MP3 at speaking rate
+    tts_chunk_bytes: int = 4096
+    tts_bytes_per_second: float = 2 * 1024 * 1024
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+class VLLMStub:
+    """OpenAI-compatible /v1/chat/completions plus the /metrics gauges AgentCore reads"""
+
+    def __init__(self, config: StubConfig, seed: int = 0):
+        self.config = config
+        self.rng = random.Random(seed)
+        self.running = 0
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_get("/metrics", self.metrics)
+        app.router.add_get("/health", self.health)
+        return app
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        self.running += 1
+        try:
+            if body.get("max_tokens") == 1:
+                await asyncio.sleep(self.config.prime_latency)
+                return self._completion(".")
+
+            if self._has_audio(body["messages"][-1]):
+                await asyncio.sleep(self.config.asr_latency)
+                return self._completion(f"Can you explain how {_sentence(self.rng, 8)[:-1]} works?")
+
+            if body.get("stream"):
+                return await self._stream(request)
+
+            await asyncio.sleep(self.config.ttft + self.config.answer_tokens / self.config.tokens_per_second)
+            return self._completion(self._answer())
+        finally:
+            self.running -= 1
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        text = (
+            "# TYPE vllm:num_requests_running gauge\n"
+            f"vllm:num_requests_running{{model_name=\"stub\"}} {self.running}\n"
+            "# TYPE vllm:num_requests_waiting gauge\n"
+            "vllm:num_requests_waiting{model_name=\"stub\"} 0\n"
+            "# TYPE vllm:kv_cache_usage_perc gauge\n"
+            f"vllm:kv_cache_usage_perc{{model_name=\"stub\"}} {min(1.0, self.running / 8):.3f}\n"
+        )
+        return web.Response(text=text)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "healthy"})
+
+    async def _stream(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        await asyncio.sleep(self.config.ttft)
+        interval = 1.0 / self.config.tokens_per_second
+        started = time.monotonic()
+        for i, word in enumerate(self._answer().split(" ")):
+            # Pace against the start time so sleep overhead does not accumulate
+            delay = started + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            delta = word if i == 0 else " " + word
+            chunk = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _answer(self) -> str:
+        sentences = []
+        remaining = self.config.answer_tokens
+        while remaining > 0:
+            words = min(remaining, self.rng.randint(8, 16))
+            sentences.append(_sentence(self.rng, words))
+            remaining -= words
+        return " ".join(sentences)
+
+    @staticmethod
+    def _has_audio(message: dict) -> bool:
+        content = message.get("content")
+        return isinstance(content, list) and any(part.get("type") == "audio_url" for part in content)
+
+    @staticmethod
+    def _completion(text: str) -> web.Response:
+        return web.json_response({
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]
+        })
+
+
+class GTTSStub:
+    """OpenAI-compatible /v1/audio/speech returning MP3-sized filler bytes"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/audio/speech", self.speech)
+        app.router.add_get("/health", self.health)
+        return app
+
+    async def speech(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        size = max(1, len(body.get("input", ""))) * self.config.tts_bytes_per_char
+
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+        await response.prepare(request)
+        await asyncio.sleep(self.config.tts_latency)
+
+        chunk = self.config.tts_chunk_bytes
+        frame = b"\xff\xfb" + b"\x00" * (chunk - 2)
+        for offset in range(0, size, chunk):
+            await response.write(frame[:min(chunk, size - offset)])
+            await asyncio.sleep(chunk / self.config.tts_bytes_per_second)
+
+        await response.write_eof()
+        return response
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "healthy"})
+
+
+async def start_app(app: web.Application, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Stub listening on http://{host}:{port}")
+    return runner
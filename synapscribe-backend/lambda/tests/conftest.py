@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Lambda modules read their configuration at import time
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("VLLM_ENDPOINT", "http://localhost:8000")
+os.environ.setdefault("DYNAMODB_TABLE", "SynapScribe-Sessions")
+os.environ.setdefault("API_GATEWAY_ENDPOINT", "example.execute-api.us-east-1.amazonaws.com/Prod")
+os.environ.setdefault("AGENTCORE_ENDPOINT", "http://localhost:5000")
+os.environ.setdefault("S3_BUCKET", "synapscribe-audio-test")
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for name in ("validate_lecture", "websocket_handler"):
+    sys.path.insert(0, os.path.join(LAMBDA_DIR, name))
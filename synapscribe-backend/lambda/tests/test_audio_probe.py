@@ -0,0 +1,53 @@
+import io
+import wave
+
+import pytest
+
+from audio_probe import ProbeError, probe_s3_audio
+
+
+class FakeS3:
+    """Serves ranged GETs from an in-memory object"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get_object(self, Bucket, Key, Range):
+        start, end = map(int, Range[len("bytes="):].split("-"))
+        return {"Body": io.BytesIO(self.data[start:end + 1])}
+
+
+def probe(data, ext):
+    return probe_s3_audio(FakeS3(data), "bucket", f"lectures/l1.{ext}", len(data), ext)
+
+
+def test_cbr_mp3_duration_comes_from_the_headers_alone():
+    frame = b"\xff\xfb\x90\x00" + bytes(413)  # MPEG-1 layer III, 128 kbps, 44.1 kHz
+    id3 = b"ID3\x03\x00\x00\x00\x00\x00\x10" + bytes(16)
+    data = id3 + frame * 6000  # ~2.6 MB, ~157 s
+
+    info = probe(data, "mp3")
+
+    assert info["codec"] == "mpeg-layer3"
+    assert info["sampleRate"] == 44100
+    assert info["duration"] == pytest.approx(len(frame) * 6000 * 8 / 128000)
+    assert info["bytesRead"] < 4 * 64 * 1024
+
+
+def test_wav_duration_and_format():
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(bytes(16000 * 2 * 3))
+
+    info = probe(buffer.getvalue(), "wav")
+
+    assert (info["codec"], info["sampleRate"], info["channels"]) == ("pcm", 16000, 1)
+    assert info["duration"] == pytest.approx(3.0)
+
+
+def test_unrecognized_audio_is_rejected():
+    with pytest.raises(ProbeError):
+        probe(b"not audio at all", "txt")
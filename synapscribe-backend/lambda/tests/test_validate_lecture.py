@@ -0,0 +1,36 @@
+import pytest
+
+import validate_lecture
+
+
+def audio_info(minutes: float):
+    duration = minutes * 60
+    return {"duration": duration, "tokensUsed": validate_lecture.estimate_audio_tokens(duration)}
+
+
+def test_lecture_within_the_audio_context_is_accepted():
+    validate_lecture.check_lecture_fits(audio_info(20))
+    assert not validate_lecture.exceeds_audio_context(audio_info(20))
+
+
+def test_long_lecture_is_rejected_without_retrieval(monkeypatch):
+    monkeypatch.setattr(validate_lecture, "LECTURE_RETRIEVAL_ENABLED", False)
+    with pytest.raises(ValueError):
+        validate_lecture.check_lecture_fits(audio_info(120))
+
+
+def test_two_hour_lecture_is_accepted_with_retrieval(monkeypatch):
+    monkeypatch.setattr(validate_lecture, "LECTURE_RETRIEVAL_ENABLED", True)
+    validate_lecture.check_lecture_fits(audio_info(120))
+    assert validate_lecture.exceeds_audio_context(audio_info(120))
+
+
+def test_retrieval_keeps_a_duration_cap(monkeypatch):
+    monkeypatch.setattr(validate_lecture, "LECTURE_RETRIEVAL_ENABLED", True)
+    with pytest.raises(ValueError):
+        validate_lecture.check_lecture_fits(audio_info(validate_lecture.MAX_RETRIEVAL_LECTURE_SECONDS / 60 + 1))
+
+
+def test_unknown_duration_is_accepted():
+    validate_lecture.check_lecture_fits(None)
+    validate_lecture.check_lecture_fits({"duration": None})
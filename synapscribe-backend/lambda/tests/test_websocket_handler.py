@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import websocket_handler
+
+
+class FakeResponse:
+    status_code = 202
+    text = ""
+
+
+def test_query_forwards_the_asr_stream(monkeypatch):
+    posted = []
+    monkeypatch.setattr(websocket_handler, "QUERY_DELIVERY_MODE", "push")
+    monkeypatch.setattr(websocket_handler.requests, "post", lambda url, json, timeout: posted.append(json) or FakeResponse())
+
+    result = websocket_handler.handle_query("c1", {"sessionId": "s1", "lectureId": "l1", "asrStreamId": "a1"})
+
+    assert result["statusCode"] == 200
+    assert posted[0]["asrStreamId"] == "a1"
+    assert "s3Key" not in posted[0]
+
+
+@pytest.mark.parametrize("body", [
+    {"sessionId": "s1", "lectureId": "l1"},
+    {"sessionId": "s1", "lectureId": "l1", "s3Key": "queries/s1/q.webm", "asrStreamId": "a1"}
+])
+def test_query_needs_exactly_one_audio_source(monkeypatch, body):
+    sent = []
+    monkeypatch.setattr(websocket_handler, "send_to_connection", lambda connection_id, message: sent.append(message))
+
+    result = websocket_handler.handle_query("c1", body)
+
+    assert result["statusCode"] == 400
+    assert sent[0]["type"] == "error"
+
+
+def frame(frame_type, payload):
+    return websocket_handler.FRAME_HEADER.pack(frame_type, len(payload)) + payload
+
+
+def test_frames_split_across_chunks_are_decoded():
+    data = (
+        frame(websocket_handler.FRAME_JSON, b'{"type": "query_text", "text": "Why?"}')
+        + frame(websocket_handler.FRAME_AUDIO, b"\x00\x01\x02")
+        + frame(websocket_handler.FRAME_AUDIO, b"\x03")
+    )
+    chunks = [data[i:i + 5] for i in range(0, len(data), 5)]
+
+    messages = list(websocket_handler.decode_frames(chunks))
+
+    assert messages[0] == {"type": "query_text", "text": "Why?"}
+    assert messages[1] == {"type": "audio_chunk", "data": "AAEC", "index": 0}
+    assert messages[2]["index"] == 1
+
+
+def send_all(monkeypatch, batch, count=5, linger=0.2):
+    posts = []
+    monkeypatch.setattr(websocket_handler, "PUSH_LINGER_SECONDS", linger)
+    monkeypatch.setattr(websocket_handler, "post_to_connection", lambda connection_id, data: posts.append(data) or True)
+    sender = websocket_handler.ConnectionSender("c1", batch=batch)
+    for index in range(count):
+        sender.send({"type": "answer_text", "text": str(index)})
+    sender.close()
+    return [json.loads(data) for data in posts]
+
+
+def test_messages_are_posted_one_by_one_by_default(monkeypatch):
+    posts = send_all(monkeypatch, batch=False)
+    assert [post["text"] for post in posts] == ["0", "1", "2", "3", "4"]
+
+
+def test_batching_client_gets_messages_in_order_in_envelopes(monkeypatch):
+    posts = send_all(monkeypatch, batch=True)
+    assert len(posts) < 5
+    messages = [message for post in posts for message in (post["messages"] if post["type"] == "batch" else [post])]
+    assert [message["text"] for message in messages] == ["0", "1", "2", "3", "4"]
+
+
+def test_sender_stops_once_the_connection_is_gone(monkeypatch):
+    monkeypatch.setattr(websocket_handler, "post_to_connection", lambda connection_id, data: False)
+    sender = websocket_handler.ConnectionSender("c1")
+    sender.send({"type": "answer_text", "text": "0"})
+    sender.close()
+    assert not sender.send({"type": "answer_text", "text": "1"})
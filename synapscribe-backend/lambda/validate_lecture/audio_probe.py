@@ -0,0 +1,500 @@
+# lambda/validate_lecture/audio_probe.py
+"""
+Header-only audio probing over S3 ranged GETs
+
+Reads just enough of a lecture file to learn its codec, duration, sample
+rate and channel count. Large payloads (MP3 frames, WAV data, MP4 mdat,
+Matroska clusters) are skipped, never downloaded.
+"""
+import struct
+
+# Ranged reads are rounded up to this size so small header reads share a GET
+READ_BLOCK_SIZE = 64 * 1024
+# Upper bound on a single header structure we are willing to read (MP4 moov)
+MAX_HEADER_BYTES = 8 * 1024 * 1024
+
+class ProbeError(ValueError):
+    """The file's headers could not be parsed"""
+
+class RangedReader:
+    """Random access to an S3 object through cached ranged GETs"""
+
+    def __init__(self, s3_client, bucket, key, size):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.requests = 0
+        self.bytes_read = 0
+        self._cache_start = 0
+        self._cache = b''
+
+    def read(self, offset, length):
+        """Return up to length bytes at offset (short at end of file)"""
+        if offset < 0 or offset >= self.size or length <= 0:
+            return b''
+        length = min(length, self.size - offset)
+
+        cache_end = self._cache_start + len(self._cache)
+        if self._cache_start <= offset and offset + length <= cache_end:
+            start = offset - self._cache_start
+            return self._cache[start:start + length]
+
+        fetch_length = min(max(length, READ_BLOCK_SIZE), self.size - offset)
+        response = self.s3_client.get_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Range=f"bytes={offset}-{offset + fetch_length - 1}"
+        )
+        data = response['Body'].read()
+        self.requests += 1
+        self.bytes_read += len(data)
+
+        self._cache_start = offset
+        self._cache = data
+        return data[:length]
+
+def probe_s3_audio(s3_client, bucket, key, size, ext):
+    """
+    Probe an S3 audio object
+
+    Returns {'format', 'codec', 'duration', 'sampleRate', 'channels',
+    'bytesRead'}; duration is None when the container does not record it.
+    Raises ProbeError if the headers cannot be parsed.
+    """
+    reader = RangedReader(s3_client, bucket, key, size)
+    info = probe(reader, ext)
+    info['bytesRead'] = reader.bytes_read
+    return info
+
+def probe(reader, ext):
+    """Probe by magic bytes, falling back to the extension's parser"""
+    head = reader.read(0, 12)
+    if len(head) < 12:
+        raise ProbeError("File too short")
+
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        parser = probe_wav
+    elif head[:4] == b'fLaC':
+        parser = probe_flac
+    elif head[:4] == b'OggS':
+        parser = probe_ogg
+    elif head[:4] == b'\x1a\x45\xdf\xa3':
+        parser = probe_matroska
+    elif head[4:8] == b'ftyp':
+        parser = probe_mp4
+    elif head[:3] == b'ID3' or (head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        parser = probe_mp3
+    else:
+        parser = {
+            'mp3': probe_mp3, 'wav': probe_wav, 'm4a': probe_mp4, 'mp4': probe_mp4,
+            'ogg': probe_ogg, 'flac': probe_flac, 'webm': probe_matroska
+        }.get(ext)
+        if parser is None:
+            raise ProbeError(f"Unrecognized audio format: {ext}")
+
+    return parser(reader)
+
+def _result(fmt, codec, duration, sample_rate, channels):
+    return {
+        'format': fmt,
+        'codec': codec,
+        'duration': duration,
+        'sampleRate': sample_rate,
+        'channels': channels
+    }
+
+# ---------------------------------------------------------------- MP3
+
+MP3_BITRATES = {
+    # (mpeg1, layer) -> kbps by index
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+def _parse_mp3_header(data, pos):
+    """Decode a 4-byte MPEG audio frame header, or None if invalid"""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+
+    version = (data[pos + 1] >> 3) & 0x03    # 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+    layer = 4 - ((data[pos + 1] >> 1) & 0x03)
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x03
+    padding = (data[pos + 2] >> 1) & 0x01
+    channel_mode = data[pos + 3] >> 6
+
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        frame_length = samples // 8 * bitrate // sample_rate + padding
+
+    return {
+        'mpeg1': mpeg1,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sampleRate': sample_rate,
+        'channels': 1 if channel_mode == 3 else 2,
+        'samples': samples,
+        'length': frame_length
+    }
+
+def probe_mp3(reader):
+    # Skip ID3v2 tags (possibly several, each with a syncsafe size)
+    offset = 0
+    while True:
+        tag = reader.read(offset, 10)
+        if len(tag) < 10 or tag[:3] != b'ID3':
+            break
+        size = (tag[6] << 21) | (tag[7] << 14) | (tag[8] << 7) | tag[9]
+        offset += 10 + size + (10 if tag[5] & 0x10 else 0)  # Footer flag
+
+    # First frame: a valid header followed by another valid header
+    data = reader.read(offset, READ_BLOCK_SIZE)
+    frame = None
+    for pos in range(len(data) - 4):
+        frame = _parse_mp3_header(data, pos)
+        if frame is None:
+            continue
+        following = reader.read(offset + pos + frame['length'], 4)
+        if _parse_mp3_header(following, 0) is not None:
+            break
+        frame = None
+    if frame is None:
+        raise ProbeError("No MPEG audio frames found")
+
+    first = offset + pos
+    frame_data = reader.read(first, min(frame['length'], 256))
+
+    # Xing/Info (VBR and LAME CBR) header: exact frame count
+    if frame['mpeg1']:
+        side_info = 17 if frame['channels'] == 1 else 32
+    else:
+        side_info = 9 if frame['channels'] == 1 else 17
+    xing = 4 + side_info
+    frames = None
+    if frame_data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack_from('>I', frame_data, xing + 4)[0]
+        if flags & 0x01:
+            frames = struct.unpack_from('>I', frame_data, xing + 8)[0]
+    elif frame_data[36:40] == b'VBRI':
+        frames = struct.unpack_from('>I', frame_data, 36 + 14)[0]
+
+    if frames:
+        duration = frames * frame['samples'] / frame['sampleRate']
+    else:
+        # CBR: audio bytes / byte rate, minus a trailing ID3v1 tag
+        audio_bytes = reader.size - first
+        if reader.read(reader.size - 128, 3) == b'TAG':
+            audio_bytes -= 128
+        duration = audio_bytes * 8 / frame['bitrate']
+
+    return _result('mp3', f"mpeg-layer{frame['layer']}", duration,
+                   frame['sampleRate'], frame['channels'])
+
+# ---------------------------------------------------------------- WAV
+
+def probe_wav(reader):
+    fmt = None
+    data_size = None
+    offset = 12
+
+    while offset + 8 <= reader.size and (fmt is None or data_size is None):
+        chunk_id, chunk_size = struct.unpack('<4sI', reader.read(offset, 8))
+        if chunk_id == b'fmt ':
+            fmt = reader.read(offset + 8, min(chunk_size, 40))
+        elif chunk_id == b'data':
+            # Streaming writers may leave the size unset
+            data_size = min(chunk_size, reader.size - offset - 8)
+        offset += 8 + chunk_size + (chunk_size & 1)  # Chunks are word aligned
+
+    if fmt is None or len(fmt) < 16:
+        raise ProbeError("WAV file has no fmt chunk")
+
+    audio_format, channels, sample_rate, byte_rate = struct.unpack_from('<HHII', fmt)
+    if data_size is None or not byte_rate:
+        raise ProbeError("WAV file has no data chunk")
+
+    codec = {1: 'pcm', 3: 'pcm-float', 6: 'alaw', 7: 'mulaw', 0xFFFE: 'extensible'}.get(
+        audio_format, f"wav-0x{audio_format:04x}")
+    return _result('wav', codec, data_size / byte_rate, sample_rate, channels)
+
+# ---------------------------------------------------------------- MP4 / M4A
+
+def _iter_boxes(data, start=0, end=None):
+    """Yield (type, payload_start, payload_end) for boxes in a buffer"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+def _find_box(data, path, start=0, end=None):
+    """Payload bounds of the first box along a path of box types"""
+    for box_type in path:
+        for found_type, payload_start, payload_end in _iter_boxes(data, start, end):
+            if found_type == box_type:
+                start, end = payload_start, payload_end
+                break
+        else:
+            return None
+    return start, end
+
+def _read_mdhd(data, start):
+    """(timescale, duration) from an mvhd/mdhd full box payload"""
+    if data[start] == 1:
+        return struct.unpack_from('>IQ', data, start + 20)
+    return struct.unpack_from('>II', data, start + 12)
+
+def probe_mp4(reader):
+    # Walk top-level box headers only; moov may follow a large mdat
+    offset = 0
+    moov = None
+    while offset + 8 <= reader.size:
+        header = reader.read(offset, 16)
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = reader.size - offset
+        if size < header_size:
+            break
+
+        if box_type == b'moov':
+            if size > MAX_HEADER_BYTES:
+                raise ProbeError(f"MP4 moov box too large ({size} bytes)")
+            moov = reader.read(offset + header_size, size - header_size)
+            break
+        offset += size
+
+    if moov is None:
+        raise ProbeError("MP4 file has no moov box")
+
+    duration = None
+    mvhd = _find_box(moov, [b'mvhd'])
+    if mvhd:
+        timescale, units = _read_mdhd(moov, mvhd[0])
+        if timescale:
+            duration = units / timescale
+
+    # First sound track: its media header and sample description
+    for box_type, trak_start, trak_end in _iter_boxes(moov):
+        if box_type != b'trak':
+            continue
+        mdia = _find_box(moov, [b'mdia'], trak_start, trak_end)
+        if mdia is None:
+            continue
+        hdlr = _find_box(moov, [b'hdlr'], *mdia)
+        if hdlr is None or moov[hdlr[0] + 8:hdlr[0] + 12] != b'soun':
+            continue
+
+        mdhd = _find_box(moov, [b'mdhd'], *mdia)
+        if mdhd:
+            timescale, units = _read_mdhd(moov, mdhd[0])
+            if timescale:
+                duration = units / timescale
+
+        stsd = _find_box(moov, [b'minf', b'stbl', b'stsd'], *mdia)
+        if stsd is None:
+            break
+        # Full box header (4) + entry count (4), then the first sample entry
+        entry = stsd[0] + 8
+        codec = moov[entry + 4:entry + 8].decode('latin-1')
+        channels, _ = struct.unpack_from('>HH', moov, entry + 8 + 16)
+        sample_rate = struct.unpack_from('>I', moov, entry + 8 + 24)[0] >> 16
+        return _result('mp4', codec, duration, sample_rate, channels)
+
+    raise ProbeError("MP4 file has no audio track")
+
+# ---------------------------------------------------------------- OGG
+
+def probe_ogg(reader):
+    page = reader.read(0, 282)  # Max page header (27 + 255 segments)
+    segments = page[26]
+    packet = reader.read(27 + segments, 64)
+
+    if packet[:8] == b'OpusHead':
+        codec = 'opus'
+        channels = packet[9]
+        pre_skip = struct.unpack_from('<H', packet, 10)[0]
+        sample_rate = struct.unpack_from('<I', packet, 12)[0] or 48000
+        granule_rate = 48000  # Opus granule positions are always 48 kHz
+    elif packet[:7] == b'\x01vorbis':
+        codec = 'vorbis'
+        channels = packet[11]
+        sample_rate = struct.unpack_from('<I', packet, 12)[0]
+        pre_skip = 0
+        granule_rate = sample_rate
+    elif packet[:5] == b'\x7fFLAC':
+        codec = 'flac'
+        info = packet[13 + 4 + 10:13 + 4 + 18]  # STREAMINFO after the mapping header
+        bits = int.from_bytes(info, 'big')
+        sample_rate = bits >> 44
+        channels = ((bits >> 41) & 0x07) + 1
+        pre_skip = 0
+        granule_rate = sample_rate
+    else:
+        raise ProbeError("Unsupported Ogg codec")
+
+    # Duration: granule position of the last page, found in the file tail
+    tail_start = max(reader.size - READ_BLOCK_SIZE, 0)
+    tail = reader.read(tail_start, reader.size - tail_start)
+    duration = None
+    last_page = tail.rfind(b'OggS')
+    if last_page != -1 and last_page + 14 <= len(tail) and granule_rate:
+        granule = struct.unpack_from('<q', tail, last_page + 6)[0]
+        if granule > 0:
+            duration = max(granule - pre_skip, 0) / granule_rate
+
+    return _result('ogg', codec, duration, sample_rate, channels)
+
+# ---------------------------------------------------------------- FLAC
+
+def probe_flac(reader):
+    block = reader.read(4, 4 + 34)
+    if len(block) < 38 or block[0] & 0x7F != 0:
+        raise ProbeError("FLAC file has no STREAMINFO block")
+
+    # STREAMINFO bytes 10-17: sample rate (20) | channels-1 (3) | bps-1 (5) | samples (36)
+    bits = int.from_bytes(block[4 + 10:4 + 18], 'big')
+    sample_rate = bits >> 44
+    channels = ((bits >> 41) & 0x07) + 1
+    total_samples = bits & 0xFFFFFFFFF
+    duration = total_samples / sample_rate if total_samples and sample_rate else None
+    return _result('flac', 'flac', duration, sample_rate, channels)
+
+# ---------------------------------------------------------------- WebM / Matroska
+
+EBML_SEGMENT = 0x18538067
+EBML_INFO = 0x1549A966
+EBML_TIMECODE_SCALE = 0x2AD7B1
+EBML_DURATION = 0x4489
+EBML_TRACKS = 0x1654AE6B
+EBML_TRACK_ENTRY = 0xAE
+EBML_TRACK_TYPE = 0x83
+EBML_CODEC_ID = 0x86
+EBML_AUDIO = 0xE1
+EBML_SAMPLING_FREQUENCY = 0xB5
+EBML_CHANNELS = 0x9F
+EBML_CLUSTER = 0x1F43B675
+
+def _read_vint(data, pos, keep_marker):
+    """Decode an EBML variable-length integer; returns (value, length, all_ones)"""
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8 or pos + length > len(data):
+        raise ProbeError("Invalid EBML data")
+
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    all_ones = value == (1 << (7 * length)) - 1 and not keep_marker
+    return value, length, all_ones
+
+def _iter_ebml(data, start, end):
+    """Yield (id, payload_start, payload_end) for EBML elements in a buffer"""
+    pos = start
+    while pos < end:
+        element_id, id_length, _ = _read_vint(data, pos, keep_marker=True)
+        size, size_length, unknown = _read_vint(data, pos + id_length, keep_marker=False)
+        payload = pos + id_length + size_length
+        payload_end = end if unknown else min(payload + size, end)
+        yield element_id, payload, payload_end
+        if unknown:
+            return
+        pos = payload + size
+
+def _ebml_uint(data, start, end):
+    return int.from_bytes(data[start:end], 'big')
+
+def _ebml_float(data, start, end):
+    if end - start == 4:
+        return struct.unpack_from('>f', data, start)[0]
+    if end - start == 8:
+        return struct.unpack_from('>d', data, start)[0]
+    return None
+
+def probe_matroska(reader):
+    # Info and Tracks precede the first Cluster; the header blocks hold them
+    data = reader.read(0, 4 * READ_BLOCK_SIZE)
+
+    segment = None
+    for element_id, start, end in _iter_ebml(data, 0, len(data)):
+        if element_id == EBML_SEGMENT:
+            segment = (start, end)
+            break
+    if segment is None:
+        raise ProbeError("Matroska file has no Segment")
+
+    timecode_scale = 1000000
+    raw_duration = None
+    codec = None
+    sample_rate = None
+    channels = None
+
+    try:
+        for element_id, start, end in _iter_ebml(data, *segment):
+            if element_id == EBML_CLUSTER:
+                break
+            if element_id == EBML_INFO:
+                for child_id, child_start, child_end in _iter_ebml(data, start, end):
+                    if child_id == EBML_TIMECODE_SCALE:
+                        timecode_scale = _ebml_uint(data, child_start, child_end)
+                    elif child_id == EBML_DURATION:
+                        raw_duration = _ebml_float(data, child_start, child_end)
+            elif element_id == EBML_TRACKS:
+                for entry_id, entry_start, entry_end in _iter_ebml(data, start, end):
+                    if entry_id != EBML_TRACK_ENTRY:
+                        continue
+                    track = {}
+                    for child_id, child_start, child_end in _iter_ebml(data, entry_start, entry_end):
+                        track[child_id] = (child_start, child_end)
+                    if EBML_TRACK_TYPE not in track or _ebml_uint(data, *track[EBML_TRACK_TYPE]) != 2:
+                        continue
+                    if EBML_CODEC_ID in track:
+                        codec = data[slice(*track[EBML_CODEC_ID])].decode('ascii', 'replace')
+                    if EBML_AUDIO in track:
+                        for child_id, child_start, child_end in _iter_ebml(data, *track[EBML_AUDIO]):
+                            if child_id == EBML_SAMPLING_FREQUENCY:
+                                sample_rate = int(_ebml_float(data, child_start, child_end) or 0)
+                            elif child_id == EBML_CHANNELS:
+                                channels = _ebml_uint(data, child_start, child_end)
+                    break
+    except (ProbeError, IndexError, struct.error):
+        if codec is None:
+            raise ProbeError("Matroska headers truncated")
+
+    if codec is None:
+        raise ProbeError("Matroska file has no audio track")
+
+    # MediaRecorder output usually omits Duration
+    duration = raw_duration * timecode_scale / 1e9 if raw_duration else None
+    return _result('webm', codec, duration, sample_rate, channels or 1)
@@ -2,8 +2,11 @@
 import json
 import boto3
 import os
+import struct
 import requests
 from datetime import datetime
+from decimal import Decimal
+from audio_probe import probe_s3_audio, ProbeError
 
 s3_client = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
@@ -12,15 +15,29 @@ api_gateway_client = None  # Initialized in handler
 VLLM_ENDPOINT = os.environ['VLLM_ENDPOINT']
 DYNAMODB_TABLE = os.environ['DYNAMODB_TABLE']
 API_GATEWAY_ENDPOINT = os.environ['API_GATEWAY_ENDPOINT']
+AGENTCORE_ENDPOINT = os.environ.get('AGENTCORE_ENDPOINT')
 
 SUPPORTED_FORMATS = ['mp3', 'wav', 'm4a', 'mp4', 'ogg', 'flac', 'webm']
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 
+# Lectures must fit Qwen's 16K context (about 25 minutes of audio)
+MAX_LECTURE_SECONDS = int(os.environ.get('MAX_LECTURE_SECONDS', '1500'))
+CONTEXT_TOKENS = int(os.environ.get('CONTEXT_TOKENS', '16384'))
+# Room left for the system prompt, history, question and answer
+CONTEXT_RESERVE_TOKENS = int(os.environ.get('CONTEXT_RESERVE_TOKENS', '1024'))
+AUDIO_TOKENS_PER_SECOND = float(os.environ.get('AUDIO_TOKENS_PER_SECOND', '10'))
+# With transcript retrieval, AgentCore answers from the indexed transcript, so
+# lectures longer than the context are accepted up to MAX_RETRIEVAL_LECTURE_SECONDS
+LECTURE_RETRIEVAL_ENABLED = os.environ.get('LECTURE_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+MAX_RETRIEVAL_LECTURE_SECONDS = int(os.environ.get('MAX_RETRIEVAL_LECTURE_SECONDS', '14400'))
+
 def lambda_handler(event, context):
     """
     Triggered automatically by S3 PutObject event
     """
     global api_gateway_client
+    audio_info = None
+    connection_id = None
     api_gateway_client = boto3.client(
         'apigatewaymanagementapi',
         endpoint_url=f"https://{API_GATEWAY_ENDPOINT}"
@@ -51,18 +68,34 @@ def lambda_handler(event, context):
         if ext not in SUPPORTED_FORMATS:
             raise ValueError(f"Unsupported format: {ext}")
 
-        # Step 3: Save metadata to DynamoDB (simplified - no audio analysis)
-        save_lecture_metadata(lecture_id, s3_key, file_size)
+        # Step 3: Probe audio headers (ranged reads) and reject lectures
+        # that cannot fit the context window
+        audio_info = probe_lecture(bucket, s3_key, file_size, ext)
+        check_lecture_fits(audio_info)
+
+        # Step 4: Save metadata to DynamoDB
+        save_lecture_metadata(lecture_id, s3_key, file_size, audio_info=audio_info)
 
-        # Step 4: Notify frontend via WebSocket
+        # Step 5: Notify frontend via WebSocket
         if connection_id:
-            notify_frontend(connection_id, {
+            message = {
                 'type': 'lecture_ready',
                 'lectureId': lecture_id,
                 'message': 'Lecture uploaded successfully! Ready for questions.',
                 's3Key': s3_key,
                 'fileSize': file_size
-            })
+            }
+            if audio_info and audio_info.get('duration') is not None:
+                message['duration'] = round(audio_info['duration'], 1)
+            notify_frontend(connection_id, message)
+
+        # Step 6: Warm the lecture context prefix in vLLM (lectures longer
+        # than the context are answered once their transcript exists)
+        if not exceeds_audio_context(audio_info):
+            prime_lecture_context(lecture_id, s3_key)
+
+        # Step 7: Transcribe the lecture offline (text context for later questions)
+        process_lecture(lecture_id, s3_key)
 
         print(f"Lecture {lecture_id} processed successfully")
         return {'statusCode': 200, 'body': 'Success'}
@@ -85,13 +118,61 @@ def lambda_handler(event, context):
             s3_key,
             file_size,
             status='failed',
-            error=error_msg
+            error=error_msg,
+            audio_info=audio_info
         )
 
         return {'statusCode': 500, 'body': error_msg}
 
+def probe_lecture(bucket, s3_key, file_size, ext):
+    """
+    Read duration, sample rate and channels from the container headers
+
+    Returns None if the headers cannot be parsed; the lecture is then
+    accepted on size and extension alone.
+    """
+    try:
+        audio_info = probe_s3_audio(s3_client, bucket, s3_key, file_size, ext)
+    except (ProbeError, struct.error, IndexError) as e:
+        print(f"Could not probe {s3_key}: {e}")
+        return None
+
+    duration = audio_info['duration']
+    if duration is not None:
+        audio_info['tokensUsed'] = estimate_audio_tokens(duration)
+    print(f"Probed {s3_key}: {audio_info}")
+    return audio_info
+
+def estimate_audio_tokens(duration):
+    """Approximate context tokens used by the lecture audio"""
+    return int(duration * AUDIO_TOKENS_PER_SECOND + 0.5)
+
+def exceeds_audio_context(audio_info):
+    """True if the lecture audio does not fit the context window"""
+    if not audio_info or audio_info.get('duration') is None:
+        return False
+    return audio_info['tokensUsed'] > CONTEXT_TOKENS - CONTEXT_RESERVE_TOKENS
+
+def check_lecture_fits(audio_info):
+    """Reject lectures that would overflow the context window (or, with retrieval, the duration cap)"""
+    if not audio_info or audio_info.get('duration') is None:
+        return
+
+    duration = audio_info['duration']
+    max_seconds = MAX_RETRIEVAL_LECTURE_SECONDS if LECTURE_RETRIEVAL_ENABLED else MAX_LECTURE_SECONDS
+    if duration > max_seconds:
+        raise ValueError(
+            f"Lecture too long: {duration/60:.1f} min (max: {max_seconds/60:.0f} min)"
+        )
+
+    if exceeds_audio_context(audio_info) and not LECTURE_RETRIEVAL_ENABLED:
+        raise ValueError(
+            f"Lecture too long: ~{audio_info['tokensUsed']} audio tokens "
+            f"(max: {CONTEXT_TOKENS - CONTEXT_RESERVE_TOKENS})"
+        )
+
 def save_lecture_metadata(lecture_id, s3_key, file_size,
-                         status='ready', error=None):
+                         status='ready', error=None, audio_info=None):
     """Save lecture metadata to DynamoDB"""
     table = dynamodb.Table(DYNAMODB_TABLE)
 
@@ -107,8 +188,47 @@ def save_lecture_metadata(lecture_id, s3_key, file_size,
     if error:
         item['errorMessage'] = error
 
+    if audio_info:
+        item['format'] = audio_info['format']
+        item['codec'] = audio_info['codec']
+        if audio_info.get('sampleRate'):
+            item['sampleRate'] = int(audio_info['sampleRate'])
+        if audio_info.get('channels'):
+            item['channels'] = int(audio_info['channels'])
+        if audio_info.get('duration') is not None:
+            # DynamoDB numbers must be Decimal, not float
+            item['duration'] = Decimal(str(round(audio_info['duration'], 3)))
+            item['tokensUsed'] = audio_info['tokensUsed']
+
     table.put_item(Item=item)
 
+def prime_lecture_context(lecture_id, s3_key):
+    """Ask AgentCore to prefill the lecture prefix (fire and forget)"""
+    request_agentcore('prime_lecture', lecture_id, s3_key)
+
+def process_lecture(lecture_id, s3_key):
+    """Ask AgentCore to build the lecture transcript (fire and forget)"""
+    request_agentcore('process_lecture', lecture_id, s3_key)
+
+def request_agentcore(request_type, lecture_id, s3_key):
+    """Post a background lecture request to AgentCore"""
+    if not AGENTCORE_ENDPOINT:
+        return
+
+    try:
+        requests.post(
+            f"{AGENTCORE_ENDPOINT}/invoke",
+            json={
+                'type': request_type,
+                'lectureId': lecture_id,
+                's3Key': s3_key
+            },
+            timeout=5
+        )
+        print(f"Requested {request_type} for lecture {lecture_id}")
+    except Exception as e:
+        print(f"Error requesting {request_type} for {lecture_id}: {e}")
+
 def notify_frontend(connection_id, message):
     """Send message to frontend via API Gateway WebSocket"""
     try:
@@ -2,16 +2,41 @@
 import json
 import boto3
 import os
+import base64
+import struct
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import uuid
 import requests
+from botocore.config import Config
 
 s3_client = boto3.client('s3')
-api_gateway = boto3.client('apigatewaymanagementapi')
 dynamodb = boto3.resource('dynamodb')
 
 AGENTCORE_ENDPOINT = os.environ['AGENTCORE_ENDPOINT']
 S3_BUCKET = os.environ['S3_BUCKET']
+AGENTCORE_FRAMING = os.environ.get('AGENTCORE_FRAMING', 'binary')  # 'binary' | 'ndjson'
+# 'relay': stream /invoke through this Lambda; 'push': AgentCore posts to the connection itself
+QUERY_DELIVERY_MODE = os.environ.get('QUERY_DELIVERY_MODE', 'relay')
+
+# AgentCore binary framing (see services/agentcore/utils/framing.py):
+# 1-byte type | 4-byte big-endian payload length | payload
+FRAME_HEADER = struct.Struct('>BI')
+FRAME_JSON = 0x01
+FRAME_AUDIO = 0x02
+FRAMED_MEDIA_TYPE = 'application/vnd.synapscribe.frames'
+
+# API Gateway WebSocket messages are capped at 128 KB; keep some headroom
+MAX_PUSH_BYTES = int(os.environ.get('WS_MAX_PUSH_BYTES', str(120 * 1024)))
+# How long a sender waits for more stream messages before posting a batch
+PUSH_LINGER_SECONDS = float(os.environ.get('WS_PUSH_LINGER_MS', '15')) / 1000
+SEND_MAX_WORKERS = int(os.environ.get('WS_SEND_MAX_WORKERS', '4'))
+
+# Reused across warm invocations
+_management_client = None
+_send_executor = ThreadPoolExecutor(max_workers=SEND_MAX_WORKERS)
 
 def lambda_handler(event, context):
     """
@@ -32,7 +57,8 @@ def lambda_handler(event, context):
 
     elif route_key == 'query':
         body = json.loads(event['body'])
-        return handle_query(connection_id, body)
+        # API Gateway's request id follows the query through AgentCore
+        return handle_query(connection_id, body, event['requestContext'].get('requestId'))
 
     elif route_key == 'end_session':
         body = json.loads(event['body'])
@@ -116,7 +142,7 @@ def handle_request_upload(connection_id, body):
 
     return {'statusCode': 200, 'body': 'OK'}
 
-def handle_query(connection_id, body):
+def handle_query(connection_id, body, request_id=None):
     """
     Route query to AgentCore
 
@@ -124,8 +150,19 @@ def handle_query(connection_id, body):
         "sessionId": str,
         "lectureId": str,
         "s3Key": str (query audio path)
+        or "asrStreamId": str (audio already streamed to AgentCore's /asr/stream),
+        "batch": bool (optional; the client accepts {"type": "batch"} envelopes)
     }
     """
+    try:
+        audio_source = query_audio_source(body)
+    except ValueError as e:
+        send_to_connection(connection_id, {'type': 'error', 'message': str(e)})
+        return {'statusCode': 400, 'body': str(e)}
+
+    if QUERY_DELIVERY_MODE == 'push':
+        return handle_query_push(connection_id, body, audio_source, request_id)
+
     # Forward to AgentCore on EC2
     response = requests.post(
         f"{AGENTCORE_ENDPOINT}/invoke",
@@ -133,21 +170,130 @@ def handle_query(connection_id, body):
             'type': 'query',
             'sessionId': body['sessionId'],
             'lectureId': body['lectureId'],
-            's3Key': body['s3Key'],
-            'connectionId': connection_id
+            **audio_source,
+            'connectionId': connection_id,
+            'framing': AGENTCORE_FRAMING,
+            'requestId': request_id
         },
         stream=True,  # Stream response
         timeout=120
     )
 
-    # Stream AgentCore response back to frontend via WebSocket
-    for line in response.iter_lines():
-        if line:
-            message = json.loads(line)
-            send_to_connection(connection_id, message)
+    # AgentCore sheds load with 429 when its vLLM queue is full
+    if response.status_code == 429:
+        send_to_connection(connection_id, {
+            'type': 'error',
+            'code': 'busy',
+            'message': 'Server busy, please retry'
+        })
+        return {'statusCode': 200, 'body': 'Busy'}
+
+    # AgentCore answers with binary frames only if it supports them
+    content_type = response.headers.get('Content-Type', '')
+    if content_type.startswith(FRAMED_MEDIA_TYPE):
+        messages = decode_frames(response.iter_content(chunk_size=16384))
+    else:
+        messages = (json.loads(line) for line in response.iter_lines() if line)
 
+    # Stream AgentCore response back to frontend via WebSocket; posting runs
+    # on a sender thread so reading the stream never waits on API Gateway
+    sender = ConnectionSender(connection_id, batch=bool(body.get('batch')))
+    try:
+        for message in messages:
+            if not sender.send(message):
+                print(f"Connection {connection_id} is gone, stopping stream")
+                break
+    finally:
+        response.close()
+        sender.close()
+
+    print(f"Streamed {sender.messages} messages in {sender.posts} posts to {connection_id} (request {request_id})")
     return {'statusCode': 200, 'body': 'OK'}
 
+def query_audio_source(body):
+    """The query's audio reference: exactly one of s3Key and asrStreamId"""
+    sources = {key: body[key] for key in ('s3Key', 'asrStreamId') if body.get(key)}
+    if len(sources) != 1:
+        raise ValueError("Query needs exactly one of s3Key and asrStreamId")
+    return sources
+
+def handle_query_push(connection_id, body, audio_source, request_id=None):
+    """
+    Hand the query to AgentCore and return without waiting for the answer
+
+    AgentCore posts query_text, answer_text and audio_chunk messages straight
+    to the connection, so this Lambda is not on the streaming path.
+    """
+    response = requests.post(
+        f"{AGENTCORE_ENDPOINT}/invoke",
+        json={
+            'type': 'query',
+            'sessionId': body['sessionId'],
+            'lectureId': body['lectureId'],
+            **audio_source,
+            'connectionId': connection_id,
+            'delivery': 'push',
+            'apiGatewayEndpoint': os.environ['API_GATEWAY_ENDPOINT'],
+            'batch': bool(body.get('batch')),
+            'requestId': request_id
+        },
+        timeout=10
+    )
+
+    if response.status_code == 429:
+        send_to_connection(connection_id, {
+            'type': 'error',
+            'code': 'busy',
+            'message': 'Server busy, please retry'
+        })
+        return {'statusCode': 200, 'body': 'Busy'}
+
+    if response.status_code != 202:
+        print(f"AgentCore rejected push query: {response.status_code} {response.text}")
+        send_to_connection(connection_id, {
+            'type': 'error',
+            'message': 'Failed to start query'
+        })
+
+    return {'statusCode': 200, 'body': 'Accepted'}
+
+def decode_frames(byte_chunks):
+    """
+    Decode AgentCore binary frames into frontend messages
+
+    JSON frames are passed through; raw audio frames become the same
+    audio_chunk messages the NDJSON stream produces.
+    """
+    buffer = bytearray()
+    audio_index = 0
+
+    for data in byte_chunks:
+        buffer.extend(data)
+
+        while len(buffer) >= FRAME_HEADER.size:
+            frame_type, length = FRAME_HEADER.unpack_from(buffer)
+            end = FRAME_HEADER.size + length
+            if len(buffer) < end:
+                break
+
+            payload = bytes(buffer[FRAME_HEADER.size:end])
+            del buffer[:end]
+
+            if frame_type == FRAME_JSON:
+                yield json.loads(payload)
+            elif frame_type == FRAME_AUDIO:
+                yield {
+                    'type': 'audio_chunk',
+                    'data': base64.b64encode(payload).decode('utf-8'),
+                    'index': audio_index
+                }
+                audio_index += 1
+            else:
+                print(f"Skipping unknown frame type: {frame_type}")
+
+    if buffer:
+        print(f"Discarding {len(buffer)} bytes of incomplete frame data")
+
 def handle_end_session(connection_id, body):
     """
     Trigger session end and batch transcription
@@ -174,20 +320,116 @@ def handle_end_session(connection_id, body):
 
     return {'statusCode': 200, 'body': 'OK'}
 
+def get_management_client():
+    """API Gateway management client, built once per container"""
+    global _management_client
+    if _management_client is None:
+        endpoint_url = f"https://{os.environ['API_GATEWAY_ENDPOINT']}"
+        _management_client = boto3.client(
+            'apigatewaymanagementapi',
+            endpoint_url=endpoint_url,
+            config=Config(max_pool_connections=SEND_MAX_WORKERS * 2)
+        )
+    return _management_client
+
 def send_to_connection(connection_id, message):
     """Send message to WebSocket connection"""
-    endpoint_url = f"https://{os.environ['API_GATEWAY_ENDPOINT']}"
-    api_gateway_client = boto3.client(
-        'apigatewaymanagementapi',
-        endpoint_url=endpoint_url
-    )
+    post_to_connection(connection_id, json.dumps(message).encode('utf-8'))
+
+def post_to_connection(connection_id, data):
+    """
+    Post raw bytes to a WebSocket connection
+
+    Returns False if the connection is gone, True otherwise
+    """
+    api_gateway_client = get_management_client()
 
     try:
         api_gateway_client.post_to_connection(
             ConnectionId=connection_id,
-            Data=json.dumps(message).encode('utf-8')
+            Data=data
         )
     except api_gateway_client.exceptions.GoneException:
         print(f"Connection {connection_id} is gone")
+        return False
     except Exception as e:
         print(f"Error sending to {connection_id}: {e}")
+    return True
+
+class ConnectionSender:
+    """
+    Ordered sender for one WebSocket connection
+
+    Messages are queued by the caller and posted by a single worker from the
+    shared thread pool, so they arrive in order. With batch=True (the client
+    opted in), messages that queue up while a post is in flight (or within
+    the linger window) are packed into one
+    {"type": "batch", "messages": [...]} push of at most MAX_PUSH_BYTES;
+    otherwise each message is its own post.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, connection_id, batch=False):
+        self.connection_id = connection_id
+        self.batch = batch
+        self.queue = queue.Queue()
+        self.gone = False
+        self.messages = 0
+        self.posts = 0
+        self._future = _send_executor.submit(self._run)
+
+    def send(self, message):
+        """Queue a message; returns False once the connection is gone"""
+        if self.gone:
+            return False
+        self.queue.put(json.dumps(message))
+        return True
+
+    def close(self):
+        """Flush queued messages and wait for the worker to finish"""
+        self.queue.put(self._CLOSE)
+        self._future.result()
+
+    def _run(self):
+        carry = None
+        closing = False
+
+        while not closing:
+            item = carry if carry is not None else self.queue.get()
+            carry = None
+            if item is self._CLOSE:
+                break
+
+            batch = [item]
+            size = len(item)
+            deadline = time.monotonic() + PUSH_LINGER_SECONDS
+
+            while self.batch:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is self._CLOSE:
+                    closing = True
+                    break
+                # +1 for the separating comma
+                if size + len(item) + 1 + len('{"type":"batch","messages":[]}') > MAX_PUSH_BYTES:
+                    carry = item
+                    break
+                batch.append(item)
+                size += len(item) + 1
+
+            if not self.gone:
+                self._post(batch)
+
+    def _post(self, batch):
+        if len(batch) == 1:
+            data = batch[0]
+        else:
+            data = '{"type":"batch","messages":[' + ','.join(batch) + ']}'
+
+        self.messages += len(batch)
+        self.posts += 1
+        if not post_to_connection(self.connection_id, data.encode('utf-8')):
+            self.gone = True
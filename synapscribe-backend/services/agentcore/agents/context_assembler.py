@@ -0,0 +1,209 @@
+"""
+ContextAssembler - Token-budgeted conversation history
+Keeps the newest turns that fit the budget and a rolling summary of the older ones
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from utils.token_counter import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INTRO_TEXT = "Summary of our earlier conversation:"
+
+SUMMARY_ACK_TEXT = "I remember our earlier conversation."
+
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a student and a teaching assistant about a lecture. "
+    "Keep the questions asked, the key facts in the answers and anything the student may refer back to. "
+    "Write plain prose, at most {words} words."
+)
+
+Turn = Tuple[Dict, Dict]
+
+
+@dataclass
+class _Summary:
+    text: str
+    through: str  # Key of the last turn folded in
+    tokens: int
+
+
+class ContextAssembler:
+    """
+    Fits the history window into history_budget tokens
+
+    assemble() walks the window newest-first and keeps whole turns (at most
+    recent_turns) while they fit; the older turns of the window are
+    represented by a rolling summary, inserted ahead of the kept turns as a
+    user/assistant pair. Its tokens are reserved from the budget.
+
+    Summaries are generated in the background with VLLMClient.summarize()
+    (scheduler priority "batch") and cached per session. Each one extends
+    the previous summary with the turns that dropped out since, so a query
+    never waits for a summary: it uses whatever summary is ready, or none.
+    """
+
+    def __init__(self, vllm, counter: TokenCounter = None):
+        self.vllm = vllm
+        self.counter = counter or TokenCounter()
+
+        self.history_budget = int(os.getenv('HISTORY_TOKEN_BUDGET', '2048'))
+        self.recent_turns = int(os.getenv('HISTORY_RECENT_TURNS', '6'))
+        self.summaries_enabled = os.getenv('HISTORY_SUMMARY_ENABLED', 'true').lower() == 'true'
+        self.summary_max_tokens = int(os.getenv('HISTORY_SUMMARY_MAX_TOKENS', '256'))
+        self.max_sessions = int(os.getenv('HISTORY_SUMMARY_MAX_SESSIONS', '1024'))
+
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+        self.counters = {
+            "assembled": 0,
+            "turns_dropped": 0,
+            "summary_used": 0,
+            "summaries": 0,
+            "summary_errors": 0
+        }
+
+        logger.info(
+            f"ContextAssembler initialized (budget={self.history_budget} tokens, "
+            f"recent_turns={self.recent_turns}, counter={self.counter.method})"
+        )
+
+    def assemble(self, session_id: str, history: List[Dict]) -> Tuple[List[Dict], int]:
+        """History messages to send, and their estimated prompt tokens"""
+        self.counters["assembled"] += 1
+        turns = self._turns(history)
+
+        summary = self._summaries.get(session_id) if self.summaries_enabled else None
+        if summary is not None:
+            self._summaries.move_to_end(session_id)
+        budget = self.history_budget - (summary.tokens if summary else 0)
+
+        kept: List[Turn] = []
+        used = 0
+        for turn in reversed(turns):
+            if len(kept) == self.recent_turns:
+                break
+            cost = self.counter.count_messages(turn)
+            if used + cost > budget:
+                break
+            kept.append(turn)
+            used += cost
+        kept.reverse()
+
+        older = turns[:len(turns) - len(kept)]
+        messages = [message for turn in kept for message in turn]
+        if not older:
+            return messages, used
+
+        self.counters["turns_dropped"] += len(older)
+        if self.summaries_enabled:
+            self._schedule_summary(session_id, turns, len(older), summary)
+        if summary is None:
+            return messages, used
+
+        self.counters["summary_used"] += 1
+        return self._summary_messages(summary.text) + messages, used + summary.tokens
+
+    def discard(self, session_id: str):
+        """Forget a session's summary (session ended)"""
+        self._summaries.pop(session_id, None)
+        task = self._tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "counter": self.counter.method,
+            "sessions": len(self._summaries),
+            "summarizing": len(self._tasks)
+        }
+
+    def _schedule_summary(self, session_id: str, turns: List[Turn], dropped: int, summary: Optional[_Summary]):
+        """Fold turns that left the kept set into the summary, one update per session at a time"""
+        if session_id in self._tasks:
+            return
+
+        keys = [self._turn_key(turn) for turn in turns]
+        start = 0
+        if summary is not None and summary.through in keys:
+            start = keys.index(summary.through) + 1
+        pending = turns[start:dropped]
+        if not pending:
+            return
+
+        task = asyncio.create_task(
+            self._summarize(session_id, summary.text if summary else None, pending, keys[dropped - 1])
+        )
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+
+    async def _summarize(self, session_id: str, previous: Optional[str], turns: List[Turn], through: str):
+        words = self.summary_max_tokens * 3 // 4
+        parts = [SUMMARY_PROMPT.format(words=words)]
+        if previous:
+            parts.append("Summary so far:\n" + previous)
+        parts.append("New turns:\n" + "\n".join(
+            f"Student: {user['content']}\nAssistant: {assistant['content']}" for user, assistant in turns
+        ))
+
+        try:
+            text = await self.vllm.summarize(
+                "\n\n".join(parts),
+                max_tokens=self.summary_max_tokens,
+                session_id=session_id
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.counters["summary_errors"] += 1
+            logger.warning(f"Summary of session {session_id} failed (retried on a later query): {e}")
+            return
+
+        self.counters["summaries"] += 1
+        self._summaries[session_id] = _Summary(
+            text=text,
+            through=through,
+            tokens=self.counter.count_messages(self._summary_messages(text))
+        )
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_sessions:
+            self._summaries.popitem(last=False)
+        logger.info(f"Summarized {len(turns)} turns of session {session_id}")
+
+    @staticmethod
+    def _turns(history: List[Dict]) -> List[Turn]:
+        """Pair history messages into (user, assistant) turns"""
+        return [(history[i], history[i + 1]) for i in range(0, len(history) - 1, 2)]
+
+    @staticmethod
+    def _turn_key(turn: Turn) -> str:
+        user, assistant = turn
+        digest = hashlib.sha1(f"{user['content']}\0{assistant['content']}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def _summary_messages(text: str) -> List[Dict]:
+        return [
+            {
+                "role": "user",
+                "content": SUMMARY_INTRO_TEXT + "\n\n" + text
+            },
+            {
+                "role": "assistant",
+                "content": SUMMARY_ACK_TEXT
+            }
+        ]
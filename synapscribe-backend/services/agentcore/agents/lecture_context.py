@@ -0,0 +1,432 @@
+"""
+LectureContext - Canonical lecture prefix for vLLM prefix caching
+Builds one byte-stable prefix message list per lecture and warms it in vLLM
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from utils.bm25_index import BM25Index, write_index
+
+logger = logging.getLogger(__name__)
+
+LECTURE_SYSTEM_PROMPT = (
+    "You are SynapScribe, a helpful teaching assistant. "
+    "Answer the student's questions using the lecture provided below. "
+    "Keep answers concise and conversational, since they will be read aloud."
+)
+
+LECTURE_INTRO_TEXT = "Here is the lecture the student is asking about:"
+
+LECTURE_ACK_TEXT = "I have listened to the lecture and am ready for questions."
+
+TRANSCRIPT_INTRO_TEXT = "Here is a timestamped transcript of the lecture the student is asking about:"
+
+TRANSCRIPT_ACK_TEXT = "I have read the lecture transcript and am ready for questions."
+
+EXCERPTS_INTRO_TEXT = "Here are the parts of the lecture transcript most relevant to the next question:"
+
+EXCERPTS_ACK_TEXT = "I have read these lecture excerpts."
+
+
+class LectureContextManager:
+    """
+    Manages the lecture context prefix that starts every Q&A conversation
+
+    vLLM automatic prefix caching reuses KV cache blocks only when the prompt
+    prefix is token-identical. The prefix for a lecture is therefore built once,
+    kept as the same message objects, and prepended unchanged to every request,
+    so follow-up questions only prefill the new turn.
+
+    Once the lecture pipeline has stored a transcript, the prefix is the
+    transcript text instead of the audio (far fewer prefill tokens). Transcripts
+    too long for the context are indexed (BM25) instead; each question then
+    gets the shared system prefix plus its top-k transcript segments.
+
+    LECTURE_CACHE_DIR is shared by all uvicorn workers, each with its own
+    prefix LRU. A worker serving an audio prefix checks the lecture item
+    every transcript_check_seconds and switches to the transcript itself,
+    and rebuilds if the audio file is gone. Audio files are deleted by the
+    worker that ran the pipeline (after the other workers had time to
+    switch), or on LRU eviction once no worker has used them for
+    audio_idle_seconds (the file mtime marks the last use).
+    """
+
+    def __init__(self, s3, dynamodb, vllm, s3_bucket: str, dynamodb_table: str):
+        # s3 is an AsyncS3Client
+        self.s3 = s3
+        self.dynamodb = dynamodb
+        self.vllm = vllm
+        self.s3_bucket = s3_bucket
+        self.dynamodb_table = dynamodb_table
+
+        # Local copies of lecture audio referenced by the prefix (file:// URLs
+        # keep the prefix stable, unlike presigned URLs; VLLMClient inlines the
+        # audio for replicas on other hosts)
+        self.cache_dir = os.getenv('LECTURE_CACHE_DIR', '/tmp/synapscribe/lectures')
+        self.max_lectures = int(os.getenv('LECTURE_CONTEXT_MAX', '32'))
+        self.transcript_check_seconds = float(os.getenv('LECTURE_TRANSCRIPT_CHECK_SECONDS', '30'))
+        self.audio_idle_seconds = float(os.getenv('LECTURE_AUDIO_IDLE_SECONDS', '900'))
+
+        # Context budgets (16K window minus room for history, question and answer)
+        self.audio_max_tokens = int(os.getenv('LECTURE_AUDIO_MAX_TOKENS', '15360'))
+        self.transcript_max_tokens = int(os.getenv('LECTURE_TRANSCRIPT_MAX_TOKENS', '12000'))
+        self.retrieval_top_k = int(os.getenv('LECTURE_RETRIEVAL_TOP_K', '8'))
+        self.index_dir = os.getenv('LECTURE_INDEX_DIR', '/tmp/synapscribe/indexes')
+
+        # Most recently used lectures, kept on disk so a restart can re-prime them
+        self.recent_path = os.path.join(self.cache_dir, 'recent.json')
+
+        self._prefixes = OrderedDict()  # lecture_id -> prefix messages (LRU)
+        self._audio_paths: Dict[str, str] = {}
+        self._checked: Dict[str, float] = {}  # Audio lectures: last transcript check
+        self._indexes: Dict[str, BM25Index] = {}  # Long lectures only
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+        self._primed = set()
+        self._background = set()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    async def get_prefix(self, lecture_id: str, s3_key: Optional[str] = None) -> List[Dict]:
+        """
+        Return the canonical prefix messages for a lecture
+
+        The returned list is shared between requests and must not be mutated.
+        """
+        prefix = self._prefixes.get(lecture_id)
+        if prefix is not None and self._audio_missing(lecture_id):
+            # Another worker switched the lecture to its transcript or cleaned it up
+            self._forget(lecture_id)
+            prefix = None
+        if prefix is not None:
+            self._prefixes.move_to_end(lecture_id)
+            self._check_transcript(lecture_id)
+            return prefix
+
+        lock = self._build_locks.setdefault(lecture_id, asyncio.Lock())
+        async with lock:
+            prefix = self._prefixes.get(lecture_id)
+            if prefix is None:
+                prefix = await self._build(lecture_id, s3_key)
+                if lecture_id in self._prefixes:
+                    # A transcript prefix was installed while building
+                    prefix = self._prefixes[lecture_id]
+                else:
+                    self._remember(lecture_id, prefix)
+                    logger.info(f"Built lecture context prefix for {lecture_id}")
+
+        self._build_locks.pop(lecture_id, None)
+        return prefix
+
+    async def get_context(self, lecture_id: str, query: str) -> List[Dict]:
+        """
+        Return the context messages for one question
+
+        The lecture prefix, followed for indexed (long) lectures by the
+        transcript segments that best match the query, in lecture order.
+        """
+        prefix = await self.get_prefix(lecture_id)
+        index = self._indexes.get(lecture_id)
+        if index is None:
+            return prefix
+
+        hits = index.search(query, self.retrieval_top_k)
+        hits.sort(key=lambda hit: hit["start"])
+        logger.info(f"Retrieved {len(hits)} transcript segments for lecture {lecture_id}")
+        return prefix + [
+            {
+                "role": "user",
+                "content": EXCERPTS_INTRO_TEXT + "\n\n" + self._format_segments(hits)
+            },
+            {
+                "role": "assistant",
+                "content": EXCERPTS_ACK_TEXT
+            }
+        ]
+
+    async def prime(self, lecture_id: str, s3_key: Optional[str] = None) -> bool:
+        """Build the prefix and prefill it in vLLM so its KV cache is resident; returns success"""
+        try:
+            prefix = await self.get_prefix(lecture_id, s3_key)
+            await self.vllm.prime_prefix(prefix, lecture_id=lecture_id)
+            self._primed.add(lecture_id)
+            logger.info(f"Primed lecture context for {lecture_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error priming lecture {lecture_id}: {e}", exc_info=True)
+            return False
+
+    def schedule_prime(self, lecture_id: str, s3_key: Optional[str] = None):
+        """Prime a lecture in the background (called on lecture_ready)"""
+        if lecture_id in self._primed:
+            logger.info(f"Lecture {lecture_id} already primed")
+            return
+
+        self._run_background(self.prime(lecture_id, s3_key))
+
+    def recent_lectures(self, limit: int) -> List[str]:
+        """Lectures used most recently (by this or an earlier process), newest first"""
+        try:
+            with open(self.recent_path) as f:
+                return json.load(f)[:limit]
+        except (OSError, ValueError):
+            return []
+
+    async def use_transcript(self, lecture_id: str, transcript: Dict):
+        """
+        Switch a lecture to its transcript prefix and prime it (called by the
+        pipeline); the audio is deleted once every worker has had time to switch
+        """
+        await self._switch_to_transcript(lecture_id, transcript)
+        self._run_background(self._remove_audio_later(lecture_id, 2 * self.transcript_check_seconds))
+
+    async def _switch_to_transcript(self, lecture_id: str, transcript: Dict):
+        prefix = await self._transcript_prefix(lecture_id, transcript)
+        self._audio_paths.pop(lecture_id, None)
+        self._checked.pop(lecture_id, None)
+        self._remember(lecture_id, prefix)
+        self._primed.discard(lecture_id)
+        logger.info(f"Lecture {lecture_id} now uses its transcript as context")
+        self.schedule_prime(lecture_id)
+
+    def _check_transcript(self, lecture_id: str):
+        """Look for a finished transcript now and then while serving an audio prefix"""
+        audio_path = self._audio_paths.get(lecture_id)
+        now = time.monotonic()
+        if audio_path is None or now - self._checked.get(lecture_id, 0.0) < self.transcript_check_seconds:
+            return
+        self._checked[lecture_id] = now
+        self._touch(audio_path)
+        self._run_background(self._pick_up_transcript(lecture_id))
+
+    async def _pick_up_transcript(self, lecture_id: str):
+        """Switch to a transcript stored by the pipeline (possibly run by another worker)"""
+        try:
+            item = await self._lookup_lecture(lecture_id)
+            if not item or item.get('transcriptStatus') != 'ready' or not item.get('transcriptKey'):
+                return
+            data = await self.s3.get_object_bytes(self.s3_bucket, item['transcriptKey'])
+            if lecture_id in self._audio_paths:
+                await self._switch_to_transcript(lecture_id, json.loads(data))
+        except Exception as e:
+            logger.warning(f"Could not check lecture {lecture_id} for a transcript: {e}")
+
+    def _run_background(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _build(self, lecture_id: str, s3_key: Optional[str]) -> List[Dict]:
+        """Transcript prefix if the pipeline has produced one, else audio prefix"""
+        try:
+            item = await self._lookup_lecture(lecture_id)
+        except Exception as e:
+            if not s3_key:
+                raise
+            logger.warning(f"Could not read lecture {lecture_id} metadata: {e}")
+            item = None
+
+        if item and item.get('transcriptStatus') == 'ready' and item.get('transcriptKey'):
+            try:
+                data = await self.s3.get_object_bytes(self.s3_bucket, item['transcriptKey'])
+                return await self._transcript_prefix(lecture_id, json.loads(data))
+            except Exception as e:
+                logger.warning(f"Transcript for {lecture_id} unavailable, using audio: {e}")
+
+        if item and int(item.get('tokensUsed', 0)) > self.audio_max_tokens:
+            raise ValueError(f"Lecture {lecture_id} is too long for audio context; transcript not ready")
+
+        if not s3_key:
+            if not item or item.get('status') != 'ready':
+                raise ValueError(f"Lecture {lecture_id} is not ready")
+            s3_key = item['s3Key']
+
+        audio_path = await self._fetch_audio(lecture_id, s3_key)
+        self._audio_paths[lecture_id] = audio_path
+        self._checked[lecture_id] = time.monotonic()
+        return self._build_prefix(audio_path)
+
+    async def _transcript_prefix(self, lecture_id: str, transcript: Dict) -> List[Dict]:
+        """Full transcript prefix, or system-only prefix plus an index for long lectures"""
+        segments = transcript.get("segments", [])
+        # Rough token estimate (~4 characters per token)
+        estimated_tokens = sum(len(segment["text"]) + 8 for segment in segments) // 4
+        if estimated_tokens <= self.transcript_max_tokens:
+            return self._build_transcript_prefix(transcript)
+
+        path = os.path.join(self.index_dir, f"{lecture_id}.bm25")
+        if not os.path.exists(path):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, write_index, path, segments)
+
+        self._close_index(lecture_id)
+        self._indexes[lecture_id] = BM25Index(path)
+        logger.info(
+            f"Lecture {lecture_id} transcript (~{estimated_tokens} tokens) exceeds the context "
+            f"budget; using retrieval over {len(segments)} segments"
+        )
+        return [
+            {
+                "role": "system",
+                "content": LECTURE_SYSTEM_PROMPT
+            }
+        ]
+
+    def _format_segments(self, segments: List[Dict]) -> str:
+        """One "[mm:ss] text" line per segment"""
+        return "\n".join(
+            f"[{int(segment['start']) // 60:02d}:{int(segment['start']) % 60:02d}] {segment['text']}"
+            for segment in segments
+        )
+
+    def _build_transcript_prefix(self, transcript: Dict) -> List[Dict]:
+        """Build the prefix messages from a transcript (deterministic for its segments)"""
+        return [
+            {
+                "role": "system",
+                "content": LECTURE_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": TRANSCRIPT_INTRO_TEXT + "\n\n" + self._format_segments(transcript.get("segments", []))
+            },
+            {
+                "role": "assistant",
+                "content": TRANSCRIPT_ACK_TEXT
+            }
+        ]
+
+    def _build_prefix(self, audio_path: str) -> List[Dict]:
+        """Build the prefix messages (deterministic for a given audio path)"""
+        return [
+            {
+                "role": "system",
+                "content": LECTURE_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": LECTURE_INTRO_TEXT
+                    },
+                    {
+                        "type": "audio_url",
+                        "audio_url": {
+                            "url": f"file://{audio_path}"
+                        }
+                    }
+                ]
+            },
+            {
+                "role": "assistant",
+                "content": LECTURE_ACK_TEXT
+            }
+        ]
+
+    def _remember(self, lecture_id: str, prefix: List[Dict]):
+        """Cache a prefix, evicting the least recently used lecture"""
+        self._prefixes[lecture_id] = prefix
+        self._prefixes.move_to_end(lecture_id)
+
+        while len(self._prefixes) > self.max_lectures:
+            evicted_id, _ = self._prefixes.popitem(last=False)
+            self._primed.discard(evicted_id)
+            self._checked.pop(evicted_id, None)
+            self._remove_idle_audio(self._audio_paths.pop(evicted_id, None))
+            self._close_index(evicted_id)
+            logger.info(f"Evicted lecture context for {evicted_id}")
+
+        self._save_recent()
+
+    def _save_recent(self):
+        """Write the LRU order of cached lectures (written whole, then renamed)"""
+        partial_path = f"{self.recent_path}.{os.getpid()}.part"
+        try:
+            with open(partial_path, 'w') as f:
+                json.dump(list(reversed(self._prefixes)), f)
+            os.replace(partial_path, self.recent_path)
+        except OSError as e:
+            logger.warning(f"Could not save recent lectures: {e}")
+
+    def _close_index(self, lecture_id: str):
+        index = self._indexes.pop(lecture_id, None)
+        if index is not None:
+            index.close()
+
+    def _forget(self, lecture_id: str):
+        self._prefixes.pop(lecture_id, None)
+        self._audio_paths.pop(lecture_id, None)
+        self._checked.pop(lecture_id, None)
+        self._primed.discard(lecture_id)
+        self._close_index(lecture_id)
+
+    def _audio_missing(self, lecture_id: str) -> bool:
+        audio_path = self._audio_paths.get(lecture_id)
+        return audio_path is not None and not os.path.exists(audio_path)
+
+    @staticmethod
+    def _touch(audio_path: str):
+        """Mark the shared audio file as in use (its mtime is the last use by any worker)"""
+        try:
+            os.utime(audio_path)
+        except OSError:
+            pass
+
+    def _remove_idle_audio(self, audio_path: Optional[str]):
+        """Delete evicted audio unless some worker used it within audio_idle_seconds"""
+        try:
+            if audio_path and time.time() - os.path.getmtime(audio_path) > self.audio_idle_seconds:
+                os.remove(audio_path)
+        except OSError:
+            pass
+
+    async def _remove_audio_later(self, lecture_id: str, delay: float):
+        await asyncio.sleep(delay)
+        for name in os.listdir(self.cache_dir):
+            stem, ext = os.path.splitext(name)
+            if stem == lecture_id and ext != '.part':
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    logger.info(f"Removed lecture audio {name} (transcript in use)")
+                except OSError:
+                    pass
+
+    async def _fetch_audio(self, lecture_id: str, s3_key: str) -> str:
+        """Download the lecture audio once and return its local path"""
+        ext = os.path.splitext(s3_key)[1]
+        audio_path = os.path.join(self.cache_dir, f"{lecture_id}{ext}")
+        if os.path.exists(audio_path):
+            self._touch(audio_path)
+            return audio_path
+
+        # Download to a unique temporary name (workers may fetch the same
+        # lecture at once) so a partial file is never referenced
+        fd, partial_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{lecture_id}.", suffix=".part")
+        os.close(fd)
+        try:
+            await self.s3.download_file(self.s3_bucket, s3_key, partial_path)
+            os.replace(partial_path, audio_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        logger.info(f"Downloaded lecture audio to {audio_path}")
+        return audio_path
+
+    async def _lookup_lecture(self, lecture_id: str) -> Optional[Dict]:
+        """Read the lecture metadata item saved by validate_lecture"""
+        table = self.dynamodb.Table(self.dynamodb_table)
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            None,
+            lambda: table.get_item(Key={"sessionId": f"lecture-{lecture_id}"})
+        )
+
+        return response.get('Item')
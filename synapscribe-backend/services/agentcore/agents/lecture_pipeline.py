@@ -0,0 +1,192 @@
+"""
+LecturePipeline - Offline lecture pre-processing
+Decodes, splits on silence and batch-transcribes a lecture into a timestamped transcript
+"""
+
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from utils.audio_processing import SAMPLE_RATE, decode_to_pcm, pcm_to_wav, split_on_silence
+from utils.scheduler import SchedulerBusy
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_VERSION = 1
+
+
+class LecturePipeline:
+    """
+    Turns an uploaded lecture into a transcript artifact
+
+    1. Download the lecture and decode it to 16 kHz mono PCM (ffmpeg)
+    2. Split on silence into segments of at most LECTURE_SEGMENT_MAX_SECONDS
+    3. Transcribe segments concurrently as low-priority "batch" vLLM requests,
+       enough of them in flight to fill --max-num-seqs while the GPU is idle
+    4. Store {"segments": [{"start", "end", "text"}]} at
+       s3://bucket/transcripts/{lectureId}.json and mark the lecture item
+
+    The lecture context then switches to a text prefix built from the
+    transcript, so later questions are text-only prompts.
+    """
+
+    def __init__(self, s3, dynamodb, vllm, lecture_context, s3_bucket: str, dynamodb_table: str):
+        # s3 is an AsyncS3Client
+        self.s3 = s3
+        self.dynamodb = dynamodb
+        self.vllm = vllm
+        self.lecture_context = lecture_context
+        self.s3_bucket = s3_bucket
+        self.dynamodb_table = dynamodb_table
+
+        self.enabled = os.getenv('LECTURE_PIPELINE_ENABLED', 'true').lower() == 'true'
+        self.work_dir = os.getenv('LECTURE_PIPELINE_DIR', '/tmp/synapscribe/pipeline')
+        # Segment requests in flight; the scheduler also keeps SCHEDULER_LIVE_RESERVE
+        # slots free of batch work, so live queries never wait behind segments
+        self.concurrency = int(os.getenv('LECTURE_ASR_CONCURRENCY', '2'))
+        self.max_segment_seconds = float(os.getenv('LECTURE_SEGMENT_MAX_SECONDS', '30'))
+        self.max_attempts = int(os.getenv('LECTURE_ASR_MAX_ATTEMPTS', '5'))
+
+        self._running: Dict[str, asyncio.Task] = {}
+
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def schedule(self, lecture_id: str, s3_key: str):
+        """Process a lecture in the background (called on lecture_ready)"""
+        if not self.enabled:
+            return
+        if lecture_id in self._running:
+            logger.info(f"Lecture {lecture_id} already being processed")
+            return
+
+        task = asyncio.create_task(self.run(lecture_id, s3_key))
+        self._running[lecture_id] = task
+        task.add_done_callback(lambda _: self._running.pop(lecture_id, None))
+
+    async def run(self, lecture_id: str, s3_key: str) -> Optional[Dict]:
+        """Build and store the transcript; returns it, or None on failure"""
+        started = datetime.now()
+        audio_path = os.path.join(self.work_dir, f"{lecture_id}{os.path.splitext(s3_key)[1]}")
+
+        try:
+            logger.info(f"Pre-processing lecture {lecture_id}")
+            await self._update_lecture(lecture_id, {"transcriptStatus": "processing"})
+
+            # Step 1: Download and decode to 16 kHz mono PCM
+            await self.s3.download_file(self.s3_bucket, s3_key, audio_path)
+            pcm = await decode_to_pcm(audio_path, SAMPLE_RATE)
+
+            # Step 2: Split on silence
+            loop = asyncio.get_running_loop()
+            spans = await loop.run_in_executor(
+                None,
+                lambda: split_on_silence(pcm, SAMPLE_RATE, max_segment_seconds=self.max_segment_seconds)
+            )
+            logger.info(f"Lecture {lecture_id}: {len(spans)} segments")
+
+            # Step 3: Transcribe segments concurrently
+            segments = await self._transcribe_segments(lecture_id, pcm, spans)
+
+            # Step 4: Store the transcript artifact
+            transcript = {
+                "version": TRANSCRIPT_VERSION,
+                "lectureId": lecture_id,
+                "duration": round(len(pcm) / 2 / SAMPLE_RATE, 2),
+                "segments": segments
+            }
+            transcript_key = f"transcripts/{lecture_id}.json"
+            await self.s3.put_object(
+                Bucket=self.s3_bucket,
+                Key=transcript_key,
+                Body=json.dumps(transcript, separators=(',', ':')).encode('utf-8'),
+                ContentType='application/json'
+            )
+            await self._update_lecture(lecture_id, {
+                "transcriptStatus": "ready",
+                "transcriptKey": transcript_key,
+                "transcriptSegments": len(segments)
+            })
+
+            elapsed = (datetime.now() - started).total_seconds()
+            logger.info(
+                f"Transcript for lecture {lecture_id} stored at {transcript_key} "
+                f"({len(segments)} segments, {elapsed:.1f}s)"
+            )
+
+            # Later questions use the (much shorter) text prefix, or retrieval
+            # over the transcript when even the text is too long
+            await self.lecture_context.use_transcript(lecture_id, transcript)
+            return transcript
+
+        except Exception as e:
+            logger.error(f"Error pre-processing lecture {lecture_id}: {e}", exc_info=True)
+            try:
+                await self._update_lecture(lecture_id, {"transcriptStatus": "failed"})
+            except Exception:
+                logger.warning(f"Could not record transcript failure for {lecture_id}")
+            return None
+
+        finally:
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
+
+    async def _transcribe_segments(self, lecture_id: str, pcm: bytes, spans) -> List[Dict]:
+        """
+        Transcribe all segments with at most `concurrency` requests in flight
+
+        The first failure cancels the remaining segments (TaskGroup).
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def transcribe(start: int, end: int) -> Dict:
+            async with semaphore:
+                wav = pcm_to_wav(pcm[start * 2:end * 2], SAMPLE_RATE)
+                text = await self._transcribe_with_retry(lecture_id, wav)
+            return {
+                "start": round(start / SAMPLE_RATE, 2),
+                "end": round(end / SAMPLE_RATE, 2),
+                "text": text
+            }
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(transcribe(start, end)) for start, end in spans]
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+        results = [task.result() for task in tasks]
+        return [segment for segment in results if segment["text"]]
+
+    async def _transcribe_with_retry(self, lecture_id: str, wav: bytes) -> str:
+        """Batch requests yield to live traffic: back off while the scheduler is full"""
+        for attempt in range(self.max_attempts):
+            try:
+                return await self.vllm.transcribe_audio(
+                    wav,
+                    mime_type="audio/wav",
+                    session_id=f"lecture-{lecture_id}",
+                    kind="batch"
+                )
+            except SchedulerBusy:
+                if attempt == self.max_attempts - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+    async def _update_lecture(self, lecture_id: str, fields: Dict):
+        """SET fields on the lecture metadata item saved by validate_lecture"""
+        table = self.dynamodb.Table(self.dynamodb_table)
+        names = {f"#{name}": name for name in fields}
+        values = {f":{name}": value for name, value in fields.items()}
+        expression = "SET " + ", ".join(f"#{name} = :{name}" for name in fields)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: table.update_item(
+                Key={"sessionId": f"lecture-{lecture_id}"},
+                UpdateExpression=expression,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        )
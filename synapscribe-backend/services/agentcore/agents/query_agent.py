@@ -4,17 +4,45 @@ Handles ASR, Q&A with context, TTS, and session management
 """
 
 import os
+import time
+import uuid
+import asyncio
 import boto3
 import logging
-import json
-import base64
+from collections import deque
 from typing import AsyncGenerator, Dict, List
-from datetime import datetime, timedelta
+from datetime import datetime
 from utils.vllm_client import VLLMClient
 from utils.gtts_client import GTTSClient
+from utils.sentence_splitter import SentenceSplitter
+from utils.framing import get_encoder
+from utils.async_s3 import AsyncS3Client
+from utils.session_backends import create_session_store, worker_count
+from utils.history_cache import HistoryCache
+from utils.turn_persister import TurnPersister
+from utils.turn_table import TurnTable
+from utils.answer_cache import AnswerCache
+from utils.scheduler import SchedulerBusy
+from utils.connection_push import ConnectionPusher
+from utils.streaming_asr import StreamingASRRegistry
+from utils.audio_processing import SAMPLE_RATE, decode_bytes_to_pcm, pcm_to_wav, trim_silence
+from utils.metrics import FIRST_AUDIO_SECONDS, HISTORY_TOKENS, QUERY_SECONDS, STAGE_SECONDS
+from agents.context_assembler import ContextAssembler
+from agents.lecture_context import LectureContextManager
+from agents.lecture_pipeline import LecturePipeline
 
 logger = logging.getLogger(__name__)
 
+AUDIO_MIME_TYPES = {
+    'webm': 'audio/webm',
+    'ogg': 'audio/ogg',
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'm4a': 'audio/mp4',
+    'mp4': 'audio/mp4',
+    'flac': 'audio/flac'
+}
+
 
 class QueryAgent:
     """
@@ -23,111 +51,476 @@ class QueryAgent:
     2. Q&A with lecture context using vLLM
     3. TTS of response
     4. Streaming audio chunks back to Lambda
-    5. Session management and batch transcription
+    5. Session management and per-turn persistence
     """
 
     def __init__(self):
-        # AWS clients
-        self.s3 = boto3.client('s3')
+        # AWS clients (S3 calls run on a thread pool, off the event loop)
+        self.s3 = AsyncS3Client()
         self.dynamodb = boto3.resource('dynamodb')
 
         # AI service clients
-        self.vllm = VLLMClient()
+        self.vllm = VLLMClient(workers=worker_count())
         self.gtts = GTTSClient()
 
-        # Session memory (in-memory storage for Q&A pairs)
-        self.session_memory = {}
+        # Session memory: Q&A text until /end_session (SESSION_BACKEND:
+        # in-process memory, or SQLite/Redis shared by all workers)
+        self.session_store = create_session_store()
+
+        # Query audio transcribed incrementally while the user speaks
+        # (finished transcripts reach other workers through the session store)
+        self.asr_streams = StreamingASRRegistry(self.vllm, store=self.session_store)
+
+        # Conversation history (last N turns per session, appended per turn)
+        self.history_turns = int(os.getenv('HISTORY_MAX_TURNS', '10'))
+        self.history_cache = HistoryCache(max_turns=self.history_turns)
+
+        # History sent to vLLM: newest turns within a token budget, older ones summarized
+        self.context_assembler = ContextAssembler(self.vllm)
+
+        # Answers to near-duplicate questions, per lecture
+        self.answer_cache = AnswerCache()
+
+        # Push delivery: stream straight to the client's WebSocket connection
+        self.pusher = ConnectionPusher()
+        self._push_tasks = set()
 
         # Environment configuration
         self.s3_bucket = os.getenv('S3_BUCKET', 'synapscribe-audio-657177702657')
         self.dynamodb_table = os.getenv('DYNAMODB_TABLE', 'SynapScribe-Sessions')
 
-        logger.info("QueryAgent initialized")
+        # One DynamoDB item per turn (DYNAMODB_TURNS_TABLE), read newest-first
+        self.turn_table = TurnTable(self.dynamodb, sessions_table=self.dynamodb_table)
+
+        # Write-behind persistence: each turn reaches S3/DynamoDB shortly after it completes
+        self.persister = TurnPersister(
+            s3=self.s3,
+            dynamodb=self.dynamodb,
+            turn_table=self.turn_table,
+            s3_bucket=self.s3_bucket,
+            dynamodb_table=self.dynamodb_table
+        )
+
+        # Lecture context prefix (shared by every question on a lecture)
+        self.lecture_context = LectureContextManager(
+            s3=self.s3,
+            dynamodb=self.dynamodb,
+            vllm=self.vllm,
+            s3_bucket=self.s3_bucket,
+            dynamodb_table=self.dynamodb_table
+        )
+
+        # Offline transcript of each lecture (replaces audio in the prefix)
+        self.lecture_pipeline = LecturePipeline(
+            s3=self.s3,
+            dynamodb=self.dynamodb,
+            vllm=self.vllm,
+            lecture_context=self.lecture_context,
+            s3_bucket=self.s3_bucket,
+            dynamodb_table=self.dynamodb_table
+        )
+
+        # Query audio pre-processing: 16 kHz mono, silence trimmed, before ASR
+        self.query_audio_preprocess = os.getenv('QUERY_AUDIO_PREPROCESS_ENABLED', 'true').lower() == 'true'
+        self.query_max_pause_seconds = float(os.getenv('QUERY_AUDIO_MAX_PAUSE_SECONDS', '0.3'))
+
+        # Streaming Q&A: pipeline vLLM tokens into per-sentence TTS
+        self.streaming_enabled = os.getenv('QA_STREAMING_ENABLED', 'true').lower() == 'true'
+        self.tts_max_concurrency = int(os.getenv('TTS_MAX_CONCURRENCY', '3'))
+        self.tts_min_sentence_chars = int(os.getenv('TTS_MIN_SENTENCE_CHARS', '20'))
+        self.audio_chunk_size = 4096
+
+        # Queries currently streaming an answer (exported as a gauge)
+        self.inflight_queries = 0
+
+        logger.info(f"QueryAgent initialized (streaming={self.streaming_enabled})")
+
+    async def close(self):
+        """Write queued turns, then release sessions, pools and executors (app shutdown)"""
+        await self.persister.close()
+        await self.context_assembler.close()
+        await self.session_store.close()
+        await self.vllm.close()
+        await self.gtts.close()
+        self.turn_table.close()
+        self.pusher.close()
+        self.s3.close()
+        logger.info("QueryAgent closed")
+
+    def get_encoder(self, payload: Dict):
+        """Return the stream encoder negotiated by the payload's "framing" field"""
+        return get_encoder(payload.get("framing"), payload.get("requestId"))
 
     async def process(self, payload: Dict) -> AsyncGenerator[bytes, None]:
         """
         Process Q&A query with streaming response
 
-        Yields JSON lines:
+        Yields JSON lines (or binary frames when payload "framing" is
+        "binary", see utils/framing.py):
         - {"type": "query_text", "text": "..."}
         - {"type": "answer_text", "text": "..."}
+          (in streaming mode: one line per delta, with "delta": true,
+          interleaved with audio_chunk; see docs/ARCHITECTURE.md)
         - {"type": "audio_chunk", "data": "base64...", "index": 0}
         - {"type": "audio_complete"}
         - {"type": "error", "message": "..."}
+          ("code": "busy" when vLLM admission control rejects the request)
+
+        With "asrStreamId" instead of "s3Key", the query text comes from an
+        ASR stream opened on /asr/stream (no upload, download or full-clip ASR).
+
+        Every control message carries the payload's "requestId" (generated
+        when absent). Stage durations feed the /metrics histograms.
         """
         session_id = payload.get("sessionId")
         lecture_id = payload.get("lectureId")
         query_audio_s3_key = payload.get("s3Key")
         connection_id = payload.get("connectionId")
+        request_id = payload["requestId"] = payload.get("requestId") or str(uuid.uuid4())
+        encoder = self.get_encoder(payload)
+
+        started = time.perf_counter()
+        outcome = "cancelled"  # Client went away mid-stream unless set below
+        self.inflight_queries += 1
 
         try:
-            logger.info(f"Processing query for session {session_id}, lecture {lecture_id}")
-
-            # Step 1: Download query audio from S3
-            query_audio_path = f"/tmp/{session_id}_query.webm"
-            self.s3.download_file(
-                Bucket=self.s3_bucket,
-                Key=query_audio_s3_key,
-                Filename=query_audio_path
-            )
-            logger.info(f"Downloaded query audio to {query_audio_path}")
+            logger.info(f"Processing query {request_id} for session {session_id}, lecture {lecture_id}")
 
-            # Step 2: ASR - Transcribe query using vLLM
-            query_text = await self.vllm.transcribe_audio(query_audio_path)
-            yield self._json_line({"type": "query_text", "text": query_text})
+            # Steps 1-2: Query audio -> text
+            query_text = await self._transcribe_query(payload)
+            yield encoder.message({"type": "query_text", "text": query_text})
             logger.info(f"Query transcribed: {query_text[:100]}...")
 
             # Step 3: Load conversation history
-            history = self._load_history(session_id, lecture_id, limit=10)
-            logger.info(f"Loaded {len(history)} history messages")
-
-            # Step 4: Q&A with vLLM using lecture context
-            answer_text = await self.vllm.qa_with_context(
-                lecture_id=lecture_id,
-                query=query_text,
-                history=history
-            )
-            yield self._json_line({"type": "answer_text", "text": answer_text})
-            logger.info(f"Answer generated: {len(answer_text)} chars")
-
-            # Step 5: TTS - Convert answer to speech
-            audio_bytes = await self.gtts.text_to_speech(answer_text)
-            logger.info(f"TTS completed: {len(audio_bytes)} bytes")
-
-            # Step 6: Stream audio chunks
-            chunk_size = 4096
-            for i, chunk in enumerate(self._chunk_audio(audio_bytes, chunk_size)):
-                encoded = base64.b64encode(chunk).decode('utf-8')
-                yield self._json_line({
-                    "type": "audio_chunk",
-                    "data": encoded,
-                    "index": i
-                })
+            with STAGE_SECONDS.time(stage="history"):
+                history = await self._load_history(session_id, limit=self.history_turns)
+                history, history_tokens = self.context_assembler.assemble(session_id, history)
+            HISTORY_TOKENS.observe(history_tokens)
+            logger.info(f"Assembled {len(history)} history messages (~{history_tokens} tokens)")
+
+            # Step 3b: Answer cache (near-duplicate questions on this lecture)
+            cached_answer = self.answer_cache.lookup(lecture_id, query_text, has_history=bool(history))
+
+            # Step 3c: Lecture context (cached prefix, plus retrieved transcript
+            # segments for lectures too long for the context window)
+            with STAGE_SECONDS.time(stage="lecture_context"):
+                context = [] if cached_answer else await self._load_lecture_context(lecture_id, query_text)
+
+            answer_started = time.perf_counter()
+            first_audio = False
+
+            if self.streaming_enabled:
+                # Steps 4-6: Q&A streamed sentence by sentence into TTS
+                if cached_answer:
+                    deltas = self._replay_answer(cached_answer)
+                else:
+                    deltas = self.vllm.qa_with_context_stream(
+                        lecture_id=lecture_id,
+                        query=query_text,
+                        history=history,
+                        context=context,
+                        session_id=session_id
+                    )
+
+                answer_parts = []
+                audio_parts = []
+                async for line in self._stream_answer(
+                    deltas=deltas,
+                    answer_parts=answer_parts,
+                    audio_parts=audio_parts,
+                    encoder=encoder
+                ):
+                    if audio_parts and not first_audio:
+                        first_audio = True
+                        FIRST_AUDIO_SECONDS.observe(time.perf_counter() - started)
+                    yield line
+
+                answer_text = "".join(answer_parts).strip()
+                audio_bytes = b"".join(audio_parts)
+                logger.info(f"Streamed answer: {len(answer_text)} chars, {len(audio_bytes)} audio bytes")
+            else:
+                # Step 4: Q&A with vLLM using lecture context
+                with STAGE_SECONDS.time(stage="qa"):
+                    answer_text = cached_answer or await self.vllm.qa_with_context(
+                        lecture_id=lecture_id,
+                        query=query_text,
+                        history=history,
+                        context=context,
+                        session_id=session_id
+                    )
+                yield encoder.message({"type": "answer_text", "text": answer_text})
+                logger.info(f"Answer generated: {len(answer_text)} chars")
+
+                # Steps 5-6: TTS - forward MP3 chunks as the service sends them
+                tts_started = time.perf_counter()
+                audio_parts = []
+                async for chunk in self.gtts.text_to_speech_stream(answer_text, chunk_size=self.audio_chunk_size):
+                    if not audio_parts:
+                        FIRST_AUDIO_SECONDS.observe(time.perf_counter() - started)
+                    yield encoder.audio(chunk, index=len(audio_parts))
+                    audio_parts.append(chunk)
+                STAGE_SECONDS.observe(time.perf_counter() - tts_started, stage="tts")
+
+                audio_bytes = b"".join(audio_parts)
+                logger.info(f"TTS completed: {len(audio_bytes)} bytes")
+
+            # Answer text and audio delivered (Q&A, TTS and chunk streaming)
+            STAGE_SECONDS.observe(time.perf_counter() - answer_started, stage="stream")
 
             # Step 7: Signal completion
-            yield self._json_line({"type": "audio_complete"})
-            logger.info("Query processing complete")
-
-            # Step 8: Store Q&A in memory for batch transcription
-            self._store_qa_in_memory(
-                session_id=session_id,
-                query_audio_s3_key=query_audio_s3_key,
-                query_text=query_text,
-                answer_text=answer_text,
-                audio_bytes=audio_bytes
+            yield encoder.message({"type": "audio_complete"})
+            logger.info(f"Query {request_id} complete in {time.perf_counter() - started:.2f}s")
+
+            # Step 8: Store Q&A in memory and queue it for persistence
+            with STAGE_SECONDS.time(stage="memory_store"):
+                await self._store_qa_in_memory(
+                    session_id=session_id,
+                    lecture_id=lecture_id,
+                    query_audio_s3_key=query_audio_s3_key,
+                    query_text=query_text,
+                    answer_text=answer_text,
+                    audio_bytes=audio_bytes
+                )
+
+            if not cached_answer:
+                self.answer_cache.store(lecture_id, query_text, answer_text, has_history=bool(history))
+            outcome = "ok"
+
+        except SchedulerBusy as e:
+            outcome = "busy"
+            logger.warning(f"Rejecting query {request_id} for session {session_id}: {e}")
+            yield encoder.message({"type": "error", "code": "busy", "message": "Server busy, please retry"})
+
+        except Exception as e:
+            outcome = "error"
+            logger.error(f"Error processing query {request_id}: {e}", exc_info=True)
+            yield encoder.message({"type": "error", "message": str(e)})
+
+        finally:
+            self.inflight_queries -= 1
+            QUERY_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+
+    async def _transcribe_query(self, payload: Dict) -> str:
+        """Query text from a finished ASR stream, or from the uploaded clip"""
+        session_id = payload.get("sessionId")
+        stream_id = payload.get("asrStreamId")
+        if stream_id:
+            # Segments were transcribed while the user spoke; at most the tail is left
+            with STAGE_SECONDS.time(stage="asr_stream"):
+                return (await self.asr_streams.take(stream_id)).strip()
+
+        query_audio_s3_key = payload.get("s3Key")
+
+        # Step 1: Read query audio from S3 into memory
+        with STAGE_SECONDS.time(stage="s3_download"):
+            query_audio = await self.s3.get_object_bytes(self.s3_bucket, query_audio_s3_key)
+
+        # Step 2: Decode to 16 kHz mono and trim silence
+        with STAGE_SECONDS.time(stage="preprocess"):
+            query_audio, mime_type = await self._preprocess_query_audio(
+                query_audio,
+                self._audio_mime_type(query_audio_s3_key)
+            )
+
+        # Step 3: ASR - Transcribe query using vLLM (audio sent inline)
+        with STAGE_SECONDS.time(stage="asr"):
+            return await self.vllm.transcribe_audio(
+                query_audio,
+                mime_type=mime_type,
+                session_id=session_id
+            )
+
+    async def _preprocess_query_audio(self, audio: bytes, mime_type: str):
+        """
+        Compact query audio for ASR: 16 kHz mono WAV without leading/trailing
+        silence and with long pauses shortened. Falls back to the upload as-is
+        """
+        if not self.query_audio_preprocess:
+            return audio, mime_type
+
+        try:
+            pcm = await decode_bytes_to_pcm(audio, SAMPLE_RATE)
+            loop = asyncio.get_running_loop()
+            trimmed, stats = await loop.run_in_executor(
+                None,
+                lambda: trim_silence(pcm, SAMPLE_RATE, max_pause_seconds=self.query_max_pause_seconds)
             )
+        except Exception as e:
+            logger.warning(f"Query audio pre-processing failed, sending original: {e}")
+            return audio, mime_type
+
+        if trimmed is None:
+            logger.info(f"No speech detected in {stats['original_seconds']}s of query audio, sending original")
+            return audio, mime_type
+
+        logger.info(
+            f"Query audio trimmed {stats['original_seconds']}s -> {stats['trimmed_seconds']}s "
+            f"(removed {stats['removed_seconds']}s)"
+        )
+        return pcm_to_wav(trimmed, SAMPLE_RATE), "audio/wav"
+
+    async def _stream_answer(
+        self,
+        deltas: AsyncGenerator[str, None],
+        answer_parts: List[str],
+        audio_parts: List[bytes],
+        encoder
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Pipeline Q&A generation and TTS sentence by sentence
+
+        Answer deltas (from vLLM or the answer cache) are yielded as soon as
+        they are produced. Each completed
+        sentence is sent to TTS while generation continues, and its MP3 frames
+        are forwarded in sentence order as the TTS service sends them. The
+        answer text and frames are accumulated into answer_parts / audio_parts.
+        """
+        splitter = SentenceSplitter(min_chars=self.tts_min_sentence_chars)
+        tts_slots = asyncio.Semaphore(self.tts_max_concurrency)
+        pending = deque()  # (TTS task, frame queue) in sentence order
+
+        async def synthesize(sentence: str, frames: asyncio.Queue):
+            try:
+                async with tts_slots:
+                    with STAGE_SECONDS.time(stage="tts"):
+                        async for frame in self.gtts.text_to_speech_stream(sentence, chunk_size=self.audio_chunk_size):
+                            frames.put_nowait(frame)
+            finally:
+                frames.put_nowait(None)  # End of this sentence
+
+        def submit(sentence: str):
+            frames = asyncio.Queue()
+            pending.append((asyncio.create_task(synthesize(sentence, frames)), frames))
+
+        async def forward(wait: bool):
+            # Yield received audio in sentence order; without wait, stop at
+            # the first sentence that has nothing buffered yet
+            while pending:
+                task, frames = pending[0]
+                if not wait and frames.empty():
+                    return
+                frame = await frames.get()
+                if frame is None:
+                    pending.popleft()
+                    await task  # Re-raise TTS errors
+                    continue
+                yield encoder.audio(frame, index=len(audio_parts))
+                audio_parts.append(frame)
+
+        generation_started = time.perf_counter()
+        try:
+            async for delta in deltas:
+                answer_parts.append(delta)
+                yield encoder.message({"type": "answer_text", "text": delta, "delta": True})
+
+                for sentence in splitter.feed(delta):
+                    submit(sentence)
 
+                # Forward audio that has already arrived
+                async for line in forward(wait=False):
+                    yield line
+
+            STAGE_SECONDS.observe(time.perf_counter() - generation_started, stage="qa")
+
+            tail = splitter.flush()
+            if tail:
+                submit(tail)
+
+            # Generation finished: drain remaining TTS in order
+            async for line in forward(wait=True):
+                yield line
+
+        finally:
+            for task, _ in pending:
+                task.cancel()
+
+    async def _replay_answer(self, answer_text: str) -> AsyncGenerator[str, None]:
+        """Yield a cached answer as a single delta"""
+        yield answer_text
+
+    def schedule_push(self, payload: Dict):
+        """
+        Answer a query in the background, posting every message directly to
+        the client's API Gateway WebSocket connection
+
+        Payload format (query payload plus):
+        {
+            "delivery": "push",
+            "apiGatewayEndpoint": str (optional; must match API_GATEWAY_ENDPOINT),
+            "batch": bool (optional; the client accepts {"type": "batch"} envelopes)
+        }
+        """
+        connection_id = payload.get("connectionId")
+        if not connection_id:
+            raise ValueError("Push delivery needs connectionId")
+        # Only ever post to the configured WebSocket API
+        endpoint = self.pusher.resolve_endpoint(payload.get("apiGatewayEndpoint"))
+
+        payload = {**payload, "framing": "messages"}
+        task = asyncio.create_task(
+            self._push_query(endpoint, connection_id, payload, bool(payload.get("batch")))
+        )
+        self._push_tasks.add(task)
+        task.add_done_callback(self._push_tasks.discard)
+
+    async def _push_query(self, endpoint: str, connection_id: str, payload: Dict, batch: bool):
+        try:
+            await self.pusher.push_stream(endpoint, connection_id, self.process(payload), batch)
         except Exception as e:
-            logger.error(f"Error processing query: {e}", exc_info=True)
-            yield self._json_line({"type": "error", "message": str(e)})
+            logger.error(f"Error pushing query to {connection_id}: {e}", exc_info=True)
+
+    def schedule_lecture_prime(self, payload: Dict):
+        """
+        Warm the lecture context prefix in the background
+
+        Payload format:
+        {
+            "type": "prime_lecture",
+            "lectureId": str,
+            "s3Key": str (optional)
+        }
+        """
+        lecture_id = payload.get("lectureId")
+        if not lecture_id:
+            raise ValueError("Missing lectureId")
+
+        self.lecture_context.schedule_prime(lecture_id, payload.get("s3Key"))
+
+    def schedule_lecture_processing(self, payload: Dict):
+        """
+        Transcribe a lecture in the background
+
+        Payload format:
+        {
+            "type": "process_lecture",
+            "lectureId": str,
+            "s3Key": str
+        }
+        """
+        lecture_id = payload.get("lectureId")
+        s3_key = payload.get("s3Key")
+        if not lecture_id or not s3_key:
+            raise ValueError("Missing lectureId or s3Key")
+
+        self.lecture_pipeline.schedule(lecture_id, s3_key)
+
+    async def _load_lecture_context(self, lecture_id: str, query_text: str) -> List[Dict]:
+        """Return the lecture context messages, or no context if unavailable"""
+        try:
+            return await self.lecture_context.get_context(lecture_id, query_text)
+        except Exception as e:
+            logger.warning(f"Lecture context unavailable for {lecture_id}: {e}")
+            return []
 
     async def end_session(self, payload: Dict) -> Dict:
         """
         Handle session end:
-        1. Retrieve all Q&A pairs from memory
-        2. Upload response audio to S3
-        3. Save conversation to DynamoDB
-        4. Clean up memory
+        1. Wait for this session's queued turns to be written
+        2. Mark the DynamoDB session item ended
+        3. Clean up memory
+
+        Turns are persisted as they complete (utils/turn_persister.py), so
+        this takes about the same time however long the session was.
         """
         session_id = payload.get("sessionId")
         lecture_id = payload.get("lectureId")
@@ -135,53 +528,22 @@ class QueryAgent:
         try:
             logger.info(f"Ending session {session_id}")
 
-            # Retrieve Q&A pairs from memory
-            qa_pairs = self.session_memory.get(session_id, [])
-            logger.info(f"Found {len(qa_pairs)} Q&A pairs")
-
-            # Save conversation to DynamoDB
-            conversation = []
-            for turn, qa in enumerate(qa_pairs, start=1):
-                # Upload response audio to S3
-                response_s3_key = f"responses/{session_id}/response-{turn}.mp3"
-                self.s3.put_object(
-                    Bucket=self.s3_bucket,
-                    Key=response_s3_key,
-                    Body=qa['response_audio'],
-                    ContentType='audio/mpeg'
-                )
-                logger.info(f"Uploaded response audio: {response_s3_key}")
-
-                conversation.append({
-                    "turn": turn,
-                    "queryText": qa['query_text'],
-                    "responseText": qa['response_text'],
-                    "queryAudio": qa['query_audio_s3_key'],
-                    "responseAudio": response_s3_key,
-                    "timestamp": qa['timestamp']
-                })
-
-            # Save to DynamoDB
-            table = self.dynamodb.Table(self.dynamodb_table)
-            expires_at = int((datetime.now() + timedelta(days=7)).timestamp())
-
-            table.put_item(Item={
-                "sessionId": session_id,
-                "lectureId": lecture_id,
-                "conversation": conversation,
-                "totalTurns": len(conversation),
-                "createdAt": datetime.now().isoformat(),
-                "expiresAt": expires_at
-            })
-            logger.info(f"Saved conversation to DynamoDB")
+            if not await self.persister.flush(session_id):
+                logger.warning(f"Session {session_id} ended with turns still being written")
+
+            # Counted from the turns table: session memory may have been evicted
+            total_turns = await self._count_saved_turns(session_id)
+            await self.persister.finalize(session_id, lecture_id, total_turns)
+            logger.info(f"Finalized session {session_id} ({total_turns} turns)")
 
             # Clean up memory
-            if session_id in self.session_memory:
-                del self.session_memory[session_id]
+            await self.session_store.discard(session_id)
+            self.history_cache.invalidate(session_id)
+            self.context_assembler.discard(session_id)
 
             return {
                 "status": "session_ended",
-                "turns": len(conversation),
+                "turns": total_turns,
                 "sessionId": session_id
             }
 
@@ -189,75 +551,107 @@ class QueryAgent:
             logger.error(f"Error ending session: {e}", exc_info=True)
             raise
 
-    def _json_line(self, data: dict) -> bytes:
-        """Convert dict to JSON line (newline-delimited JSON)"""
-        return (json.dumps(data) + "\n").encode('utf-8')
-
-    def _chunk_audio(self, audio_bytes: bytes, chunk_size: int):
-        """Yield audio chunks of specified size"""
-        for i in range(0, len(audio_bytes), chunk_size):
-            yield audio_bytes[i:i + chunk_size]
-
-    def _load_history(self, session_id: str, lecture_id: str, limit: int = 10) -> List[Dict]:
+    async def _count_saved_turns(self, session_id: str, timeout: float = 10.0) -> int:
+        """
+        Turn items written for a session. With a shared session store, turns
+        served by other workers are written by their persisters, so this
+        waits (up to timeout) until every turn in the store is written.
         """
-        Load conversation history from DynamoDB
+        total = await self.turn_table.count(session_id)
+        if not self.session_store.shared:
+            return total
+
+        expected = len(await self.session_store.get_turns(session_id, include_audio=False))
+        deadline = time.monotonic() + timeout
+        while total < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.25)
+            total = await self.turn_table.count(session_id)
+        if total < expected:
+            logger.warning(f"Session {session_id} ended with {expected - total} turns not yet written by other workers")
+        return total
+
+    def _audio_mime_type(self, s3_key: str) -> str:
+        """MIME type for an uploaded audio key (defaults to WebM, the recorder format)"""
+        ext = os.path.splitext(s3_key)[1].lower().lstrip('.')
+        return AUDIO_MIME_TYPES.get(ext, 'audio/webm')
+
+    async def _load_history(self, session_id: str, limit: int = 10) -> List[Dict]:
+        """
+        Load conversation history (last N turns) through the history cache
 
-        Returns messages in vLLM chat format with audio context
+        Returns messages in vLLM chat format (without the lecture prefix).
+        Lecture audio is prepended separately (agents/lecture_context.py)
         """
         try:
-            table = self.dynamodb.Table(self.dynamodb_table)
-            response = table.get_item(
-                Key={
-                    "sessionId": session_id,
-                    "lectureId": lecture_id
-                }
+            # Another worker may have added turns since this one cached them
+            version = await self.session_store.version(session_id) if self.session_store.shared else None
+            return await self.history_cache.get(
+                session_id,
+                lambda: self._fetch_history(session_id, limit),
+                version=version
             )
-
-            if 'Item' not in response:
-                logger.info("No existing conversation history found")
-                # Return empty history for now
-                # TODO: Load lecture audio into first message when lecture context loading is implemented
-                return []
-
-            # Get conversation history
-            conversation = response['Item'].get('conversation', [])
-
-            # Convert to vLLM chat format (last N turns)
-            messages = []
-            for turn in conversation[-limit:]:
-                messages.append({
-                    "role": "user",
-                    "content": turn['queryText']
-                })
-                messages.append({
-                    "role": "assistant",
-                    "content": turn['responseText']
-                })
-
-            logger.info(f"Loaded {len(messages)} messages from history")
-            return messages
-
         except Exception as e:
             logger.error(f"Error loading history: {e}", exc_info=True)
             return []
 
-    def _store_qa_in_memory(
+    async def _fetch_history(self, session_id: str, limit: int) -> List[Dict]:
+        """
+        Cold-miss loader: last N saved turns from DynamoDB plus turns that are
+        still only in session memory, matched by turn ID
+        """
+        saved = await self.turn_table.recent(session_id, limit)
+        if not saved:
+            logger.info("No existing conversation history found")
+        turns = [(query_text, response_text) for _, (query_text, response_text, _) in sorted(saved.items())]
+
+        # Session memory holds the session's recent turns in order (possibly
+        # only those since it was last lost); the ones after the newest saved
+        # turn are not written yet
+        memory = await self.session_store.get_turns(session_id, include_audio=False)
+        saved_ids = {turn_id for _, _, turn_id in saved.values() if turn_id}
+        unsaved = len(memory)
+        for position, qa in enumerate(memory):
+            if qa.get('turn_id') in saved_ids:
+                unsaved = len(memory) - position - 1
+        for qa in memory[len(memory) - unsaved:]:
+            turns.append((qa['query_text'], qa['response_text']))
+
+        # Convert to vLLM chat format (last N turns)
+        messages = []
+        for query_text, response_text in turns[-limit:]:
+            messages.append({
+                "role": "user",
+                "content": query_text
+            })
+            messages.append({
+                "role": "assistant",
+                "content": response_text
+            })
+
+        logger.info(f"Loaded {len(messages)} messages from history")
+        return messages
+
+    async def _store_qa_in_memory(
         self,
         session_id: str,
+        lecture_id: str,
         query_audio_s3_key: str,
         query_text: str,
         answer_text: str,
         audio_bytes: bytes
     ):
-        """Store Q&A pair in memory for later batch save"""
-        if session_id not in self.session_memory:
-            self.session_memory[session_id] = []
-
-        self.session_memory[session_id].append({
+        """Store Q&A text in session memory and hand the turn to the write-behind persister"""
+        qa = {
+            "turn_id": uuid.uuid4().hex,  # Matches session memory to the saved turn item
             "query_audio_s3_key": query_audio_s3_key,
             "query_text": query_text,
             "response_text": answer_text,
-            "response_audio": audio_bytes,
             "timestamp": datetime.now().isoformat()
-        })
-        logger.info(f"Stored Q&A pair in memory for session {session_id}")
+        }
+        version = await self.session_store.append_turn(session_id, qa)
+        self.persister.submit(session_id, lecture_id, qa, audio_bytes)
+        self.history_cache.append(
+            session_id, query_text, answer_text,
+            version=version if self.session_store.shared else None
+        )
+        logger.info(f"Stored a turn of session {session_id}")
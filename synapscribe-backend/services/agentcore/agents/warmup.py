@@ -0,0 +1,214 @@
+"""
+Warmup - AgentCore startup warmup and readiness
+Opens upstream connections, runs one ASR, Q&A and TTS request and re-primes recent lectures
+"""
+
+import asyncio
+import logging
+import math
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+from utils.audio_processing import SAMPLE_RATE, pcm_to_wav
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUESTION = "Reply with the single word: ready."
+
+WARMUP_SPEECH = "SynapScribe is ready."
+
+# Replica pools are usable while any one endpoint is; other dependencies must all pass
+POOLED_DEPENDENCIES = ("vllm", "gtts")
+
+
+class WarmupManager:
+    """
+    Runs startup warmup and answers readiness probes
+
+    run() is started from the FastAPI lifespan and goes through three phases:
+    1. connections: every vLLM and gTTS replica gets warmup_connections
+       parallel GET /health requests, leaving keep-alive connections pooled;
+       S3 head_bucket and DynamoDB describe_table open the AWS pools.
+    2. inference: one short ASR, Q&A and uncached TTS request, so CUDA
+       graphs and service-side caches are loaded before the first user.
+    3. lectures: the prefix caches of up to recent_lectures recently used
+       lectures are re-primed (optional; failures are logged, not fatal).
+
+    Phases 1-2 are retried every retry_seconds until they pass. Until then
+    /ready answers 503; afterwards it re-checks each dependency (cached for
+    check_ttl seconds) and reports per-dependency latency.
+    """
+
+    def __init__(self, agent):
+        # agent is the QueryAgent whose clients are warmed
+        self.agent = agent
+
+        self.enabled = os.getenv('WARMUP_ENABLED', 'true').lower() == 'true'
+        self.warmup_connections = int(os.getenv('WARMUP_CONNECTIONS', '4'))
+        self.recent_lectures = int(os.getenv('WARMUP_RECENT_LECTURES', '4'))
+        self.lecture_timeout = float(os.getenv('WARMUP_LECTURE_TIMEOUT_SECONDS', '60'))
+        self.retry_seconds = float(os.getenv('WARMUP_RETRY_SECONDS', '10'))
+        self.check_ttl = float(os.getenv('READY_CHECK_TTL_SECONDS', '5'))
+        self.check_timeout = float(os.getenv('READY_CHECK_TIMEOUT_SECONDS', '5'))
+
+        self.state = "pending"  # pending -> warming -> ready
+        self.attempts = 0
+        self.steps: Dict[str, Dict] = {}
+        self.warmup_seconds: Optional[float] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self._checks: Dict[str, Dict] = {}
+        self._checked_at = 0.0
+        self._check_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self):
+        """Warm up in the background (the server answers /ready meanwhile)"""
+        if not self.enabled:
+            self.state = "ready"
+            logger.info("Warmup disabled (WARMUP_ENABLED=false)")
+            return
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def run(self):
+        self.state = "warming"
+        started = time.perf_counter()
+
+        while True:
+            self.attempts += 1
+            connections = await self._run_steps(
+                self._connection_steps(self.warmup_connections), self.check_timeout)
+            self.steps = dict(connections)
+            if self._healthy(connections):
+                self.steps.update(await self._run_steps(self._inference_steps()))
+                if self._healthy(self.steps):
+                    break
+
+            failed = [name for name, step in self.steps.items() if not step["ok"]]
+            logger.warning(f"Warmup attempt {self.attempts} failed ({', '.join(failed)}); "
+                           f"retrying in {self.retry_seconds:.0f}s")
+            await asyncio.sleep(self.retry_seconds)
+
+        self.steps.update(await self._prime_recent_lectures())
+
+        self.warmup_seconds = time.perf_counter() - started
+        self.state = "ready"
+        self._checks, self._checked_at = connections, time.monotonic()
+        logger.info(f"Warmup complete in {self.warmup_seconds:.1f}s ({self.attempts} attempts)")
+
+    async def readiness(self) -> Dict:
+        """Warmup state, plus live dependency checks once warm"""
+        if not self.ready:
+            return {"ready": False, "state": self.state, "attempts": self.attempts, "warmup": self.steps}
+
+        if self._check_lock is None:
+            self._check_lock = asyncio.Lock()
+        async with self._check_lock:  # Concurrent probes share one round of checks
+            if time.monotonic() - self._checked_at >= self.check_ttl:
+                self._checks = await self._run_steps(self._connection_steps(1), self.check_timeout)
+                self._checked_at = time.monotonic()
+
+        return {
+            "ready": self._healthy(self._checks),
+            "state": self.state,
+            "dependencies": self._checks,
+            "warmup": self.steps,
+            "warmup_seconds": round(self.warmup_seconds or 0.0, 3)
+        }
+
+    def _connection_steps(self, connections: int) -> List[Tuple[str, object]]:
+        agent = self.agent
+        steps = []
+        for endpoint in agent.vllm.pool.endpoints:
+            steps.append((f"vllm:{endpoint}", agent.vllm.probe(endpoint, connections)))
+        for endpoint in agent.gtts.pool.endpoints:
+            steps.append((f"gtts:{endpoint}", agent.gtts.probe(endpoint, connections)))
+        steps.append(("s3", self._repeat(connections, lambda: agent.s3.head_bucket(agent.s3_bucket))))
+        for table in (agent.dynamodb_table, agent.turn_table.turns_table):
+            steps.append((f"dynamodb:{table}", self._describe_table(table)))
+        return steps
+
+    def _inference_steps(self) -> List[Tuple[str, object]]:
+        return [
+            ("asr", self._warm_asr()),
+            ("qa", self._warm_qa()),
+            ("tts", self._warm_tts())
+        ]
+
+    async def _warm_asr(self):
+        # One second of a 220 Hz tone: enough to run the audio encoder
+        samples = [int(6000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(SAMPLE_RATE)]
+        wav = pcm_to_wav(struct.pack(f"<{len(samples)}h", *samples))
+        await self.agent.vllm.transcribe_audio(wav, mime_type="audio/wav")
+
+    async def _warm_qa(self):
+        async for _ in self.agent.vllm.qa_with_context_stream(lecture_id=None, query=WARMUP_QUESTION):
+            pass
+
+    async def _warm_tts(self):
+        async for _ in self.agent.gtts.text_to_speech_stream(WARMUP_SPEECH, use_cache=False):
+            pass
+
+    async def _prime_recent_lectures(self) -> Dict[str, Dict]:
+        lecture_ids = self.agent.lecture_context.recent_lectures(self.recent_lectures)
+        if not lecture_ids:
+            return {}
+        logger.info(f"Re-priming {len(lecture_ids)} recent lectures")
+
+        async def prime(lecture_id: str):
+            if not await asyncio.wait_for(self.agent.lecture_context.prime(lecture_id), self.lecture_timeout):
+                raise RuntimeError("prime failed")
+
+        return await self._run_steps([(f"lecture:{lecture_id}", prime(lecture_id)) for lecture_id in lecture_ids])
+
+    async def _describe_table(self, table: str):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: self.agent.dynamodb.meta.client.describe_table(TableName=table))
+
+    @staticmethod
+    async def _repeat(count: int, call):
+        await asyncio.gather(*(call() for _ in range(count)))
+
+    @staticmethod
+    async def _run_steps(steps: List[Tuple[str, object]], timeout: float = None) -> Dict[str, Dict]:
+        """Run steps concurrently; each reports ok, latency_ms and any error"""
+        async def timed(coroutine) -> Dict:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(coroutine, timeout)
+                return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+            except Exception as e:
+                return {
+                    "ok": False,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "error": str(e) or type(e).__name__  # TimeoutError has no message
+                }
+
+        results = await asyncio.gather(*(timed(coroutine) for _, coroutine in steps))
+        return {name: result for (name, _), result in zip(steps, results)}
+
+    @staticmethod
+    def _healthy(steps: Dict[str, Dict]) -> bool:
+        """Every dependency passed (for replica pools: at least one endpoint)"""
+        groups: Dict[str, bool] = {}
+        for name, step in steps.items():
+            group = name.split(":", 1)[0]
+            if group == "lecture":
+                continue
+            if group not in POOLED_DEPENDENCIES:
+                group = name
+            groups[group] = groups.get(group, False) or step["ok"]
+        return all(groups.values())
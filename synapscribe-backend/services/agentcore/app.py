@@ -5,10 +5,16 @@ Main entrypoint for Q&A orchestration
 """
 
 import os
+import json
+import uuid
 import logging
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from agents.query_agent import QueryAgent
+from agents.warmup import WarmupManager
+from utils.metrics import WorkerMetrics, registry
+from utils.session_backends import worker_count
 
 # Configure logging
 logging.basicConfig(
@@ -17,15 +23,84 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up in the background on startup; flush turns and close clients on shutdown"""
+    warmup.start()
+    if worker_metrics is not None:
+        worker_metrics.start()
+    yield
+    await warmup.stop()
+    if worker_metrics is not None:
+        await worker_metrics.stop()
+    await query_agent.close()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="SynapScribe AgentCore",
     description="Q&A orchestration service for SynapScribe MVP",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Initialize QueryAgent
 query_agent = QueryAgent()
+warmup = WarmupManager(query_agent)
+
+# A scrape reaches one worker; with several, /metrics merges every worker's samples
+worker_metrics = WorkerMetrics(registry) if worker_count() > 1 else None
+
+
+def _pool_gauge(field: str):
+    """(pool, endpoint) series from the upstream pools' stats"""
+    def collect():
+        return [
+            ((name, endpoint), float(state[field]))
+            for name, pool in (("vllm", query_agent.vllm.pool), ("gtts", query_agent.gtts.pool))
+            for endpoint, state in pool.stats()["endpoints"].items()
+        ]
+    return collect
+
+
+# Gauges are read at scrape time
+registry.gauge(
+    "synapscribe_ready", "1 once warmup has finished",
+    lambda: 1 if warmup.ready else 0
+)
+registry.gauge(
+    "synapscribe_inflight_queries", "Queries currently streaming an answer",
+    lambda: query_agent.inflight_queries
+)
+registry.gauge(
+    "synapscribe_asr_streams_open", "Open /asr/stream transcriptions",
+    lambda: query_agent.asr_streams.stats()["open"]
+)
+registry.gauge(
+    "synapscribe_session_memory_bytes", "Session store bytes held in memory",
+    lambda: query_agent.session_store.stats().get("memory_bytes", 0)
+)
+registry.gauge(
+    "synapscribe_persist_queued_turns", "Completed turns not yet written to S3/DynamoDB",
+    lambda: query_agent.persister.stats()["queued_turns"]
+)
+registry.gauge(
+    "synapscribe_scheduler_inflight", "vLLM requests holding a scheduler slot",
+    lambda: query_agent.vllm.scheduler.inflight
+)
+registry.gauge(
+    "synapscribe_scheduler_waiting", "vLLM requests queued for a scheduler slot",
+    lambda: query_agent.vllm.scheduler.stats()["waiting"]
+)
+registry.gauge(
+    "synapscribe_upstream_outstanding", "Outstanding requests per upstream endpoint",
+    _pool_gauge("outstanding"), labelnames=("pool", "endpoint")
+)
+registry.gauge(
+    "synapscribe_upstream_ejected", "1 while an upstream endpoint is ejected",
+    _pool_gauge("ejected"), labelnames=("pool", "endpoint")
+)
 
 @app.post("/invoke")
 async def invoke(payload: dict):
@@ -37,8 +112,31 @@ async def invoke(payload: dict):
         "type": "query",
         "sessionId": str,
         "lectureId": str,
-        "s3Key": str,
-        "connectionId": str
+        "s3Key": str (or "asrStreamId": str, see /asr/stream),
+        "connectionId": str,
+        "framing": "ndjson" | "binary" (optional, default "ndjson"),
+        "requestId": str (optional, generated if absent; echoed in every message),
+        "delivery": "stream" | "push" (optional, default "stream"),
+        "apiGatewayEndpoint": str (optional; must match API_GATEWAY_ENDPOINT),
+        "batch": bool (optional, push delivery only; see ConnectionPusher)
+    }
+
+    With push delivery the request is accepted immediately and AgentCore
+    posts the answer stream straight to the WebSocket connection of the
+    API configured in API_GATEWAY_ENDPOINT (push is refused when unset).
+
+    Payload format for lecture context priming (sent on lecture_ready):
+    {
+        "type": "prime_lecture",
+        "lectureId": str,
+        "s3Key": str
+    }
+
+    Payload format for offline lecture transcription (sent on lecture_ready):
+    {
+        "type": "process_lecture",
+        "lectureId": str,
+        "s3Key": str
     }
     """
     try:
@@ -48,22 +146,133 @@ async def invoke(payload: dict):
             raise HTTPException(status_code=400, detail="Missing 'type' field in payload")
 
         if request_type == "query":
+            if bool(payload.get("s3Key")) == bool(payload.get("asrStreamId")):
+                raise HTTPException(status_code=400, detail="Query needs exactly one of s3Key and asrStreamId")
+
+            # Shed load early instead of queueing past the client timeouts
+            if query_agent.vllm.scheduler.is_saturated():
+                raise HTTPException(status_code=429, detail="busy")
+
+            request_id = payload["requestId"] = payload.get("requestId") or str(uuid.uuid4())
+
+            if payload.get("delivery") == "push":
+                try:
+                    query_agent.schedule_push(payload)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                return JSONResponse(
+                    status_code=202,
+                    content={
+                        "status": "accepted",
+                        "connectionId": payload.get("connectionId"),
+                        "requestId": request_id
+                    }
+                )
+
             # Return streaming response for Q&A
+            encoder = query_agent.get_encoder(payload)
             return StreamingResponse(
                 query_agent.process(payload),
-                media_type="application/json"
+                media_type=encoder.media_type,
+                headers={"X-Request-ID": request_id}
             )
+        elif request_type == "prime_lecture":
+            # Warm the lecture prefix in vLLM without blocking the caller
+            query_agent.schedule_lecture_prime(payload)
+            return {"status": "priming", "lectureId": payload.get("lectureId")}
+        elif request_type == "process_lecture":
+            # Build the lecture transcript while the GPU is otherwise idle
+            try:
+                query_agent.schedule_lecture_processing(payload)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return {"status": "processing", "lectureId": payload.get("lectureId")}
         else:
             raise HTTPException(
                 status_code=400,
                 detail=f"Unknown request type: {request_type}"
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in /invoke endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.websocket("/asr/stream")
+async def asr_stream(websocket: WebSocket):
+    """
+    Streaming ASR for query audio, transcribed while the user is speaking
+
+    Client messages:
+    - {"type": "start", "sessionId": str, "streamId": str (optional),
+       "sampleRate": 16000}
+    - binary: raw PCM16 little-endian mono audio at 16 kHz, any chunk size
+    - {"type": "end"}
+
+    Server messages:
+    - {"type": "ready", "streamId": str}
+    - {"type": "segment", "index": int, "text": str} as segments finish
+    - {"type": "final", "streamId": str, "text": str}
+    - {"type": "error", "message": str}
+
+    The query is then answered by /invoke with "asrStreamId": streamId.
+    """
+    await websocket.accept()
+    stream_id = None
+    ended = False
+
+    try:
+        start = await websocket.receive_json()
+        if start.get("type") != "start":
+            raise ValueError("First message must be a start message")
+        if int(start.get("sampleRate", 16000)) != 16000:
+            raise ValueError("Only 16 kHz PCM16 mono audio is supported")
+
+        async def on_segment(index: int, text: str):
+            if not ended:
+                await websocket.send_json({"type": "segment", "index": index, "text": text})
+
+        stream_id, transcriber = query_agent.asr_streams.create(
+            session_id=start.get("sessionId"),
+            stream_id=start.get("streamId"),
+            on_segment=on_segment
+        )
+        await websocket.send_json({"type": "ready", "streamId": stream_id})
+
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                transcriber.feed(message["bytes"])
+            elif message.get("text") is not None:
+                if json.loads(message["text"]).get("type") == "end":
+                    break
+
+        ended = True
+        text = await transcriber.finish()
+        # The query that uses it may be served by another worker
+        await query_agent.asr_streams.publish(stream_id, text)
+        await websocket.send_json({"type": "final", "streamId": stream_id, "text": text})
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        if stream_id and not ended:
+            logger.info(f"ASR stream {stream_id} disconnected before end")
+            query_agent.asr_streams.discard(stream_id)
+    except Exception as e:
+        logger.error(f"Error in /asr/stream: {e}", exc_info=True)
+        if stream_id and not ended:
+            query_agent.asr_streams.discard(stream_id)
+        try:
+            await websocket.send_json({"type": "error", "message": str(e)})
+            await websocket.close()
+        except Exception:
+            pass
+
+
 @app.post("/end_session")
 async def end_session(payload: dict):
     """
@@ -88,6 +297,8 @@ async def end_session(payload: dict):
         result = await query_agent.end_session(payload)
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in /end_session endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -95,7 +306,7 @@ async def end_session(payload: dict):
 
 @app.get("/health")
 async def health():
-    """Health check endpoint"""
+    """Liveness check (the process is up; see /ready for dependencies)"""
     return {
         "status": "healthy",
         "service": "agentcore",
@@ -103,6 +314,39 @@ async def health():
     }
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 until warmup finishes or while a dependency is down, with per-dependency latency"""
+    readiness = await warmup.readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+
+@app.get("/stats")
+async def stats():
+    """Session store and cache counters and usage"""
+    return {
+        "session_store": query_agent.session_store.stats(),
+        "history_cache": query_agent.history_cache.stats(),
+        "context_assembler": query_agent.context_assembler.stats(),
+        "tts_cache": query_agent.gtts.stats(),
+        "answer_cache": query_agent.answer_cache.stats(),
+        "scheduler": query_agent.vllm.scheduler.stats(),
+        "vllm_pool": query_agent.vllm.pool.stats(),
+        "gtts_pool": query_agent.gtts.pool.stats(),
+        "push": query_agent.pusher.stats(),
+        "persister": query_agent.persister.stats(),
+        "turn_table": query_agent.turn_table.stats(),
+        "asr_streams": query_agent.asr_streams.stats()
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms and live gauges (labelled per worker when there are several)"""
+    text = worker_metrics.render() if worker_metrics is not None else registry.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -111,8 +355,12 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "invoke": "/invoke (POST)",
-            "end_session": "/end_session (POST)"
+            "end_session": "/end_session (POST)",
+            "asr_stream": "/asr/stream (WebSocket)",
+            "stats": "/stats",
+            "metrics": "/metrics"
         }
     }
 
@@ -122,12 +370,18 @@ if __name__ == "__main__":
 
     port = int(os.getenv("PORT", 5000))
     host = os.getenv("HOST", "0.0.0.0")
+    # Sessions must be visible to every worker that may serve /end_session
+    workers = worker_count()
+    if workers < int(os.getenv("AGENTCORE_WORKERS", 1)):
+        logger.warning("SESSION_BACKEND=memory keeps sessions per process; running a single worker")
 
-    logger.info(f"Starting AgentCore on {host}:{port}")
+    logger.info(f"Starting AgentCore on {host}:{port} ({workers} workers, "
+                f"{query_agent.session_store.backend} sessions)")
 
     uvicorn.run(
-        app,
+        "app:app" if workers > 1 else app,
         host=host,
         port=port,
+        workers=workers,
         log_level="info"
     )
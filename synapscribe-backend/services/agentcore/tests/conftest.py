@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# AgentCore modules import each other as top-level packages (utils.*, agents.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SESSIONS_TABLE = "SynapScribe-Sessions"
+TURNS_TABLE = "SynapScribe-Turns"
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """In-memory DynamoDB (moto) with the sessions and turns tables of template.yaml"""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    for name, value in {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing",
+                        "AWS_DEFAULT_REGION": "us-east-1"}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+
+    with moto.mock_aws():
+        resource = boto3.resource("dynamodb")
+        resource.create_table(
+            TableName=SESSIONS_TABLE,
+            AttributeDefinitions=[{"AttributeName": "sessionId", "AttributeType": "S"}],
+            KeySchema=[{"AttributeName": "sessionId", "KeyType": "HASH"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        resource.create_table(
+            TableName=TURNS_TABLE,
+            AttributeDefinitions=[
+                {"AttributeName": "sessionId", "AttributeType": "S"},
+                {"AttributeName": "turn", "AttributeType": "N"}
+            ],
+            KeySchema=[
+                {"AttributeName": "sessionId", "KeyType": "HASH"},
+                {"AttributeName": "turn", "KeyType": "RANGE"}
+            ],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        yield resource
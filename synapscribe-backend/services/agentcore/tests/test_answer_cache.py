@@ -0,0 +1,41 @@
+import pytest
+
+from utils.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def cache():
+    cache = AnswerCache(threshold=0.9)
+    cache.store("lecture", "What did the professor say about chapter 3?", "chapter 3 answer")
+    cache.store("lecture", "When was the treaty of Versailles signed?", "1919")
+    return cache
+
+
+@pytest.mark.parametrize("query", [
+    "What did the professor say about chapter 3",
+    "Um, what did the professor say about chapter 3?",
+    "When was the Treaty of Versailles signed",
+])
+def test_rephrasings_hit(cache, query):
+    assert cache.lookup("lecture", query) is not None
+
+
+@pytest.mark.parametrize("query", [
+    "What did the professor say about chapter 4?",
+    "What did the professor say about chapter 13?",
+    "When was the treaty of Versailles not signed?",
+    "When wasn't the treaty of Versailles signed?",
+    "Where was the treaty of Versailles signed?",
+    "When was the treaty of Versailles ratified?",
+])
+def test_near_misses_do_not_hit(cache, query):
+    assert cache.lookup("lecture", query) is None
+
+
+def test_other_lecture_misses(cache):
+    assert cache.lookup("other", "What did the professor say about chapter 3?") is None
+
+
+def test_key_terms_keep_numerals_and_negations():
+    terms = AnswerCache.key_terms(AnswerCache.normalize("Why didn't chapter 3 cover the enzymes?"))
+    assert {"why", "didn", "t", "3", "chapter", "enzyme"} <= terms
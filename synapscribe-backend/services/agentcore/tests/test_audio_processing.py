@@ -0,0 +1,46 @@
+import numpy as np
+
+from utils.audio_processing import SAMPLE_RATE, trim_silence
+
+rng = np.random.default_rng(0)
+
+
+def noise(seconds: float, dbfs: float) -> np.ndarray:
+    return rng.normal(0, 32768 * 10 ** (dbfs / 20), int(SAMPLE_RATE * seconds))
+
+
+def tone(seconds: float, dbfs: float) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return np.sqrt(2) * 32768 * 10 ** (dbfs / 20) * np.sin(2 * np.pi * 220 * t)
+
+
+def pcm(signal: np.ndarray) -> bytes:
+    return np.clip(signal, -32768, 32767).astype("<i2").tobytes()
+
+
+def test_speech_in_white_noise_is_trimmed():
+    for speech_dbfs in (-6, -20):
+        signal = noise(6.0, -40)
+        signal[2 * SAMPLE_RATE:4 * SAMPLE_RATE] += tone(2.0, speech_dbfs)
+        _, stats = trim_silence(pcm(signal))
+        assert 2.0 <= stats["trimmed_seconds"] <= 2.5
+
+
+def test_consonant_next_to_speech_is_kept():
+    signal = np.zeros(3 * SAMPLE_RATE)
+    signal[SAMPLE_RATE - 1600:SAMPLE_RATE] = noise(0.1, -30)  # "s" before a vowel
+    signal[SAMPLE_RATE:2 * SAMPLE_RATE] = tone(1.0, -12)
+    _, stats = trim_silence(pcm(signal))
+    assert stats["trimmed_seconds"] >= 1.1
+
+
+def test_continuous_speech_is_untouched():
+    signal = tone(3.0, -12)
+    trimmed, stats = trim_silence(pcm(signal))
+    assert stats["removed_seconds"] == 0.0
+    assert len(trimmed) == len(pcm(signal))
+
+
+def test_silence_only_returns_none():
+    trimmed, _ = trim_silence(bytes(SAMPLE_RATE * 2))
+    assert trimmed is None
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from utils.bm25_index import BM25Index, write_index
+
+SEGMENTS = [
+    {"start": 0.0, "end": 5.0, "text": "Today we cover cell division."},
+    {"start": 5.0, "end": 12.5, "text": "Mitosis splits one cell into two identical cells."},
+    {"start": 12.5, "end": 20.0, "text": "Meiosis halves the chromosomes for gametes."},
+    {"start": 20.0, "end": 26.0, "text": "Next week: photosynthesis in plants."}
+]
+
+
+def test_search_ranks_matching_segments(tmp_path):
+    path = str(tmp_path / "l1.bm25")
+    write_index(path, SEGMENTS)
+    index = BM25Index(path)
+
+    results = index.search("How does mitosis divide a cell?", k=2)
+
+    assert results[0]["text"] == SEGMENTS[1]["text"]
+    assert (results[0]["start"], results[0]["end"]) == (5.0, 12.5)
+    assert all(result["score"] > 0 for result in results)
+    assert index.search("quantum entanglement") == []
+    index.close()
+    assert os.listdir(tmp_path) == ["l1.bm25"]  # No temporary files left
+
+
+def test_truncated_index_is_rejected(tmp_path):
+    path = tmp_path / "l1.bm25"
+    write_index(str(path), SEGMENTS)
+    path.write_bytes(path.read_bytes()[:-10])
+
+    with pytest.raises(ValueError):
+        BM25Index(str(path))
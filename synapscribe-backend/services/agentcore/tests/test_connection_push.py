@@ -0,0 +1,23 @@
+import pytest
+
+from utils.connection_push import ConnectionPusher
+
+ENDPOINT = "abc123.execute-api.us-east-1.amazonaws.com/Prod"
+
+
+def test_push_goes_to_the_configured_api_only():
+    pusher = ConnectionPusher(endpoint=ENDPOINT)
+    assert pusher.resolve_endpoint(ENDPOINT) == ENDPOINT
+    assert pusher.resolve_endpoint(f"https://{ENDPOINT}/") == ENDPOINT
+    assert pusher.resolve_endpoint(None) == ENDPOINT
+    with pytest.raises(ValueError):
+        pusher.resolve_endpoint("evil.execute-api.us-east-1.amazonaws.com/Prod")
+    pusher.close()
+
+
+def test_push_is_refused_without_a_configured_api(monkeypatch):
+    monkeypatch.delenv("API_GATEWAY_ENDPOINT", raising=False)
+    pusher = ConnectionPusher()
+    with pytest.raises(ValueError):
+        pusher.resolve_endpoint(ENDPOINT)
+    pusher.close()
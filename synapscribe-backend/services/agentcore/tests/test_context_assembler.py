@@ -0,0 +1,66 @@
+import asyncio
+
+from agents.context_assembler import SUMMARY_INTRO_TEXT, ContextAssembler
+
+
+class FakeVLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def summarize(self, prompt, max_tokens=256, session_id=None):
+        self.prompts.append(prompt)
+        return f"summary {len(self.prompts)}"
+
+
+def history(turns):
+    messages = []
+    for index in range(turns):
+        messages.append({"role": "user", "content": f"question {index} " + "word " * 40})
+        messages.append({"role": "assistant", "content": f"answer {index} " + "word " * 40})
+    return messages
+
+
+def assembler(monkeypatch, budget=300, recent_turns=6):
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", str(budget))
+    monkeypatch.setenv("HISTORY_RECENT_TURNS", str(recent_turns))
+    monkeypatch.delenv("TOKENIZER_PATH", raising=False)
+    return ContextAssembler(FakeVLLM())
+
+
+def test_newest_turns_within_budget_are_kept(monkeypatch):
+    async def run():
+        context = assembler(monkeypatch)
+        messages, tokens = context.assemble("s1", history(10))
+        await context.close()
+        return messages, tokens
+
+    messages, tokens = asyncio.run(run())
+    assert 0 < len(messages) < 20
+    assert messages[-1]["content"].startswith("answer 9")
+    assert messages[0]["role"] == "user"
+    assert tokens <= 300
+
+
+def test_short_history_is_sent_unchanged(monkeypatch):
+    context = assembler(monkeypatch, budget=10000)
+    messages, _ = context.assemble("s1", history(3))
+    assert messages == history(3)
+    assert context.stats()["summarizing"] == 0
+
+
+def test_dropped_turns_come_back_as_a_rolling_summary(monkeypatch):
+    async def run():
+        context = assembler(monkeypatch)
+        first, _ = context.assemble("s1", history(10))  # Summary not ready yet
+        await asyncio.gather(*context._tasks.values())
+        second, tokens = context.assemble("s1", history(12))
+        await asyncio.gather(*context._tasks.values())
+        return first, second, tokens, context
+
+    first, second, tokens, context = asyncio.run(run())
+    assert SUMMARY_INTRO_TEXT not in first[0]["content"]
+    assert second[0]["content"] == SUMMARY_INTRO_TEXT + "\n\nsummary 1"
+    assert tokens <= 300
+    # The second summary extends the first instead of re-reading every turn
+    assert "summary 1" in context.vllm.prompts[1]
+    assert "question 0 " not in context.vllm.prompts[1]
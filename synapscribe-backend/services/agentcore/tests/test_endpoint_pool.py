@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from utils.endpoint_pool import EndpointPool, UpstreamError
+
+ENDPOINTS = ["http://a:8000", "http://b:8000", "http://c:8000"]
+
+
+def test_lecture_sticks_to_its_replica_until_overloaded():
+    pool = EndpointPool(ENDPOINTS, overload_threshold=2)
+    owner = pool.pick("lecture-1")
+    assert all(pool.pick("lecture-1") == owner for _ in range(5))
+
+    pool.outstanding[owner] = 2
+    assert pool.pick("lecture-1") != owner
+
+
+def test_adding_a_replica_moves_few_lectures():
+    keys = [f"lecture-{i}" for i in range(300)]
+    before = EndpointPool(ENDPOINTS)
+    after = EndpointPool(ENDPOINTS + ["http://d:8000"])
+    moved = sum(before.pick(key) != after.pick(key) for key in keys)
+    assert moved < len(keys) / 2
+
+
+def test_failing_replica_is_ejected():
+    pool = EndpointPool(ENDPOINTS, failure_threshold=2, ejection_seconds=60)
+    owner = pool.pick("lecture-1")
+
+    async def fail():
+        with pytest.raises(UpstreamError):
+            async with pool.endpoint("lecture-1"):
+                raise UpstreamError("vLLM API error: 503", 503)
+
+    for _ in range(2):
+        asyncio.run(fail())
+
+    assert pool.stats()["endpoints"][owner]["ejected"]
+    assert pool.pick("lecture-1") != owner
+    assert all(state["outstanding"] == 0 for state in pool.stats()["endpoints"].values())
+
+
+def test_client_errors_do_not_eject():
+    pool = EndpointPool(ENDPOINTS, failure_threshold=1)
+
+    async def bad_request():
+        with pytest.raises(UpstreamError):
+            async with pool.endpoint("lecture-1"):
+                raise UpstreamError("vLLM API error: 400", 400)
+
+    asyncio.run(bad_request())
+    assert pool.stats()["ejections"] == 0
@@ -0,0 +1,52 @@
+import asyncio
+
+from utils.history_cache import HistoryCache
+
+
+class Loader:
+    def __init__(self, turns):
+        self.turns = turns
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        messages = []
+        for index in range(self.turns):
+            messages.append({"role": "user", "content": f"q{index}"})
+            messages.append({"role": "assistant", "content": f"a{index}"})
+        return messages
+
+
+def test_warm_lookups_skip_the_loader():
+    cache = HistoryCache(max_turns=3)
+    loader = Loader(turns=5)
+
+    async def run():
+        cold = await asyncio.gather(*(cache.get("s1", loader, version=5) for _ in range(3)))
+        cache.append("s1", "q5", "a5", version=6)
+        return cold, await cache.get("s1", loader, version=6)
+
+    cold, warm = asyncio.run(run())
+    assert loader.calls == 1  # Concurrent misses share one load
+    assert cold[0] is cold[1] is cold[2]
+    assert [message["content"] for message in warm] == ["q3", "a3", "q4", "a4", "q5", "a5"]
+
+
+def test_turn_written_by_another_worker_forces_a_reload():
+    cache = HistoryCache(max_turns=10)
+    loader = Loader(turns=2)
+
+    async def run():
+        await cache.get("s1", loader, version=2)
+        # Another worker appended turn 3; this worker's cached entry is stale
+        loader.turns = 3
+        reloaded = await cache.get("s1", loader, version=3)
+        # This worker appends turn 5 after missing turn 4: the entry is dropped
+        cache.append("s1", "q4", "a4", version=5)
+        return reloaded, cache.stats()
+
+    reloaded, stats = asyncio.run(run())
+    assert loader.calls == 2
+    assert len(reloaded) == 6
+    assert stats["sessions"] == 0
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+
+from agents.lecture_context import TRANSCRIPT_INTRO_TEXT, LectureContextManager
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects
+
+    async def download_file(self, bucket, key, filename):
+        with open(filename, "wb") as f:
+            f.write(self.objects[key])
+
+    async def get_object_bytes(self, bucket, key):
+        return self.objects[key]
+
+
+class FakeTable:
+    def __init__(self, items):
+        self.items = items
+
+    def get_item(self, Key):
+        item = self.items.get(Key["sessionId"])
+        return {"Item": dict(item)} if item else {}
+
+
+class FakeDynamoDB:
+    def __init__(self, items):
+        self.table = FakeTable(items)
+
+    def Table(self, name):
+        return self.table
+
+
+class FakeVLLM:
+    async def prime_prefix(self, prefix, lecture_id=None):
+        pass
+
+
+TRANSCRIPT = {"segments": [{"start": 0.0, "end": 5.0, "text": "Cells divide by mitosis."}]}
+
+
+def workers(tmp_path, monkeypatch, count=2):
+    monkeypatch.setenv("LECTURE_CACHE_DIR", str(tmp_path / "lectures"))
+    monkeypatch.setenv("LECTURE_INDEX_DIR", str(tmp_path / "indexes"))
+    monkeypatch.setenv("LECTURE_TRANSCRIPT_CHECK_SECONDS", "0.01")
+    objects = {"lectures/l1.mp3": b"ID3 audio", "transcripts/l1.json": json.dumps(TRANSCRIPT).encode()}
+    items = {"lecture-l1": {"status": "ready", "s3Key": "lectures/l1.mp3"}}
+    managers = [
+        LectureContextManager(FakeS3(objects), FakeDynamoDB(items), FakeVLLM(), "bucket", "sessions")
+        for _ in range(count)
+    ]
+    return managers, items
+
+
+def is_transcript(prefix):
+    return any(TRANSCRIPT_INTRO_TEXT in str(message["content"]) for message in prefix)
+
+
+def test_other_workers_pick_up_the_transcript(tmp_path, monkeypatch):
+    async def run():
+        (pipeline_worker, other), items = workers(tmp_path, monkeypatch)
+        await pipeline_worker.get_prefix("l1")
+        assert not is_transcript(await other.get_prefix("l1"))
+
+        items["lecture-l1"].update(transcriptStatus="ready", transcriptKey="transcripts/l1.json")
+        pipeline_worker.transcript_check_seconds = 0.05
+        await pipeline_worker.use_transcript("l1", TRANSCRIPT)
+
+        # The other worker keeps a usable prefix until it switches itself
+        await asyncio.sleep(0.02)
+        await other.get_prefix("l1")
+        await asyncio.gather(*other._background, return_exceptions=True)
+        switched = is_transcript(await other.get_prefix("l1"))
+
+        await asyncio.sleep(0.15)  # Audio removal after the grace period
+        return switched, os.listdir(tmp_path / "lectures")
+
+    switched, files = asyncio.run(run())
+    assert switched
+    assert "l1.mp3" not in files
+
+
+def test_evicting_a_lecture_keeps_audio_other_workers_use(tmp_path, monkeypatch):
+    async def run():
+        (first, second), _ = workers(tmp_path, monkeypatch)
+        first.max_lectures = 0  # Evict immediately
+        await second.get_prefix("l1")
+        await first.get_prefix("l1")
+        prefix = await second.get_prefix("l1")
+        return prefix, os.listdir(tmp_path / "lectures")
+
+    prefix, files = asyncio.run(run())
+    assert "l1.mp3" in files
+    assert not is_transcript(prefix)
+
+
+def test_missing_audio_is_fetched_again(tmp_path, monkeypatch):
+    async def run():
+        (worker,), _ = workers(tmp_path, monkeypatch, count=1)
+        await worker.get_prefix("l1")
+        os.remove(tmp_path / "lectures" / "l1.mp3")
+        await worker.get_prefix("l1")
+        return os.listdir(tmp_path / "lectures")
+
+    files = asyncio.run(run())
+    assert "l1.mp3" in files
+    assert not any(name.endswith(".part") for name in files)
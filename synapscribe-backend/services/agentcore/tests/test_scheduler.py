@@ -0,0 +1,53 @@
+import asyncio
+
+from utils.scheduler import RequestScheduler
+
+
+def test_batch_work_leaves_live_slots_free():
+    async def run():
+        scheduler = RequestScheduler(max_window=8, min_window=2, live_reserve=2)
+        batch = [asyncio.create_task(scheduler.acquire("batch", "lecture")) for _ in range(10)]
+        await asyncio.sleep(0)
+        admitted_batch = scheduler.background_inflight
+
+        # Live requests are admitted at once despite the queued batch work
+        for _ in range(2):
+            await asyncio.wait_for(scheduler.acquire("qa", "session"), timeout=0.1)
+        live_inflight = scheduler.inflight - scheduler.background_inflight
+
+        for task in batch:
+            task.cancel()
+        await asyncio.gather(*batch, return_exceptions=True)
+        return admitted_batch, live_inflight
+
+    admitted_batch, live_inflight = asyncio.run(run())
+    assert admitted_batch == 6
+    assert live_inflight == 2
+
+
+def test_batch_gets_one_slot_when_window_is_small():
+    async def run():
+        scheduler = RequestScheduler(max_window=2, min_window=2, live_reserve=2)
+        await asyncio.wait_for(scheduler.acquire("batch"), timeout=0.1)
+        second = asyncio.create_task(scheduler.acquire("batch"))
+        await asyncio.sleep(0)
+        queued = not second.done()
+
+        scheduler.release("batch")
+        await asyncio.wait_for(second, timeout=0.1)
+        return queued, scheduler.background_inflight
+
+    queued, background = asyncio.run(run())
+    assert queued
+    assert background == 1
+
+
+def test_limits_are_split_between_workers():
+    single = RequestScheduler(max_window=8, min_window=2, max_queue=32, live_reserve=2, replicas=1)
+    shared = RequestScheduler(max_window=8, min_window=2, max_queue=32, live_reserve=2, replicas=1, workers=2)
+    assert (shared.max_window, shared.min_window, shared.live_reserve, shared.max_queue) == (4, 1, 1, 16)
+    assert shared.window == single.window // 2
+
+    # Every worker keeps at least one slot
+    crowded = RequestScheduler(max_window=8, min_window=2, live_reserve=2, workers=16)
+    assert crowded.max_window == crowded.min_window == 1
@@ -0,0 +1,127 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from utils.audio_processing import SAMPLE_RATE
+from utils.session_backends import SQLiteSessionStore
+from utils.streaming_asr import StreamingASRRegistry, StreamingTranscriber
+
+
+class FakeVLLM:
+    """Transcribes a WAV as the number of seconds of audio it holds"""
+
+    def __init__(self):
+        self.segments = []
+
+    async def transcribe_audio(self, wav: bytes, mime_type: str = None, session_id: str = None) -> str:
+        seconds = (len(wav) - 44) / 2 / SAMPLE_RATE
+        self.segments.append(seconds)
+        return f"{seconds:.1f}s"
+
+
+def tone(seconds: float, amplitude: int = 8000) -> bytes:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype("<i2").tobytes()
+
+
+def silence(seconds: float) -> bytes:
+    return bytes(int(SAMPLE_RATE * seconds) * 2)
+
+
+def transcribe(pcm: bytes, chunk: int = 3200):
+    async def run():
+        vllm = FakeVLLM()
+        transcriber = StreamingTranscriber(
+            vllm, min_silence_seconds=0.5, min_segment_seconds=2, max_segment_seconds=15
+        )
+        for start in range(0, len(pcm), chunk):
+            transcriber.feed(pcm[start:start + chunk])
+        return await transcriber.finish(), vllm.segments
+    return asyncio.run(run())
+
+
+def test_audio_starting_with_speech_is_transcribed():
+    text, segments = transcribe(tone(1.5))
+    assert text
+    assert sum(segments) >= 1.4
+
+
+def test_speech_after_silent_lead_in_is_transcribed():
+    text, segments = transcribe(silence(0.05) + tone(1.5))
+    assert text
+    assert sum(segments) >= 1.5
+
+
+def test_no_audio_dropped_before_speech():
+    _, segments = transcribe(silence(1.0) + tone(1.0))
+    assert sum(segments) >= 1.9
+
+
+def test_silence_only_returns_empty_transcript():
+    text, segments = transcribe(silence(2.0))
+    assert text == ""
+    assert segments == []
+
+
+def test_pause_splits_segments():
+    text, segments = transcribe(tone(2.5) + silence(0.8) + tone(1.0))
+    assert len(segments) == 2
+    assert text.count("s") == 2
+
+
+def test_transcript_reaches_query_on_another_worker(tmp_path):
+    async def run():
+        path = str(tmp_path / "sessions.db")
+        socket_worker = StreamingASRRegistry(FakeVLLM(), store=SQLiteSessionStore(path))
+        query_worker = StreamingASRRegistry(FakeVLLM(), store=SQLiteSessionStore(path))
+
+        stream_id, transcriber = socket_worker.create(session_id="s1")
+        query = asyncio.create_task(query_worker.take(stream_id))
+        transcriber.feed(tone(1.5))
+        text = await transcriber.finish()
+        await socket_worker.publish(stream_id, text)
+        return text, await asyncio.wait_for(query, timeout=5), socket_worker.stats()
+
+    text, taken, stats = asyncio.run(run())
+    assert taken == text != ""
+    assert stats["open"] == 0
+
+
+def test_local_query_does_not_publish(tmp_path):
+    async def run():
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        registry = StreamingASRRegistry(FakeVLLM(), store=store)
+
+        stream_id, transcriber = registry.create()
+        query = asyncio.create_task(registry.take(stream_id))
+        await asyncio.sleep(0)
+        transcriber.feed(tone(1.5))
+        text = await transcriber.finish()
+        await registry.publish(stream_id, text)
+        return text, await query, await store.take_stream_text(stream_id)
+
+    text, taken, leftover = asyncio.run(run())
+    assert taken == text
+    assert leftover is None
+
+
+def test_stream_audio_is_capped():
+    async def run():
+        transcriber = StreamingTranscriber(FakeVLLM(), max_stream_seconds=1)
+        transcriber.feed(tone(0.9))
+        with pytest.raises(ValueError):
+            transcriber.feed(tone(0.2))
+        return transcriber.audio_bytes
+
+    assert asyncio.run(run()) == len(tone(0.9))
+
+
+def test_open_streams_are_capped():
+    registry = StreamingASRRegistry(FakeVLLM())
+    registry.max_open = 2
+    registry.create()
+    registry.create()
+    with pytest.raises(ValueError):
+        registry.create()
+    assert registry.stats()["rejected"] == 1
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from utils.tts_cache import TTSCache
+
+
+def test_waiters_take_over_when_leader_is_cancelled(tmp_path):
+    async def run():
+        cache = TTSCache(disk_dir=str(tmp_path))
+        started = asyncio.Event()
+        calls = []
+
+        async def synthesize():
+            calls.append(len(calls))
+            started.set()
+            await asyncio.sleep(0.05 if len(calls) > 1 else 10)
+            return b"audio"
+
+        leader = asyncio.create_task(cache.get_or_create("key", synthesize))
+        await started.wait()
+        waiters = [asyncio.create_task(cache.get_or_create("key", synthesize)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        results = await asyncio.gather(*waiters)
+        return results, len(calls)
+
+    results, calls = asyncio.run(run())
+    assert results == [b"audio"] * 3
+    assert calls == 2  # One waiter synthesized again, the others joined it
+
+
+def test_concurrent_disk_writes_of_one_key(tmp_path):
+    cache = TTSCache(disk_dir=str(tmp_path))
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                cache._write_file("ab" * 32, b"x" * 1024)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert not list(tmp_path.rglob("*.part"))
@@ -0,0 +1,81 @@
+import asyncio
+
+from utils.turn_persister import TurnPersister
+
+
+class FakeS3:
+    def __init__(self):
+        self.keys = []
+
+    async def put_object(self, Bucket, Key, Body, ContentType):
+        self.keys.append(Key)
+
+
+class FakeTurnTable:
+    MAX_BATCH_ITEMS = 25
+    retention_days = 7
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.next_turn = {}
+        self.batches = []
+
+    async def allocate_turn(self, session_id):
+        await asyncio.sleep(0.001)  # Let later submits race for the counter
+        self.next_turn[session_id] = self.next_turn.get(session_id, 0) + 1
+        return self.next_turn[session_id]
+
+    def item(self, session_id, lecture_id, entry):
+        return {"sessionId": session_id, **entry}
+
+    async def put_items(self, items):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("ProvisionedThroughputExceededException")
+        self.batches.append(items)
+
+
+def qa(index):
+    return {"turn_id": f"t{index}", "query_text": f"q{index}", "response_text": f"a{index}", "timestamp": "now"}
+
+
+def persister(turn_table, s3=None):
+    return TurnPersister(s3 or FakeS3(), None, turn_table, "bucket", "sessions", batch_window=0.02)
+
+
+def test_turns_of_several_sessions_share_one_batch_write():
+    turn_table = FakeTurnTable()
+    s3 = FakeS3()
+
+    async def run():
+        writer = persister(turn_table, s3)
+        for index in range(3):
+            writer.submit("s1", "l1", qa(index), b"mp3")
+        writer.submit("s2", "l1", qa(3), b"")
+        flushed = await writer.flush("s1") and await writer.flush("s2")
+        await writer.close()
+        return flushed, writer.stats()
+
+    flushed, stats = asyncio.run(run())
+    assert flushed
+    assert len(turn_table.batches) == 1
+    s1 = [item for item in turn_table.batches[0] if item["sessionId"] == "s1"]
+    assert [(item["turn"], item["turnId"]) for item in s1] == [(1, "t0"), (2, "t1"), (3, "t2")]
+    assert sorted(s3.keys) == [f"responses/s1/response-{turn}.mp3" for turn in (1, 2, 3)]
+    assert (stats["written"], stats["queued_turns"]) == (4, 0)
+
+
+def test_failed_write_is_retried_before_flush_returns():
+    turn_table = FakeTurnTable(failures=1)
+
+    async def run():
+        writer = persister(turn_table)
+        writer.submit("s1", "l1", qa(0), b"")
+        flushed = await writer.flush("s1")
+        await writer.close()
+        return flushed, writer.stats()
+
+    flushed, stats = asyncio.run(run())
+    assert flushed
+    assert turn_table.batches[0][0]["queryText"] == "q0"
+    assert (stats["retries"], stats["written"], stats["failed"]) == (1, 1, 0)
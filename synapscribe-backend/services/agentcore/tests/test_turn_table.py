@@ -0,0 +1,67 @@
+import asyncio
+
+from conftest import SESSIONS_TABLE, TURNS_TABLE
+from utils.turn_table import TurnTable
+
+
+def turn_table(dynamodb):
+    return TurnTable(dynamodb, sessions_table=SESSIONS_TABLE, turns_table=TURNS_TABLE)
+
+
+def entry(turn):
+    return {"turn": turn, "turnId": f"t{turn}", "queryText": f"q{turn}", "responseText": f"a{turn}"}
+
+
+def test_turn_numbers_never_repeat(dynamodb):
+    table = turn_table(dynamodb)
+
+    async def run():
+        first = [await table.allocate_turn("s1") for _ in range(3)]
+        concurrent = await asyncio.gather(*(table.allocate_turn("s1") for _ in range(5)))
+        return first, concurrent
+
+    first, concurrent = asyncio.run(run())
+    assert first == [1, 2, 3]
+    assert sorted(concurrent) == [4, 5, 6, 7, 8]
+
+
+def test_counter_continues_after_existing_turns(dynamodb):
+    table = turn_table(dynamodb)
+
+    async def run():
+        await table.put_items([table.item("s1", "l1", entry(turn)) for turn in (1, 2)])
+        return await table.allocate_turn("s1")
+
+    assert asyncio.run(run()) == 3
+
+
+def test_recent_returns_the_newest_turns(dynamodb):
+    table = turn_table(dynamodb)
+
+    async def run():
+        await table.put_items([table.item("s1", "l1", entry(turn)) for turn in range(1, 31)])
+        return await table.recent("s1", limit=3), await table.count("s1")
+
+    recent, count = asyncio.run(run())
+    assert recent == {28: ("q28", "a28", "t28"), 29: ("q29", "a29", "t29"), 30: ("q30", "a30", "t30")}
+    assert count == 30
+
+
+def test_legacy_conversation_is_read_and_migrated(dynamodb):
+    dynamodb.Table(SESSIONS_TABLE).put_item(Item={
+        "sessionId": "s1",
+        "lectureId": "l1",
+        "conversation": [{"queryText": f"q{turn}", "responseText": f"a{turn}"} for turn in (1, 2, 3)]
+    })
+    table = turn_table(dynamodb)
+
+    async def run():
+        legacy = await table.recent("s1", limit=2)
+        await asyncio.gather(*table._migrations.values())
+        return legacy, await table.recent("s1", limit=2), await table.allocate_turn("s1")
+
+    legacy, migrated, next_turn = asyncio.run(run())
+    assert legacy == {2: ("q2", "a2", None), 3: ("q3", "a3", None)}
+    assert {turn: texts[:2] for turn, texts in migrated.items()} == {2: ("q2", "a2"), 3: ("q3", "a3")}
+    assert "conversation" not in dynamodb.Table(SESSIONS_TABLE).get_item(Key={"sessionId": "s1"})["Item"]
+    assert next_turn == 4
@@ -0,0 +1,27 @@
+import asyncio
+
+from utils.vllm_client import VLLMClient
+
+LOCAL = "http://localhost:8000"
+REMOTE = "http://10.0.0.2:8000"
+
+
+def lecture_messages(path):
+    return [{"role": "user", "content": [{"type": "audio_url", "audio_url": {"url": f"file://{path}"}}]}]
+
+
+def test_audio_is_inlined_only_for_remote_replicas(tmp_path):
+    audio = tmp_path / "lecture.mp3"
+    audio.write_bytes(b"ID3 audio")
+    messages = lecture_messages(audio)
+    client = VLLMClient(f"{LOCAL},{REMOTE}")
+
+    async def run():
+        local = await client._messages_for(LOCAL, messages)
+        assert not client._inline_parts  # Nothing encoded for the local replica
+        remote = await client._messages_for(REMOTE, messages)
+        return local, remote
+
+    local, remote = asyncio.run(run())
+    assert local is messages
+    assert remote[0]["content"][0]["audio_url"]["url"].startswith("data:audio/mpeg;base64,")
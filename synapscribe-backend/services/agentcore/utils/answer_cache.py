@@ -0,0 +1,219 @@
+"""
+Per-lecture answer cache
+Reuses answers to near-duplicate questions via a character n-gram cosine index
+"""
+
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Spoken fillers that ASR transcribes but that do not change the question
+_FILLER_WORDS = {"um", "uh", "erm", "er", "hmm", "ah", "okay", "ok", "please", "so", "well"}
+
+# Words that refer back to earlier turns; with history present, a question
+# containing them may mean something different than the same words alone
+_CONTEXT_WORDS = {
+    "it", "its", "that", "this", "those", "these", "they", "them", "he", "she",
+    "him", "her", "again", "earlier", "previous", "previously", "above", "before",
+    "more", "else", "another", "also", "same"
+}
+
+# Function words that can differ between phrasings of the same question;
+# every other word (numerals, negations, wh-words included) must match
+_STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "being", "am",
+    "do", "does", "did", "can", "could", "would", "should", "will", "shall", "may", "might",
+    "i", "me", "my", "we", "our", "us", "you", "your",
+    "of", "to", "in", "on", "at", "for", "about", "with", "by", "from", "into",
+    "and", "or", "there", "here", "just", "really", "tell", "s"
+}
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _Entry:
+    __slots__ = ("normalized", "terms", "vector", "norm", "answer", "created_at")
+
+    def __init__(self, normalized: str, terms: frozenset, vector: Counter, answer: str):
+        self.normalized = normalized
+        self.terms = terms
+        self.vector = vector
+        self.norm = math.sqrt(sum(count * count for count in vector.values()))
+        self.answer = answer
+        self.created_at = time.monotonic()
+
+
+class _LectureIndex:
+    """Entries for one lecture plus an n-gram -> entry inverted index"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()  # normalized -> entry, LRU
+        self.postings: Dict[str, set] = {}
+
+    def add(self, entry: _Entry):
+        self.remove(entry.normalized)
+        self.entries[entry.normalized] = entry
+        for gram in entry.vector:
+            self.postings.setdefault(gram, set()).add(entry.normalized)
+
+    def remove(self, normalized: str):
+        entry = self.entries.pop(normalized, None)
+        if entry is None:
+            return
+        for gram in entry.vector:
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(normalized)
+                if not keys:
+                    del self.postings[gram]
+
+
+class AnswerCache:
+    """
+    Answer cache keyed by lecture and normalized query text
+
+    Queries are normalized (case, punctuation, fillers). A stored query is
+    a candidate only if both have the same key terms: every word except
+    function words, so numerals ("chapter 3" vs "chapter 4"), negations
+    ("signed" vs "not signed") and content words must match exactly.
+    Candidates are then compared by cosine similarity of character n-gram
+    counts, and a lookup returns the stored answer when the best match is
+    at or above the threshold. Entries expire after ttl_seconds; each
+    lecture keeps at most max_entries (LRU).
+    """
+
+    def __init__(
+        self,
+        threshold: float = None,
+        ttl_seconds: int = None,
+        max_entries: int = None,
+        max_lectures: int = None,
+        ngram: int = 3
+    ):
+        self.threshold = threshold or float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.9'))
+        self.ttl_seconds = ttl_seconds or int(os.getenv('ANSWER_CACHE_TTL_SECONDS', '86400'))
+        self.max_entries = max_entries or int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '256'))
+        self.max_lectures = max_lectures or int(os.getenv('ANSWER_CACHE_MAX_LECTURES', '64'))
+        self.ngram = ngram
+
+        self._lectures: "OrderedDict[str, _LectureIndex]" = OrderedDict()
+
+        self.counters = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+    def lookup(self, lecture_id: str, query: str, has_history: bool = False) -> Optional[str]:
+        """Return a cached answer for a near-duplicate query, or None"""
+        normalized = self.normalize(query)
+        if not normalized or self._depends_on_history(normalized, has_history):
+            self.counters["bypassed"] += 1
+            return None
+
+        index = self._lectures.get(lecture_id)
+        if index is None:
+            self.counters["misses"] += 1
+            return None
+        self._lectures.move_to_end(lecture_id)
+
+        vector = self._vectorize(normalized)
+        best, score = self._best_match(index, normalized, self.key_terms(normalized), vector)
+        if best is None or score < self.threshold:
+            self.counters["misses"] += 1
+            return None
+
+        index.entries.move_to_end(best.normalized)
+        self.counters["hits"] += 1
+        logger.info(f"Answer cache hit for lecture {lecture_id} (similarity {score:.3f})")
+        return best.answer
+
+    def store(self, lecture_id: str, query: str, answer: str, has_history: bool = False):
+        """Cache an answer unless the query depends on conversation history"""
+        normalized = self.normalize(query)
+        if not normalized or not answer or self._depends_on_history(normalized, has_history):
+            return
+
+        index = self._lectures.get(lecture_id)
+        if index is None:
+            index = self._lectures[lecture_id] = _LectureIndex()
+            while len(self._lectures) > self.max_lectures:
+                self._lectures.popitem(last=False)
+        self._lectures.move_to_end(lecture_id)
+
+        index.add(_Entry(normalized, self.key_terms(normalized), self._vectorize(normalized), answer))
+        self.counters["stores"] += 1
+
+        while len(index.entries) > self.max_entries:
+            oldest = next(iter(index.entries))
+            index.remove(oldest)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "lectures": len(self._lectures),
+            "entries": sum(len(index.entries) for index in self._lectures.values())
+        }
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        text = _NON_WORD.sub(" ", query.lower())
+        words = [word for word in _WHITESPACE.split(text) if word and word not in _FILLER_WORDS]
+        return " ".join(words)
+
+    @staticmethod
+    def key_terms(normalized: str) -> frozenset:
+        """Words that must match for two queries to be the same question (plural "s" ignored)"""
+        terms = set()
+        for word in normalized.split():
+            if word in _STOP_WORDS:
+                continue
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            terms.add(word)
+        return frozenset(terms)
+
+    def _depends_on_history(self, normalized: str, has_history: bool) -> bool:
+        if not has_history:
+            return False
+        return any(word in _CONTEXT_WORDS for word in normalized.split())
+
+    def _vectorize(self, normalized: str) -> Counter:
+        padded = f" {normalized} "
+        n = self.ngram
+        return Counter(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+    def _best_match(self, index: _LectureIndex, normalized: str, terms: frozenset, vector: Counter):
+        """Highest-cosine live entry with the query's key terms"""
+        now = time.monotonic()
+
+        exact = index.entries.get(normalized)
+        if exact is not None and now - exact.created_at < self.ttl_seconds:
+            return exact, 1.0
+
+        candidates = set()
+        for gram in vector:
+            candidates.update(index.postings.get(gram, ()))
+
+        norm = math.sqrt(sum(count * count for count in vector.values()))
+        best, best_score = None, 0.0
+        for key in candidates:
+            entry = index.entries[key]
+            if now - entry.created_at >= self.ttl_seconds or entry.terms != terms:
+                continue
+            dot = sum(count * entry.vector.get(gram, 0) for gram, count in vector.items())
+            score = dot / (norm * entry.norm) if norm and entry.norm else 0.0
+            if score > best_score:
+                best, best_score = entry, score
+
+        # Drop expired entries encountered during the scan
+        for key in [k for k in candidates if now - index.entries[k].created_at >= self.ttl_seconds]:
+            index.remove(key)
+
+        return best, best_score
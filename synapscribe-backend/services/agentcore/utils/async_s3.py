@@ -0,0 +1,71 @@
+"""
+Async S3 client for AgentCore
+Runs boto3 S3 calls on a dedicated thread pool so they never block the event loop
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncS3Client:
+    """Executor-backed async wrapper around a pooled boto3 S3 client"""
+
+    def __init__(self, max_workers: int = None, read_chunk_size: int = 256 * 1024):
+        self.max_workers = max_workers or int(os.getenv('S3_MAX_WORKERS', '16'))
+        self.read_chunk_size = read_chunk_size
+
+        # One HTTP connection per worker thread (boto3 clients are thread-safe)
+        self.s3 = boto3.client(
+            's3',
+            config=Config(max_pool_connections=self.max_workers)
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='s3'
+        )
+        logger.info(f"AsyncS3Client initialized with {self.max_workers} workers")
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def get_object_bytes(self, bucket: str, key: str) -> bytes:
+        """Stream an object into memory and return its bytes"""
+        data = await self._run(self._read_object, bucket, key)
+        logger.info(f"Read s3://{bucket}/{key} ({len(data)} bytes)")
+        return data
+
+    async def download_file(self, bucket: str, key: str, filename: str):
+        """Download an object to a local file"""
+        await self._run(self.s3.download_file, Bucket=bucket, Key=key, Filename=filename)
+
+    async def put_object(self, **kwargs) -> dict:
+        """Upload an object (same arguments as boto3 put_object)"""
+        return await self._run(self.s3.put_object, **kwargs)
+
+    async def head_bucket(self, bucket: str) -> dict:
+        """Check the bucket is reachable (also opens a pooled connection)"""
+        return await self._run(self.s3.head_bucket, Bucket=bucket)
+
+    def close(self):
+        """Shut down the worker pool"""
+        self.executor.shutdown(wait=False)
+
+    def _read_object(self, bucket: str, key: str) -> bytes:
+        response = self.s3.get_object(Bucket=bucket, Key=key)
+        body = response['Body']
+        buffer = bytearray()
+        try:
+            for chunk in body.iter_chunks(chunk_size=self.read_chunk_size):
+                buffer.extend(chunk)
+        finally:
+            body.close()
+        return bytes(buffer)
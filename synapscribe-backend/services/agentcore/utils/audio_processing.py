@@ -0,0 +1,240 @@
+"""
+Audio processing helpers for AgentCore
+ffmpeg decoding to 16 kHz mono PCM, energy-based silence splitting and trimming, WAV packing
+"""
+
+import asyncio
+import io
+import logging
+import os
+import wave
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # What the Qwen2.5-Omni audio encoder expects
+FRAME_SECONDS = 0.03
+
+
+async def decode_to_pcm(path: str, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Decode any ffmpeg-readable file to 16-bit little-endian mono PCM"""
+    pcm = await _run_ffmpeg(path, None, sample_rate)
+    logger.info(f"Decoded {path}: {len(pcm) / 2 / sample_rate:.1f}s at {sample_rate} Hz")
+    return pcm
+
+
+async def decode_bytes_to_pcm(data: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Decode in-memory audio (piped through ffmpeg) to 16-bit mono PCM"""
+    return await _run_ffmpeg('pipe:0', data, sample_rate)
+
+
+async def _run_ffmpeg(source: str, data: Optional[bytes], sample_rate: int) -> bytes:
+    ffmpeg = os.getenv('FFMPEG_PATH', 'ffmpeg')
+    # -nostdin only when stdin is not the input itself
+    interactive = ['-nostdin'] if data is None else []
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, *interactive, '-hide_banner', '-loglevel', 'error',
+        '-i', source,
+        '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-',
+        stdin=asyncio.subprocess.PIPE if data is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    pcm, stderr = await process.communicate(data)
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg error: {process.returncode} - {stderr.decode('utf-8', 'replace').strip()}")
+    return pcm
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Wrap mono 16-bit PCM in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def frame_levels(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                 frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """RMS level of each frame in dBFS"""
+    frame = int(sample_rate * frame_seconds)
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    frames = samples[:count * frame].astype(np.float32).reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) + 1e-9
+    return 20 * np.log10(rms / 32768.0)
+
+
+def frame_zero_crossings(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                         frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """Fraction of sign changes per frame (high for fricatives like "s", "f")"""
+    frame = int(sample_rate * frame_seconds)
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    signs = np.signbit(samples[:count * frame].reshape(count, frame))
+    return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame - 1)
+
+
+def silence_threshold(levels: np.ndarray, floor_db: float = -50.0, range_db: float = 30.0) -> float:
+    """Frames this far below the loud (95th percentile) level count as silence"""
+    if len(levels) == 0:
+        return floor_db
+    return max(floor_db, float(np.percentile(levels, 95)) - range_db)
+
+
+def noise_floor(levels: np.ndarray, percentile: float = 10.0) -> float:
+    """Level of steady background noise: a low percentile of the frame levels"""
+    if len(levels) == 0:
+        return -120.0
+    return float(np.percentile(levels, percentile))
+
+
+def split_on_silence(
+    pcm: bytes,
+    sample_rate: int = SAMPLE_RATE,
+    max_segment_seconds: float = 30.0,
+    min_silence_seconds: float = 0.4,
+    frame_seconds: float = FRAME_SECONDS
+) -> List[Tuple[int, int]]:
+    """
+    Split PCM into segments of at most max_segment_seconds
+
+    Segments are packed as long as possible and cut in the middle of the
+    last pause (min_silence_seconds or longer) before the limit; with no
+    pause available the cut goes at the quietest frame of the segment's
+    second half. Segments that are silence throughout are dropped.
+
+    Returns (start_sample, end_sample) pairs.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    levels = frame_levels(samples, sample_rate, frame_seconds)
+    if len(levels) == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    silent = levels < silence_threshold(levels)
+    frame = int(sample_rate * frame_seconds)
+    max_frames = max(1, int(max_segment_seconds / frame_seconds))
+    min_silence = max(1, int(min_silence_seconds / frame_seconds))
+
+    cuts = []
+    start = 0
+    last_pause = None
+    run_start = None
+
+    for i in range(len(levels)):
+        if silent[i]:
+            if run_start is None:
+                run_start = i
+        else:
+            if run_start is not None and i - run_start >= min_silence:
+                last_pause = (run_start + i) // 2
+            run_start = None
+
+        if i + 1 - start >= max_frames:
+            if last_pause is not None and last_pause > start:
+                cut = last_pause
+            else:
+                half = start + max_frames // 2
+                cut = half + int(np.argmin(levels[half:i + 1]))
+            cut = max(cut, start + 1)
+            cuts.append((start, cut))
+            start = cut
+            last_pause = None
+            # Re-anchor a pause in progress so it can still end the next segment
+            if run_start is not None:
+                run_start = max(run_start, start)
+
+    cuts.append((start, len(levels)))
+
+    segments = []
+    for first, last in cuts:
+        if last <= first or silent[first:last].all():
+            continue
+        end_sample = len(samples) if last == len(levels) else last * frame
+        segments.append((first * frame, end_sample))
+    return segments
+
+
+def trim_silence(
+    pcm: bytes,
+    sample_rate: int = SAMPLE_RATE,
+    max_pause_seconds: float = 0.3,
+    pad_seconds: float = 0.1,
+    frame_seconds: float = FRAME_SECONDS,
+    noise_margin_db: float = 6.0,
+    consonant_seconds: float = 0.15
+) -> Tuple[Optional[bytes], Dict]:
+    """
+    Remove leading/trailing silence and shorten long pauses
+
+    A frame is speech if it is loud enough: below the loud frames by less
+    than the silence range, and noise_margin_db above the noise floor, so
+    steady background noise is silence however loud the speech is. A
+    quieter frame with a high zero-crossing rate (an unvoiced consonant)
+    is speech too, but only within consonant_seconds of loud speech, as
+    broadband noise has a high zero-crossing rate as well. Speech is padded
+    by pad_seconds; interior pauses longer than max_pause_seconds are cut
+    down to that length. Returns (pcm, stats), with pcm None if no speech
+    is found.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    frame = int(sample_rate * frame_seconds)
+    levels = frame_levels(samples, sample_rate, frame_seconds)
+    stats = {
+        "original_seconds": round(len(samples) / sample_rate, 2),
+        "trimmed_seconds": 0.0,
+        "removed_seconds": round(len(samples) / sample_rate, 2)
+    }
+    if len(levels) == 0:
+        return None, stats
+
+    # Capped below the loud level: a clip that is speech throughout has no quiet frames
+    floor = min(noise_floor(levels), float(np.percentile(levels, 95)) - 2 * noise_margin_db) + noise_margin_db
+    threshold = max(silence_threshold(levels), floor)
+    voiced = levels >= threshold
+    if not voiced.any():
+        return None, stats
+
+    reach = max(1, int(consonant_seconds / frame_seconds))
+    near_voiced = np.convolve(voiced.astype(np.int32), np.ones(2 * reach + 1, dtype=np.int32), mode='same') > 0
+    zero_crossings = frame_zero_crossings(samples, sample_rate, frame_seconds)
+    consonant = near_voiced & (levels >= max(threshold - 10.0, floor)) & (zero_crossings > 0.25)
+    speech = voiced | consonant
+
+    pad = max(0, int(pad_seconds / frame_seconds))
+    keep = np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), mode='same') > 0
+
+    # Walk silent runs: drop the leading/trailing ones, cap the interior ones
+    max_pause = max(0, int(max_pause_seconds / frame_seconds))
+    first = int(np.argmax(keep))
+    last = len(keep) - int(np.argmax(keep[::-1]))
+    selected = np.zeros(len(keep), dtype=bool)
+    i = first
+    while i < last:
+        if keep[i]:
+            selected[i] = True
+            i += 1
+            continue
+        run_end = i
+        while run_end < last and not keep[run_end]:
+            run_end += 1
+        half = max_pause // 2
+        selected[i:i + half] = True
+        selected[run_end - (max_pause - half):run_end] = True
+        i = run_end
+
+    frames = samples[:len(levels) * frame].reshape(len(levels), frame)
+    trimmed = frames[selected].tobytes()
+
+    stats["trimmed_seconds"] = round(len(trimmed) / 2 / sample_rate, 2)
+    stats["removed_seconds"] = round(stats["original_seconds"] - stats["trimmed_seconds"], 2)
+    return trimmed, stats
@@ -0,0 +1,201 @@
+"""
+BM25 index over lecture transcript segments
+Compact binary on-disk format, memory-mapped for zero-copy loading
+"""
+
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File layout (little endian):
+#   header   magic "SSBM" | version u16 | pad u16 | n_docs u32 | n_terms u32
+#            | avgdl f32 | k1 f32 | b f32 | 6 x u32 section offsets
+#   docs     n_docs x (start f32, end f32, length u32, text_offset u32, text_length u32)
+#   terms    n_terms x (term_offset u32, term_length u32, df u32, postings_offset u32), sorted by term
+#   postings per term: df x (doc u32, tf u32)
+#   term blob, text blob (UTF-8)
+MAGIC = b"SSBM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIfff6I")
+
+DOC_DTYPE = np.dtype([("start", "<f4"), ("end", "<f4"), ("length", "<u4"),
+                      ("text_offset", "<u4"), ("text_length", "<u4")])
+TERM_DTYPE = np.dtype([("term_offset", "<u4"), ("term_length", "<u4"),
+                       ("df", "<u4"), ("postings_offset", "<u4")])
+POSTING_DTYPE = np.dtype([("doc", "<u4"), ("tf", "<u4")])
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "did", "do",
+    "does", "for", "from", "had", "has", "have", "how", "i", "if", "in", "is",
+    "it", "its", "me", "my", "of", "on", "or", "so", "that", "the", "their",
+    "then", "there", "these", "they", "this", "to", "was", "we", "were", "what",
+    "when", "where", "which", "who", "why", "will", "with", "you", "your"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        word for word in _WORD.findall(text.lower())
+        if len(word) > 1 and word not in _STOPWORDS
+    ]
+
+
+def build_index(segments: List[Dict], k1: float = 1.2, b: float = 0.75) -> bytes:
+    """Serialize transcript segments ({"start", "end", "text"}) into an index file image"""
+    doc_terms = [Counter(tokenize(segment["text"])) for segment in segments]
+    lengths = [sum(counts.values()) for counts in doc_terms]
+    avgdl = sum(lengths) / len(lengths) if lengths else 0.0
+
+    postings: Dict[str, List] = {}
+    for doc, counts in enumerate(doc_terms):
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc, tf))
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+
+    texts = bytearray()
+    docs = np.zeros(len(segments), dtype=DOC_DTYPE)
+    for doc, segment in enumerate(segments):
+        text = segment["text"].encode("utf-8")
+        docs[doc] = (segment["start"], segment["end"], lengths[doc], len(texts), len(text))
+        texts.extend(text)
+
+    term_blob = bytearray()
+    term_table = np.zeros(len(terms), dtype=TERM_DTYPE)
+    posting_table = np.zeros(sum(len(postings[term]) for term in terms), dtype=POSTING_DTYPE)
+    position = 0
+    for i, term in enumerate(terms):
+        encoded = term.encode("utf-8")
+        entries = postings[term]
+        term_table[i] = (len(term_blob), len(encoded), len(entries), position)
+        posting_table[position:position + len(entries)] = entries
+        term_blob.extend(encoded)
+        position += len(entries)
+
+    sections = [docs.tobytes(), term_table.tobytes(), posting_table.tobytes(), bytes(term_blob), bytes(texts)]
+    offsets = []
+    offset = HEADER.size
+    for section in sections:
+        offsets.append(offset)
+        offset += len(section)
+    offsets.append(offset)  # End of file
+
+    header = HEADER.pack(MAGIC, VERSION, 0, len(segments), len(terms), avgdl, k1, b, *offsets)
+    return header + b"".join(sections)
+
+
+def write_index(path: str, segments: List[Dict]):
+    """Build an index and write it atomically"""
+    data = build_index(segments)
+    # Unique temporary name: several workers may index the same lecture
+    fd, partial_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".part"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    logger.info(f"Wrote BM25 index {path} ({len(segments)} segments, {len(data)} bytes)")
+
+
+class BM25Index:
+    """Read-only, memory-mapped BM25 index (see build_index for the layout)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, self.n_docs, self.n_terms, self.avgdl, self.k1, self.b,
+         docs_offset, terms_offset, postings_offset, term_blob_offset,
+         text_offset, end) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or end != len(self._mmap):
+            self._mmap.close()
+            raise ValueError(f"Not a BM25 index (or truncated): {path}")
+
+        buffer = memoryview(self._mmap)
+        self._buffer = buffer
+        self.docs = np.frombuffer(buffer, DOC_DTYPE, self.n_docs, docs_offset)
+        self.terms = np.frombuffer(buffer, TERM_DTYPE, self.n_terms, terms_offset)
+        self.postings = np.frombuffer(
+            buffer, POSTING_DTYPE, (term_blob_offset - postings_offset) // POSTING_DTYPE.itemsize,
+            postings_offset
+        )
+        self._term_blob_offset = term_blob_offset
+        self._text_offset = text_offset
+
+    def search(self, query: str, k: int = 8) -> List[Dict]:
+        """Top-k segments by BM25 score: [{"start", "end", "text", "score"}]"""
+        if self.n_docs == 0:
+            return []
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        lengths = self.docs["length"].astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(self.avgdl, 1e-6))
+
+        for term in set(tokenize(query)):
+            i = self._find_term(term)
+            if i < 0:
+                continue
+            df = int(self.terms[i]["df"])
+            start = int(self.terms[i]["postings_offset"])
+            entries = self.postings[start:start + df]
+            tf = entries["tf"].astype(np.float32)
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            docs = entries["doc"]
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+
+        k = min(k, self.n_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self._segment(int(doc), float(scores[doc])) for doc in top if scores[doc] > 0]
+
+    def close(self):
+        self.docs = self.terms = self.postings = None
+        try:
+            self._buffer.release()
+            self._mmap.close()
+        except BufferError:
+            pass  # A view is still referenced; the mapping closes when it is collected
+
+    def _term(self, i: int) -> bytes:
+        offset = self._term_blob_offset + int(self.terms[i]["term_offset"])
+        return self._mmap[offset:offset + int(self.terms[i]["term_length"])]
+
+    def _find_term(self, term: str) -> int:
+        """Binary search the sorted term table"""
+        target = term.encode("utf-8")
+        low, high = 0, self.n_terms - 1
+        while low <= high:
+            mid = (low + high) // 2
+            current = self._term(mid)
+            if current == target:
+                return mid
+            if current < target:
+                low = mid + 1
+            else:
+                high = mid - 1
+        return -1
+
+    def _segment(self, doc: int, score: float) -> Dict:
+        entry = self.docs[doc]
+        offset = self._text_offset + int(entry["text_offset"])
+        return {
+            "start": round(float(entry["start"]), 2),
+            "end": round(float(entry["end"]), 2),
+            "text": self._mmap[offset:offset + int(entry["text_length"])].decode("utf-8"),
+            "score": round(score, 4)
+        }
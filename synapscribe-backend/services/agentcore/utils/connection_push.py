@@ -0,0 +1,178 @@
+"""
+Direct WebSocket delivery for AgentCore
+Posts stream messages to API Gateway connections from a pooled, executor-backed client
+"""
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Dict
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+_BATCH_OVERHEAD = len('{"type":"batch","messages":[]}')
+
+
+class ConnectionGone(Exception):
+    """The WebSocket client disconnected (API Gateway GoneException)"""
+
+
+class ConnectionPusher:
+    """
+    Pushes messages to API Gateway WebSocket connections
+
+    One management client per API endpoint, shared by a thread pool (boto3
+    clients are thread-safe). push_stream posts messages in order. With
+    batch=True (the client opted in), whatever queues up while a post is in
+    flight goes out in the next post as one
+    {"type": "batch", "messages": [...]} push of at most max_push_bytes.
+
+    Only the WebSocket API named by API_GATEWAY_ENDPOINT is pushed to; the
+    endpoint in a query payload is checked against it (see resolve_endpoint)
+    so a caller cannot point AgentCore's credentials at another API.
+    """
+
+    def __init__(self, max_workers: int = None, max_push_bytes: int = None, endpoint: str = None):
+        self.max_workers = max_workers or int(os.getenv('WS_PUSH_MAX_WORKERS', '16'))
+        # API Gateway WebSocket messages are capped at 128 KB; keep some headroom
+        self.max_push_bytes = max_push_bytes or int(os.getenv('WS_MAX_PUSH_BYTES', str(120 * 1024)))
+        # Push delivery is disabled until the WebSocket API is configured
+        self.endpoint = (endpoint or os.getenv('API_GATEWAY_ENDPOINT', '')).rstrip('/')
+
+        self._clients = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='ws-push'
+        )
+
+        self.counters = {"streams": 0, "messages": 0, "posts": 0, "gone": 0, "errors": 0}
+
+    async def push_stream(
+        self,
+        endpoint: str,
+        connection_id: str,
+        messages: AsyncIterator[Dict],
+        batch: bool = False
+    ):
+        """
+        Deliver a message stream to one connection
+
+        The stream is read on its own task so generation keeps running while
+        posts are in flight. If the connection is gone the stream is cancelled,
+        which stops the vLLM and TTS work behind it.
+        """
+        self.counters["streams"] += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def produce():
+            try:
+                async for message in messages:
+                    await queue.put(json.dumps(message))
+            finally:
+                await queue.put(done)
+
+        producer = asyncio.create_task(produce())
+        try:
+            carry = None
+            while True:
+                item = carry if carry is not None else await queue.get()
+                carry = None
+                if item is done:
+                    break
+
+                items = [item]
+                size = len(item) + _BATCH_OVERHEAD
+                while batch and not queue.empty():
+                    item = queue.get_nowait()
+                    if item is done or size + len(item) + 1 > self.max_push_bytes:
+                        carry = item
+                        break
+                    items.append(item)
+                    size += len(item) + 1
+
+                await self._post_batch(endpoint, connection_id, items)
+
+            await producer  # Surface errors from the message stream
+        except ConnectionGone:
+            self.counters["gone"] += 1
+            logger.info(f"Connection {connection_id} is gone, cancelling generation")
+        finally:
+            if not producer.done():
+                producer.cancel()
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
+
+    def resolve_endpoint(self, endpoint: str = None) -> str:
+        """The configured endpoint, if the payload's endpoint (when given) names it"""
+        if not self.endpoint:
+            raise ValueError("Push delivery is disabled: API_GATEWAY_ENDPOINT is not set")
+        if endpoint and _host_and_stage(endpoint) != _host_and_stage(self.endpoint):
+            raise ValueError("apiGatewayEndpoint does not match API_GATEWAY_ENDPOINT")
+        return self.endpoint
+
+    async def post(self, endpoint: str, connection_id: str, message: Dict):
+        """Send a single message"""
+        await self._post(endpoint, connection_id, json.dumps(message).encode('utf-8'))
+
+    def stats(self) -> Dict:
+        return dict(self.counters)
+
+    def close(self):
+        """Shut down the worker pool"""
+        self.executor.shutdown(wait=False)
+
+    async def _post_batch(self, endpoint: str, connection_id: str, batch):
+        if len(batch) == 1:
+            data = batch[0]
+        else:
+            data = '{"type":"batch","messages":[' + ','.join(batch) + ']}'
+        await self._post(endpoint, connection_id, data.encode('utf-8'))
+        self.counters["messages"] += len(batch)
+
+    async def _post(self, endpoint: str, connection_id: str, data: bytes):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.executor,
+            partial(self._post_sync, endpoint, connection_id, data)
+        )
+        self.counters["posts"] += 1
+
+    def _post_sync(self, endpoint: str, connection_id: str, data: bytes):
+        client = self._client(endpoint)
+        try:
+            client.post_to_connection(ConnectionId=connection_id, Data=data)
+        except client.exceptions.GoneException:
+            raise ConnectionGone(connection_id)
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+
+    def _client(self, endpoint: str):
+        client = self._clients.get(endpoint)
+        if client is None:
+            endpoint_url = endpoint if endpoint.startswith("http") else f"https://{endpoint}"
+            client = boto3.client(
+                'apigatewaymanagementapi',
+                endpoint_url=endpoint_url,
+                config=Config(max_pool_connections=self.max_workers)
+            )
+            # Racing threads may both build one; either is fine to keep
+            self._clients[endpoint] = client
+        return client
+
+
+def _host_and_stage(endpoint: str) -> str:
+    """Endpoint without scheme, as the WebSocket Lambda passes it"""
+    for scheme in ("https://", "http://"):
+        if endpoint.startswith(scheme):
+            endpoint = endpoint[len(scheme):]
+    return endpoint.rstrip("/")
@@ -0,0 +1,156 @@
+"""
+Upstream endpoint pool for vLLM / gTTS replicas
+Consistent hashing for affinity, least-outstanding fallback, passive health ejection
+"""
+
+import bisect
+import hashlib
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """Non-200 response from an upstream service"""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class EndpointPool:
+    """
+    Pool of equivalent upstream endpoints
+
+    - Requests with an affinity key (lecture_id) go to the key's owner on a
+      consistent-hash ring, so every question on a lecture reaches the replica
+      that already holds its prefix KV cache, and adding a replica only moves
+      about 1/N of the lectures.
+    - If the owner has overload_threshold requests outstanding (or there is
+      no key), the healthy endpoint with the fewest outstanding requests wins.
+    - Connection errors, timeouts and 5xx responses count as failures;
+      failure_threshold consecutive failures eject an endpoint for
+      ejection_seconds.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        name: str = "upstream",
+        virtual_nodes: int = 100,
+        overload_threshold: int = None,
+        failure_threshold: int = None,
+        ejection_seconds: float = None
+    ):
+        if not endpoints:
+            raise ValueError(f"No endpoints configured for {name}")
+
+        self.endpoints = endpoints
+        self.name = name
+        self.overload_threshold = overload_threshold or int(os.getenv('POOL_OVERLOAD_THRESHOLD', '8'))
+        self.failure_threshold = failure_threshold or int(os.getenv('POOL_FAILURE_THRESHOLD', '3'))
+        self.ejection_seconds = ejection_seconds or float(os.getenv('POOL_EJECTION_SECONDS', '30'))
+
+        self.outstanding: Dict[str, int] = {endpoint: 0 for endpoint in endpoints}
+        self._failures: Dict[str, int] = {endpoint: 0 for endpoint in endpoints}
+        self._ejected_until: Dict[str, float] = {endpoint: 0.0 for endpoint in endpoints}
+        self.counters = {"affinity": 0, "fallback": 0, "ejections": 0}
+
+        ring = []
+        for endpoint in endpoints:
+            for i in range(virtual_nodes):
+                ring.append((self._hash(f"{endpoint}#{i}"), endpoint))
+        ring.sort()
+        self._ring_hashes = [h for h, _ in ring]
+        self._ring_endpoints = [endpoint for _, endpoint in ring]
+
+        logger.info(f"EndpointPool {name}: {', '.join(endpoints)}")
+
+    @classmethod
+    def from_env(cls, list_var: str, single_var: str, default: str, name: str) -> "EndpointPool":
+        """Build from a comma-separated list variable, falling back to the single endpoint variable"""
+        raw = os.getenv(list_var) or os.getenv(single_var, default)
+        return cls(cls.parse(raw), name=name)
+
+    @staticmethod
+    def parse(raw: str) -> List[str]:
+        return [endpoint.strip().rstrip("/") for endpoint in raw.split(",") if endpoint.strip()]
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def pick(self, key: Optional[str] = None) -> str:
+        """Choose an endpoint for a request"""
+        healthy = self._healthy()
+
+        if key is not None:
+            owner = self._owner(key, healthy)
+            if self.outstanding[owner] < self.overload_threshold:
+                self.counters["affinity"] += 1
+                return owner
+
+        self.counters["fallback"] += 1
+        return min(healthy, key=lambda endpoint: self.outstanding[endpoint])
+
+    @asynccontextmanager
+    async def endpoint(self, key: Optional[str] = None):
+        """Pick an endpoint and track the request's outcome and concurrency"""
+        endpoint = self.pick(key)
+        self.outstanding[endpoint] += 1
+        try:
+            yield endpoint
+        except Exception as e:
+            if not isinstance(e, UpstreamError) or e.status >= 500:
+                self.record_failure(endpoint)
+            raise
+        else:
+            self.record_success(endpoint)
+        finally:
+            self.outstanding[endpoint] -= 1
+
+    def record_success(self, endpoint: str):
+        self._failures[endpoint] = 0
+
+    def record_failure(self, endpoint: str):
+        self._failures[endpoint] += 1
+        if self._failures[endpoint] >= self.failure_threshold:
+            self._ejected_until[endpoint] = time.monotonic() + self.ejection_seconds
+            self._failures[endpoint] = 0
+            self.counters["ejections"] += 1
+            logger.warning(f"Ejecting {self.name} endpoint {endpoint} for {self.ejection_seconds:.0f}s")
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            **self.counters,
+            "endpoints": {
+                endpoint: {
+                    "outstanding": self.outstanding[endpoint],
+                    "ejected": self._ejected_until[endpoint] > now
+                }
+                for endpoint in self.endpoints
+            }
+        }
+
+    def _healthy(self) -> List[str]:
+        now = time.monotonic()
+        healthy = [endpoint for endpoint in self.endpoints if self._ejected_until[endpoint] <= now]
+        # Fail open: with every endpoint ejected, keep trying all of them
+        return healthy or list(self.endpoints)
+
+    def _owner(self, key: str, healthy: List[str]) -> str:
+        """First healthy endpoint clockwise from the key on the ring"""
+        start = bisect.bisect(self._ring_hashes, self._hash(key))
+        for i in range(len(self._ring_endpoints)):
+            endpoint = self._ring_endpoints[(start + i) % len(self._ring_endpoints)]
+            if endpoint in healthy:
+                return endpoint
+        return healthy[0]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], "big")
@@ -0,0 +1,93 @@
+"""
+Stream framing for /invoke responses
+NDJSON (default) or length-prefixed binary frames with raw audio payloads;
+plain message dicts for push delivery. Control messages carry the query's requestId
+"""
+
+import base64
+import json
+import struct
+
+# Binary frame layout: 1-byte type | 4-byte big-endian payload length | payload
+FRAME_HEADER = struct.Struct(">BI")
+FRAME_JSON = 0x01   # UTF-8 JSON control message
+FRAME_AUDIO = 0x02  # Raw MP3 bytes (chunk index is implicit in frame order)
+
+NDJSON_MEDIA_TYPE = "application/json"
+FRAMED_MEDIA_TYPE = "application/vnd.synapscribe.frames"
+
+
+class NDJSONEncoder:
+    """Newline-delimited JSON, audio as base64 (original /invoke format)"""
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(self, request_id: str = None):
+        self.request_id = request_id
+
+    def message(self, data: dict) -> bytes:
+        """Encode a control message"""
+        return (json.dumps(_tag(data, self.request_id)) + "\n").encode('utf-8')
+
+    def audio(self, chunk: bytes, index: int) -> bytes:
+        """Encode an audio chunk"""
+        return self.message({
+            "type": "audio_chunk",
+            "data": base64.b64encode(chunk).decode('utf-8'),
+            "index": index
+        })
+
+
+class BinaryFrameEncoder:
+    """Length-prefixed binary frames, audio sent without base64/JSON"""
+
+    media_type = FRAMED_MEDIA_TYPE
+
+    def __init__(self, request_id: str = None):
+        self.request_id = request_id
+
+    def message(self, data: dict) -> bytes:
+        """Encode a control message"""
+        payload = json.dumps(_tag(data, self.request_id)).encode('utf-8')
+        return FRAME_HEADER.pack(FRAME_JSON, len(payload)) + payload
+
+    def audio(self, chunk: bytes, index: int) -> bytes:
+        """Encode an audio chunk"""
+        return FRAME_HEADER.pack(FRAME_AUDIO, len(chunk)) + chunk
+
+
+class MessageEncoder:
+    """Unencoded message dicts, audio as base64 (push delivery serializes them)"""
+
+    media_type = None
+
+    def __init__(self, request_id: str = None):
+        self.request_id = request_id
+
+    def message(self, data: dict) -> dict:
+        """Encode a control message"""
+        return _tag(data, self.request_id)
+
+    def audio(self, chunk: bytes, index: int) -> dict:
+        """Encode an audio chunk"""
+        return self.message({
+            "type": "audio_chunk",
+            "data": base64.b64encode(chunk).decode('utf-8'),
+            "index": index
+        })
+
+
+def _tag(data: dict, request_id: str) -> dict:
+    """Add the requestId to a control message"""
+    if request_id is None:
+        return data
+    return {**data, "requestId": request_id}
+
+
+def get_encoder(framing: str = None, request_id: str = None):
+    """Return the encoder for the negotiated framing (NDJSON fallback)"""
+    if framing == "binary":
+        return BinaryFrameEncoder(request_id)
+    if framing == "messages":
+        return MessageEncoder(request_id)
+    return NDJSONEncoder(request_id)
@@ -4,8 +4,13 @@ Uses gTTS service running on port 8001
 """
 
 import aiohttp
+import asyncio
 import logging
 import os
+import time
+from typing import AsyncGenerator
+from utils.tts_cache import TTSCache
+from utils.endpoint_pool import EndpointPool, UpstreamError
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +19,23 @@ class GTTSClient:
     """Client for gTTS service"""
 
     def __init__(self, endpoint: str = None):
-        self.endpoint = endpoint or os.getenv("GTTS_ENDPOINT", "http://localhost:8001")
+        # One or more gTTS replicas (GTTS_ENDPOINTS="http://a:8001,http://b:8001");
+        # requests carry no affinity key, so the least busy replica is used
+        if endpoint:
+            self.pool = EndpointPool(EndpointPool.parse(endpoint), name="gtts")
+        else:
+            self.pool = EndpointPool.from_env(
+                "GTTS_ENDPOINTS", "GTTS_ENDPOINT", "http://localhost:8001", name="gtts"
+            )
         self.session = None
-        logger.info(f"GTTSClient initialized with endpoint: {self.endpoint}")
+        self.voice = "alloy"  # Default voice
+        self.response_format = "mp3"
+
+        # Synthesized audio cache (same text, voice and format -> same MP3)
+        cache_enabled = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+        self.cache = TTSCache() if cache_enabled else None
+
+        logger.info(f"GTTSClient initialized with endpoints: {', '.join(self.pool.endpoints)}")
 
     async def _get_session(self):
         """Get or create aiohttp session"""
@@ -29,6 +48,25 @@ class GTTSClient:
         if self.session and not self.session.closed:
             await self.session.close()
 
+    async def probe(self, endpoint: str, connections: int = 1) -> float:
+        """
+        GET /health on one replica with `connections` parallel requests
+
+        The connections stay in the session's keep-alive pool, so the first
+        real requests skip TCP setup. Returns the elapsed seconds.
+        """
+        session = await self._get_session()
+        started = time.perf_counter()
+
+        async def check():
+            async with session.get(f"{endpoint}/health", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status != 200:
+                    raise UpstreamError(f"gTTS health check failed: {response.status}", response.status)
+                await response.read()
+
+        await asyncio.gather(*(check() for _ in range(connections)))
+        return time.perf_counter() - started
+
     async def text_to_speech(self, text: str) -> bytes:
         """
         Convert text to speech audio (MP3 format)
@@ -39,25 +77,77 @@ class GTTSClient:
         Returns:
             Audio bytes in MP3 format
         """
+        if self.cache is None:
+            return await self._synthesize(text)
+
+        key = self.cache.make_key(text, self.voice, self.response_format)
+        return await self.cache.get_or_create(key, lambda: self._synthesize(text))
+
+    async def text_to_speech_stream(
+        self,
+        text: str,
+        chunk_size: int = 4096,
+        use_cache: bool = True
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Convert text to speech, yielding MP3 data as the service sends it
+
+        Cached audio is replayed in chunk_size pieces; an identical request
+        already in flight is awaited instead of synthesized again (and taken
+        over if that request fails or its query goes away).
+
+        Args:
+            text: Text to convert to speech
+            chunk_size: Maximum size of each yielded chunk
+            use_cache: False always calls the service (startup warmup)
+
+        Yields:
+            MP3 byte chunks in arrival order
+        """
+        if self.cache is None or not use_cache:
+            async for chunk in self._synthesize_stream(text, chunk_size):
+                yield chunk
+            return
+
+        key = self.cache.make_key(text, self.voice, self.response_format)
+
+        audio = await self.cache.join(key)
+        if audio is not None:
+            for i in range(0, len(audio), chunk_size):
+                yield audio[i:i + chunk_size]
+            return
+
+        # Cache miss: stream from the service and keep a copy for the cache
+        self.cache.begin(key)
+        chunks = []
+        completed = False
+        try:
+            async for chunk in self._synthesize_stream(text, chunk_size):
+                chunks.append(chunk)
+                yield chunk
+            completed = True
+        finally:
+            if not completed:
+                self.cache.fail(key)
+
+        await self.cache.complete(key, b"".join(chunks))
+
+    async def _synthesize(self, text: str) -> bytes:
+        """Call the gTTS service and return the full MP3"""
         try:
             logger.info(f"Generating TTS for {len(text)} characters")
 
             session = await self._get_session()
 
             # Call gTTS service (OpenAI-compatible API)
-            async with session.post(
-                f"{self.endpoint}/v1/audio/speech",
-                json={
-                    "model": "tts-1",
-                    "input": text,
-                    "voice": "alloy",  # Default voice
-                    "response_format": "mp3"
-                },
+            async with self.pool.endpoint() as endpoint, session.post(
+                f"{endpoint}/v1/audio/speech",
+                json=self._request_body(text),
                 timeout=aiohttp.ClientTimeout(total=30)
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
-                    raise Exception(f"gTTS API error: {response.status} - {error_text}")
+                    raise UpstreamError(f"gTTS API error: {response.status} - {error_text}", response.status)
 
                 audio_bytes = await response.read()
                 logger.info(f"TTS completed: {len(audio_bytes)} bytes")
@@ -66,3 +156,42 @@ class GTTSClient:
         except Exception as e:
             logger.error(f"Error in TTS: {e}", exc_info=True)
             raise
+
+    async def _synthesize_stream(self, text: str, chunk_size: int) -> AsyncGenerator[bytes, None]:
+        """Call the gTTS service and yield MP3 data as it arrives"""
+        try:
+            logger.info(f"Streaming TTS for {len(text)} characters")
+
+            session = await self._get_session()
+
+            async with self.pool.endpoint() as endpoint, session.post(
+                f"{endpoint}/v1/audio/speech",
+                json=self._request_body(text),
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise UpstreamError(f"gTTS API error: {response.status} - {error_text}", response.status)
+
+                total_bytes = 0
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    total_bytes += len(chunk)
+                    yield chunk
+
+                logger.info(f"TTS stream completed: {total_bytes} bytes")
+
+        except Exception as e:
+            logger.error(f"Error in TTS stream: {e}", exc_info=True)
+            raise
+
+    def _request_body(self, text: str) -> dict:
+        return {
+            "model": "tts-1",
+            "input": text,
+            "voice": self.voice,
+            "response_format": self.response_format
+        }
+
+    def stats(self) -> dict:
+        """TTS cache metrics"""
+        return self.cache.stats() if self.cache else {"enabled": False}
@@ -0,0 +1,118 @@
+"""
+Conversation history cache
+Keeps the last N turns per session in vLLM chat format, appended as turns complete
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("messages", "last_access", "version")
+
+    def __init__(self, messages: List[Dict], version: Optional[int] = None):
+        self.messages = messages
+        self.last_access = time.monotonic()
+        self.version = version
+
+
+class HistoryCache:
+    """
+    Write-through, in-process history cache keyed by session
+
+    The loader (DynamoDB + unsaved turns) runs only on a cold miss; after that
+    each completed turn is appended in place, so a warm lookup returns the
+    cached message list directly. Returned lists are shared and must be
+    treated as read-only.
+
+    With a session store shared by several workers, callers pass the
+    store's session version: an entry is only used while its version
+    matches, so turns appended by another worker force a reload.
+    """
+
+    def __init__(self, max_turns: int = 10, max_sessions: int = None, ttl_seconds: int = None):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions or int(os.getenv('HISTORY_CACHE_MAX_SESSIONS', '1024'))
+        self.ttl_seconds = ttl_seconds or int(os.getenv('HISTORY_CACHE_TTL_SECONDS', '3600'))
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # LRU order
+        self._loading: Dict[str, asyncio.Future] = {}
+
+        self.counters = {"hits": 0, "misses": 0}
+
+    async def get(
+        self,
+        session_id: str,
+        loader: Callable[[], Awaitable[List[Dict]]],
+        version: Optional[int] = None
+    ) -> List[Dict]:
+        """Return the last max_turns turns, loading them on a cold miss (or version change)"""
+        entry = self._entries.get(session_id)
+        if (entry is not None
+                and time.monotonic() - entry.last_access < self.ttl_seconds
+                and entry.version == version):
+            self.counters["hits"] += 1
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(session_id)
+            return entry.messages
+
+        self.counters["misses"] += 1
+
+        # Concurrent misses for one session share a single load
+        pending = self._loading.get(session_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[session_id] = future
+        try:
+            messages = await loader()
+            del messages[:-2 * self.max_turns]
+            self._store(session_id, messages, version)
+            future.set_result(messages)
+            return messages
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._loading.pop(session_id, None)
+
+    def append(self, session_id: str, query_text: str, answer_text: str, version: Optional[int] = None):
+        """
+        Append a completed turn to a cached session (no-op if not cached)
+
+        version is the store's version after the append; if the entry missed
+        a turn written elsewhere it is dropped instead.
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return
+        if version is not None:
+            if entry.version is None or entry.version + 1 != version:
+                self.invalidate(session_id)
+                return
+            entry.version = version
+
+        entry.messages.append({"role": "user", "content": query_text})
+        entry.messages.append({"role": "assistant", "content": answer_text})
+        if len(entry.messages) > 2 * self.max_turns:
+            del entry.messages[:-2 * self.max_turns]
+
+    def invalidate(self, session_id: str):
+        self._entries.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        return {**self.counters, "sessions": len(self._entries)}
+
+    def _store(self, session_id: str, messages: List[Dict], version: Optional[int] = None):
+        self._entries[session_id] = _Entry(messages, version)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
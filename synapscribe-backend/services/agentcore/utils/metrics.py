@@ -0,0 +1,281 @@
+"""
+Prometheus metrics for AgentCore
+Minimal histogram/counter/gauge registry rendered in the text exposition format
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stage latencies range from a few ms (history cache hit) to tens of seconds (Q&A)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = ([0] * (len(self.buckets) + 1), [0.0])
+            self._series[key] = series
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block (also when it raises)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self, extra: str = "") -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                labels = _format_labels(self.labelnames, key, f"{extra},{le}" if extra else le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self, extra: str = "") -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge:
+    """
+    Gauge read at scrape time
+
+    The callback returns a number, or a list of (label values, number)
+    pairs for labelled gauges, so values always reflect current state.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Callable, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self, extra: str = "") -> List[str]:
+        value = self.callback()
+        if not self.labelnames:
+            return [f"{self.name}{_format_labels((), (), extra)} {_format_value(value)}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, tuple(map(str, key)), extra)} {_format_value(number)}"
+            for key, number in value
+        ]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together for the /metrics route"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, callback: Callable, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, callback, labelnames))
+
+    def collect(self, extra: str = "") -> List[Tuple[str, str, str, List[str]]]:
+        """(name, help, type, sample lines) per metric; extra is added to every sample's labels"""
+        families = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.render(extra)
+            except Exception:
+                continue  # A failing gauge callback must not break the scrape
+            families.append((metric.name, metric.help, metric.kind, samples))
+        return families
+
+    def render(self) -> str:
+        return render_families(self.collect())
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+def render_families(families: Iterable[Tuple[str, str, str, List[str]]]) -> str:
+    lines = []
+    for name, help_text, kind, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class WorkerMetrics:
+    """
+    /metrics for several uvicorn workers on one host
+
+    A scrape reaches a single worker, so every worker writes its samples,
+    labelled worker="<pid>", to <directory>/<pid>.json each
+    interval_seconds, and the scraped worker merges the other workers'
+    files with its own live samples. Files not rewritten for three
+    intervals (the worker exited) are skipped and removed.
+    """
+
+    def __init__(self, registry: "MetricsRegistry", directory: str = None, interval_seconds: float = None):
+        self.registry = registry
+        self.directory = directory or os.getenv('METRICS_DIR', '/tmp/synapscribe/metrics')
+        self.interval_seconds = interval_seconds or float(os.getenv('METRICS_WRITE_INTERVAL_SECONDS', '5'))
+        self.worker = str(os.getpid())
+        self.path = os.path.join(self.directory, f"{self.worker}.json")
+        self._task = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.write()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def write(self):
+        temp_path = f"{self.path}.part"
+        with open(temp_path, "w") as f:
+            json.dump(self.registry.collect(self._label()), f)
+        os.replace(temp_path, self.path)
+
+    def render(self) -> str:
+        families: "OrderedDict[str, Tuple[str, str, List[str]]]" = OrderedDict()
+        for name, help_text, kind, samples in self._families():
+            if name not in families:
+                families[name] = (help_text, kind, [])
+            families[name][2].extend(samples)
+        return render_families(
+            (name, help_text, kind, samples) for name, (help_text, kind, samples) in families.items()
+        )
+
+    def _families(self) -> List:
+        families = list(self.registry.collect(self._label()))
+        stale_before = time.time() - 3 * self.interval_seconds
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json") or entry.path == self.path:
+                continue
+            try:
+                if entry.stat().st_mtime < stale_before:
+                    os.remove(entry.path)
+                    continue
+                with open(entry.path) as f:
+                    families.extend(json.load(f))
+            except (OSError, ValueError):
+                continue  # Removed or replaced while reading
+        return families
+
+    def _label(self) -> str:
+        return f'worker="{self.worker}"'
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Could not write worker metrics to {self.path}: {e}")
+
+
+# Process-wide registry and the query pipeline metrics
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "synapscribe_stage_seconds",
+    "Duration of each query pipeline stage",
+    labelnames=("stage",)
+)
+QUERY_SECONDS = registry.histogram(
+    "synapscribe_query_seconds",
+    "End-to-end /invoke query duration by outcome",
+    labelnames=("outcome",)
+)
+FIRST_AUDIO_SECONDS = registry.histogram(
+    "synapscribe_first_audio_seconds",
+    "Time from query start to the first answer audio chunk"
+)
+HISTORY_TOKENS = registry.histogram(
+    "synapscribe_history_tokens",
+    "Estimated prompt tokens of assembled conversation history (summary included)",
+    buckets=(0, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
@@ -0,0 +1,230 @@
+"""
+Admission control and fair scheduling for vLLM requests
+Bounded inflight window, ASR-first priority, per-session round robin, adaptive sizing
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first. Short ASR requests go ahead of long generations;
+# offline lecture work only uses capacity that live queries leave idle.
+PRIORITIES = {
+    "asr": 0,
+    "qa": 1,
+    "prime": 2,
+    "batch": 3
+}
+
+# Kinds that may not take the slots reserved for live queries
+BACKGROUND_KINDS = {"batch"}
+
+
+class SchedulerBusy(Exception):
+    """Raised when the admission queue is full; callers should answer 429/busy"""
+
+
+class RequestScheduler:
+    """
+    Gatekeeper in front of vLLM
+
+    At most `window` requests are in flight; the rest wait in per-priority
+    queues. Within a priority, sessions are served round robin so one chatty
+    session cannot starve the others. When more than max_queue requests are
+    waiting, new requests are rejected immediately with SchedulerBusy instead
+    of piling up inside vLLM until the client timeouts fire.
+
+    Background kinds (offline lecture ASR, summaries) never hold more than
+    window - live_reserve slots (at least one), so live ASR and Q&A always
+    find a free slot on the fast path instead of queueing behind them.
+
+    The window starts at max_window (vLLM --max-num-seqs) and is resized from
+    vLLM's /metrics gauges: it shrinks while requests queue inside vLLM or KV
+    cache usage is high, and grows back when there is headroom.
+
+    Limits are configured per vLLM replica and split evenly between the
+    uvicorn workers, since each worker runs its own scheduler in front of
+    the same replicas.
+    """
+
+    def __init__(
+        self,
+        metrics_source: Optional[Callable[[], Awaitable[Dict[str, float]]]] = None,
+        max_window: int = None,
+        min_window: int = None,
+        max_queue: int = None,
+        metrics_interval: float = None,
+        live_reserve: int = None,
+        replicas: int = 1,
+        workers: int = 1
+    ):
+        # Window bounds are per vLLM replica; this worker gets its share
+        self.workers = max(1, workers)
+        self.max_window = self._share((max_window or int(os.getenv('SCHEDULER_MAX_WINDOW', '8'))) * replicas)
+        self.min_window = self._share((min_window or int(os.getenv('SCHEDULER_MIN_WINDOW', '2'))) * replicas)
+        self.live_reserve = self._share((live_reserve or int(os.getenv('SCHEDULER_LIVE_RESERVE', '2'))) * replicas)
+        self.max_queue = self._share(max_queue or int(os.getenv('SCHEDULER_MAX_QUEUE', '32')))
+        self.metrics_interval = metrics_interval or float(os.getenv('SCHEDULER_METRICS_INTERVAL', '2.0'))
+        self.kv_high = float(os.getenv('SCHEDULER_KV_HIGH', '0.9'))
+        self.kv_low = float(os.getenv('SCHEDULER_KV_LOW', '0.7'))
+
+        self.metrics_source = metrics_source
+        self.window = self.max_window
+        self.inflight = 0
+        self.background_inflight = 0
+
+        # priority -> session_id -> waiters (FIFO per session)
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {
+            priority: OrderedDict() for priority in sorted(set(PRIORITIES.values()))
+        }
+        self._queued = 0
+        self._poller: Optional[asyncio.Task] = None
+
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "window_changes": 0}
+
+    @asynccontextmanager
+    async def slot(self, kind: str, session_id: Optional[str] = None):
+        """Hold one inflight slot for the duration of a vLLM request"""
+        await self.acquire(kind, session_id)
+        try:
+            yield
+        finally:
+            self.release(kind)
+
+    async def acquire(self, kind: str, session_id: Optional[str] = None):
+        self._ensure_poller()
+
+        background = kind in BACKGROUND_KINDS
+        if self.inflight < self.window and self._queued == 0 and not (background and self._background_full()):
+            self._admit(background)
+            return
+
+        if self._queued >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise SchedulerBusy(f"vLLM queue full ({self._queued} waiting)")
+
+        priority = PRIORITIES.get(kind, PRIORITIES["qa"])
+        sessions = self._queues[priority]
+        waiter = asyncio.get_running_loop().create_future()
+        sessions.setdefault(session_id or "", deque()).append(waiter)
+        self._queued += 1
+        self.counters["queued"] += 1
+        self._dispatch()  # Free slots may be held back from queued batch work only
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just as we were cancelled: hand it back
+                self.release(kind)
+            else:
+                self._remove_waiter(priority, session_id or "", waiter)
+            raise
+
+    def release(self, kind: str = "qa"):
+        self.inflight -= 1
+        if kind in BACKGROUND_KINDS:
+            self.background_inflight -= 1
+        self._dispatch()
+
+    def _share(self, total: int) -> int:
+        """This worker's part of a limit shared by all workers (at least 1)"""
+        return max(1, total // self.workers)
+
+    def is_saturated(self) -> bool:
+        """True when new requests would be rejected"""
+        return self._queued >= self.max_queue
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "window": self.window,
+            "workers": self.workers,
+            "inflight": self.inflight,
+            "background_inflight": self.background_inflight,
+            "waiting": self._queued
+        }
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    def _dispatch(self):
+        """Grant free slots: highest priority first, sessions round robin"""
+        batch = PRIORITIES["batch"]
+        while self.inflight < self.window and self._queued > 0:
+            priority, sessions = next(
+                ((priority, queue) for priority, queue in self._queues.items() if queue), (None, None)
+            )
+            if sessions is None or (priority == batch and self._background_full()):
+                break
+
+            session_id, waiters = next(iter(sessions.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                sessions.move_to_end(session_id)  # Next session's turn
+            else:
+                del sessions[session_id]
+            self._queued -= 1
+
+            if waiter.done():
+                continue
+            waiter.set_result(None)
+            self._admit(priority == batch)
+
+    def _admit(self, background: bool):
+        self.inflight += 1
+        if background:
+            self.background_inflight += 1
+        self.counters["admitted"] += 1
+
+    def _background_full(self) -> bool:
+        return self.background_inflight >= max(1, self.window - self.live_reserve)
+
+    def _remove_waiter(self, priority: int, session_id: str, waiter: asyncio.Future):
+        waiters = self._queues[priority].get(session_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued -= 1
+            if not waiters:
+                del self._queues[priority][session_id]
+
+    def _ensure_poller(self):
+        if self.metrics_source is not None and self._poller is None:
+            self._poller = asyncio.create_task(self._poll_metrics())
+
+    async def _poll_metrics(self):
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            try:
+                metrics = await self.metrics_source()
+            except Exception as e:
+                logger.warning(f"Scheduler could not read vLLM metrics: {e}")
+                continue
+            self._resize(metrics)
+
+    def _resize(self, metrics: Dict[str, float]):
+        """Adjust the window from vLLM queue depth and KV cache usage"""
+        waiting = metrics.get("num_requests_waiting", 0.0)
+        kv_usage = metrics.get("kv_cache_usage", 0.0)
+
+        window = self.window
+        if waiting > 0 or kv_usage >= self.kv_high:
+            window = max(self.min_window, window - 1)
+        elif kv_usage < self.kv_low and self.inflight >= window:
+            window = min(self.max_window, window + 1)
+
+        if window != self.window:
+            logger.info(
+                f"Scheduler window {self.window} -> {window} "
+                f"(vLLM waiting={waiting:.0f}, kv_cache={kv_usage:.2f})"
+            )
+            self.window = window
+            self.counters["window_changes"] += 1
+            self._dispatch()
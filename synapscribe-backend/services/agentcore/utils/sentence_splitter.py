@@ -0,0 +1,64 @@
+"""
+Sentence splitter for streamed LLM output
+Cuts token deltas into speakable sentences for pipelined TTS
+"""
+
+import re
+from typing import List
+
+# Sentence-ending punctuation (with optional closing quotes/brackets) followed
+# by whitespace, or a line break
+_BOUNDARY = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+
+_ABBREVIATIONS = (
+    "e.g.", "i.e.", "etc.", "vs.", "dr.", "mr.", "mrs.", "ms.", "prof.", "fig.", "no."
+)
+
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter
+
+    Feed text deltas as they arrive; complete sentences are returned as soon
+    as their boundary is seen. Fragments shorter than min_chars are merged
+    with the following sentence so TTS is not called for tiny snippets.
+    """
+
+    def __init__(self, min_chars: int = 20, max_chars: int = 400):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a text delta and return any sentences completed by it"""
+        self._buffer += text
+        sentences = []
+        start = 0
+
+        for match in _BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars or self._ends_with_abbreviation(candidate):
+                continue
+            sentences.append(candidate)
+            start = match.end()
+
+        self._buffer = self._buffer[start:]
+
+        # Long run without punctuation: cut at the last word boundary
+        if len(self._buffer) > self.max_chars:
+            cut = self._buffer.rfind(" ", 0, self.max_chars)
+            if cut > 0:
+                sentences.append(self._buffer[:cut].strip())
+                self._buffer = self._buffer[cut:]
+
+        return sentences
+
+    def flush(self) -> str:
+        """Return the remaining buffered text (end of stream)"""
+        tail = self._buffer.strip()
+        self._buffer = ""
+        return tail
+
+    def _ends_with_abbreviation(self, sentence: str) -> bool:
+        last_word = sentence.rsplit(None, 1)[-1].lower()
+        return last_word in _ABBREVIATIONS
@@ -0,0 +1,458 @@
+"""
+Session stores shared by AgentCore workers
+SQLite (WAL) for workers on one host, Redis (RESP over asyncio streams) for many hosts
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+from utils.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+# Turn fields stored as JSON; the response audio is stored separately as a blob
+AUDIO_FIELD = "response_audio"
+
+
+def _split_turn(turn: Dict):
+    meta = {k: v for k, v in turn.items() if k != AUDIO_FIELD}
+    return json.dumps(meta, separators=(',', ':')), bytes(turn.get(AUDIO_FIELD) or b"")
+
+
+class SQLiteSessionStore:
+    """
+    Session turns in a SQLite database in WAL mode
+
+    Every uvicorn worker on the host opens the same file: WAL lets readers
+    run alongside the single writer, and writes are short transactions.
+    Each session row holds a version that increases on every append and
+    discard, so per-worker history caches can detect turns written by
+    other workers. Sessions idle longer than ttl_seconds are deleted.
+    Finished /asr/stream transcripts wait here for the worker that serves
+    their query.
+    """
+
+    backend = "sqlite"
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            turns INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS turns (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            meta TEXT NOT NULL,
+            audio BLOB,
+            PRIMARY KEY (session_id, seq)
+        );
+        CREATE TABLE IF NOT EXISTS stream_texts (
+            stream_id TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: int = None):
+        self.path = path or os.getenv('SESSION_SQLITE_PATH', '/tmp/synapscribe/sessions.db')
+        self.ttl_seconds = ttl_seconds or int(os.getenv('SESSION_TTL_SECONDS', '3600'))
+        self.expire_interval = 60.0
+        self._last_expire = 0.0
+
+        # One connection on one thread: sqlite3 connections are not shared across threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-sqlite")
+        self._local = threading.local()
+
+        self.counters = {"appends": 0, "reads": 0, "discards": 0, "expirations": 0}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def append_turn(self, session_id: str, turn: Dict) -> int:
+        meta, audio = _split_turn(turn)
+        self.counters["appends"] += 1
+        return await self._run(self._append, session_id, meta, audio)
+
+    async def get_turns(self, session_id: str, include_audio: bool = True) -> List[Dict]:
+        self.counters["reads"] += 1
+        return await self._run(self._get_turns, session_id, include_audio)
+
+    async def version(self, session_id: str) -> int:
+        return await self._run(self._version, session_id)
+
+    async def discard(self, session_id: str):
+        self.counters["discards"] += 1
+        await self._run(self._discard, session_id)
+
+    async def put_stream_text(self, stream_id: str, text: str, ttl_seconds: int):
+        """Publish a finished /asr/stream transcript for the worker that serves its query"""
+        await self._run(self._put_stream_text, stream_id, text, time.time() + ttl_seconds)
+
+    async def take_stream_text(self, stream_id: str) -> Optional[str]:
+        """Remove and return a published transcript; None if it is not there (yet)"""
+        return await self._run(self._take_stream_text, stream_id)
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        try:
+            disk_bytes = os.path.getsize(self.path)
+        except OSError:
+            disk_bytes = 0
+        return {**self.counters, "backend": self.backend, "disk_bytes": disk_bytes}
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")  # Durable across crashes of the process
+            connection.executescript(self.SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _append(self, session_id: str, meta: str, audio: bytes) -> int:
+        db = self._connection()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT INTO sessions (session_id, version, turns, last_access) VALUES (?, 1, 1, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET "
+                "version = version + 1, turns = turns + 1, last_access = excluded.last_access",
+                (session_id, now)
+            )
+            version, seq = db.execute(
+                "SELECT version, turns FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO turns (session_id, seq, meta, audio) VALUES (?, ?, ?, ?)",
+                (session_id, seq, meta, audio)
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+        if now - self._last_expire > self.expire_interval:
+            self._expire(now)
+        return version
+
+    def _get_turns(self, session_id: str, include_audio: bool) -> List[Dict]:
+        db = self._connection()
+        columns = "meta, audio" if include_audio else "meta, NULL"
+        rows = db.execute(
+            f"SELECT {columns} FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        if rows:
+            db.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (time.time(), session_id))
+
+        turns = []
+        for meta, audio in rows:
+            turn = json.loads(meta)
+            if include_audio:
+                turn[AUDIO_FIELD] = bytes(audio or b"")
+            turns.append(turn)
+        return turns
+
+    def _version(self, session_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _discard(self, session_id: str):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            # The row stays (with no turns) so the version keeps increasing
+            db.execute(
+                "UPDATE sessions SET version = version + 1, turns = 0, last_access = ? WHERE session_id = ?",
+                (time.time(), session_id)
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _put_stream_text(self, stream_id: str, text: str, expires_at: float):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO stream_texts (stream_id, text, expires_at) VALUES (?, ?, ?)",
+            (stream_id, text, expires_at)
+        )
+
+    def _take_stream_text(self, stream_id: str) -> Optional[str]:
+        db = self._connection()
+        row = db.execute(
+            "SELECT text FROM stream_texts WHERE stream_id = ? AND expires_at > ?", (stream_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        # Only the worker whose DELETE removed the row gets the text
+        if db.execute("DELETE FROM stream_texts WHERE stream_id = ?", (stream_id,)).rowcount == 0:
+            return None
+        return row[0]
+
+    def _expire(self, now: float):
+        self._last_expire = now
+        db = self._connection()
+        cutoff = now - self.ttl_seconds
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            expired = db.execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM sessions WHERE last_access < ?)",
+                (cutoff,)
+            ).rowcount
+            db.execute("DELETE FROM sessions WHERE last_access < ?", (cutoff,))
+            db.execute("DELETE FROM stream_texts WHERE expires_at < ?", (now,))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        if expired:
+            self.counters["expirations"] += expired
+            logger.warning(f"Expired {expired} turns of idle sessions")
+
+    def _close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class RedisError(Exception):
+    """Error reply from the Redis server"""
+
+
+class RedisConnection:
+    """One RESP2 connection (asyncio streams); commands are pipelined per call"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host: str, port: int, password: str = None, db: int = 0,
+                   timeout: float = 5.0) -> "RedisConnection":
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        connection = cls(reader, writer)
+        setup = []
+        if password:
+            setup.append(("AUTH", password))
+        if db:
+            setup.append(("SELECT", db))
+        if setup:
+            await connection.pipeline(setup)
+        return connection
+
+    async def pipeline(self, commands: List[tuple]) -> List:
+        """Send commands in one write and read one reply per command"""
+        self.writer.write(b"".join(self._encode(command) for command in commands))
+        await self.writer.drain()
+        replies = [await self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def close(self):
+        self.writer.close()
+
+    @staticmethod
+    def _encode(command: tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if isinstance(arg, str):
+                arg = arg.encode("utf-8")
+            elif isinstance(arg, int):
+                arg = str(arg).encode("ascii")
+            parts.append(b"$%d\r\n" % len(arg))
+            parts.append(bytes(arg))
+            parts.append(b"\r\n")
+        return b"".join(parts)
+
+    async def _read_reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            return RedisError(body.decode("utf-8"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            if length < 0:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line[:32]!r}")
+
+
+class RedisSessionStore:
+    """
+    Session turns in Redis, shared by workers on any host
+
+    Per session: a list of turn JSON, a parallel list of audio blobs and a
+    version counter, all with a sliding TTL. Appends and discards run in
+    MULTI/EXEC so the version always matches the lists. Finished
+    /asr/stream transcripts are kept under <prefix>stream:<id> until a
+    worker takes them. Speaks plain RESP, so any Redis-compatible server
+    (or a local stand-in) works.
+    """
+
+    backend = "redis"
+    shared = True
+
+    def __init__(self, url: str = None, ttl_seconds: int = None, pool_size: int = None, prefix: str = None):
+        url = url or os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.ttl_seconds = ttl_seconds or int(os.getenv('SESSION_TTL_SECONDS', '3600'))
+        self.pool_size = pool_size or int(os.getenv('SESSION_REDIS_POOL_SIZE', '8'))
+        self.prefix = prefix or os.getenv('SESSION_REDIS_PREFIX', 'synapscribe:session:')
+
+        self._idle: List[RedisConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.counters = {"appends": 0, "reads": 0, "discards": 0, "connects": 0}
+
+    async def append_turn(self, session_id: str, turn: Dict) -> int:
+        meta, audio = _split_turn(turn)
+        turns, audio_key, version = self._keys(session_id)
+        replies = await self._execute([
+            ("MULTI",),
+            ("RPUSH", turns, meta),
+            ("RPUSH", audio_key, audio),
+            ("INCR", version),
+            ("EXPIRE", turns, self.ttl_seconds),
+            ("EXPIRE", audio_key, self.ttl_seconds),
+            ("EXPIRE", version, self.ttl_seconds),
+            ("EXEC",)
+        ])
+        self.counters["appends"] += 1
+        return int(replies[-1][2])
+
+    async def get_turns(self, session_id: str, include_audio: bool = True) -> List[Dict]:
+        turns, audio_key, _ = self._keys(session_id)
+        commands = [("LRANGE", turns, 0, -1)]
+        if include_audio:
+            commands.append(("LRANGE", audio_key, 0, -1))
+        replies = await self._execute(commands)
+        self.counters["reads"] += 1
+
+        result = [json.loads(meta) for meta in replies[0] or []]
+        if include_audio:
+            blobs = replies[1] or []
+            for turn, audio in zip(result, blobs):
+                turn[AUDIO_FIELD] = audio
+        return result
+
+    async def version(self, session_id: str) -> int:
+        _, _, version = self._keys(session_id)
+        reply = (await self._execute([("GET", version)]))[0]
+        return int(reply) if reply is not None else 0
+
+    async def discard(self, session_id: str):
+        turns, audio_key, version = self._keys(session_id)
+        await self._execute([
+            ("MULTI",),
+            ("DEL", turns, audio_key),
+            ("INCR", version),
+            ("EXPIRE", version, self.ttl_seconds),
+            ("EXEC",)
+        ])
+        self.counters["discards"] += 1
+
+    async def put_stream_text(self, stream_id: str, text: str, ttl_seconds: int):
+        """Publish a finished /asr/stream transcript for the worker that serves its query"""
+        key = f"{self.prefix}stream:{stream_id}"
+        await self._execute([("MULTI",), ("SET", key, text), ("EXPIRE", key, ttl_seconds), ("EXEC",)])
+
+    async def take_stream_text(self, stream_id: str) -> Optional[str]:
+        """Remove and return a published transcript; None if it is not there (yet)"""
+        key = f"{self.prefix}stream:{stream_id}"
+        replies = await self._execute([("MULTI",), ("GET", key), ("DEL", key), ("EXEC",)])
+        text = replies[-1][0]
+        return text.decode("utf-8") if text is not None else None
+
+    async def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle = []
+
+    def stats(self) -> Dict:
+        return {**self.counters, "backend": self.backend, "idle_connections": len(self._idle)}
+
+    def _keys(self, session_id: str):
+        base = f"{self.prefix}{session_id}"
+        return f"{base}:turns", f"{base}:audio", f"{base}:version"
+
+    async def _execute(self, commands: List[tuple]) -> List:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = await RedisConnection.open(self.host, self.port, self.password, self.db)
+                self.counters["connects"] += 1
+            try:
+                replies = await connection.pipeline(commands)
+            except RedisError:
+                self._idle.append(connection)  # Protocol state is intact after an error reply
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            self._idle.append(connection)
+            return replies
+
+
+def worker_count() -> int:
+    """AGENTCORE_WORKERS, or 1 when SESSION_BACKEND keeps sessions in process memory"""
+    if os.getenv('SESSION_BACKEND', 'memory').lower() == 'memory':
+        return 1
+    return max(1, int(os.getenv('AGENTCORE_WORKERS', '1')))
+
+
+def create_session_store():
+    """Session store selected by SESSION_BACKEND: memory (default), sqlite or redis"""
+    backend = os.getenv('SESSION_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteSessionStore()
+    if backend == 'redis':
+        return RedisSessionStore()
+    if backend != 'memory':
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    return SessionStore()
@@ -0,0 +1,149 @@
+"""
+Session store for in-flight Q&A turns
+Bounded memory budget, per-session TTL and LRU eviction
+(single process; see utils/session_backends.py for stores shared by workers)
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    __slots__ = ("turns", "last_access", "memory_bytes")
+
+    def __init__(self):
+        self.turns: List[Dict] = []
+        self.last_access = time.monotonic()
+        self.memory_bytes = 0
+
+
+class SessionStore:
+    """
+    In-memory Q&A turn store with bounded resource usage
+
+    - memory_budget_bytes: global cap on bytes held in RAM. Under pressure,
+      the least recently used sessions are evicted (their turns are already
+      persisted write-behind, so history falls back to DynamoDB).
+    - ttl_seconds: sessions idle longer than this are dropped (abandoned
+      sessions whose /end_session never arrives).
+
+    Methods are coroutines to match the shared backends; this one never
+    blocks. Only one process sees its sessions (shared = False).
+    """
+
+    backend = "memory"
+    shared = False
+
+    def __init__(self, memory_budget_bytes: int = None, ttl_seconds: int = None):
+        self.memory_budget_bytes = memory_budget_bytes or int(
+            os.getenv('SESSION_MEMORY_BUDGET_BYTES', str(256 * 1024 * 1024)))
+        self.ttl_seconds = ttl_seconds or int(os.getenv('SESSION_TTL_SECONDS', '3600'))
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()  # LRU order
+        self.memory_bytes = 0
+
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    async def append_turn(self, session_id: str, turn: Dict) -> int:
+        """Add a completed turn (turn["response_audio"], if any, holds the MP3 bytes); returns the new version"""
+        self._expire()
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        self._touch(session_id, session)
+
+        turn = dict(turn)
+        session.turns.append(turn)
+        self._account(session, self._turn_bytes(turn))
+        self._enforce_budget(protect=session_id)
+        return len(session.turns)
+
+    async def get_turns(self, session_id: str, include_audio: bool = True) -> List[Dict]:
+        """Return a session's turns (without response audio unless include_audio)"""
+        self._expire()
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            self.counters["misses"] += 1
+            return []
+
+        self.counters["hits"] += 1
+        self._touch(session_id, session)
+        if not include_audio:
+            return [{k: v for k, v in turn.items() if k != "response_audio"} for turn in session.turns]
+        return [dict(turn) for turn in session.turns]
+
+    async def version(self, session_id: str) -> int:
+        """Turn count (the history cache only checks versions of shared stores)"""
+        session = self._sessions.get(session_id)
+        return len(session.turns) if session else 0
+
+    async def discard(self, session_id: str):
+        """Remove a session and release its memory"""
+        self._drop(session_id)
+
+    async def close(self):
+        """Nothing to release (the shared backends close files and connections)"""
+
+    def stats(self) -> Dict:
+        """Counters and current usage"""
+        return {
+            **self.counters,
+            "sessions": len(self._sessions),
+            "memory_bytes": self.memory_bytes
+        }
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._release(session)
+
+    def _touch(self, session_id: str, session: _Session):
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+
+    def _account(self, session: _Session, delta: int):
+        session.memory_bytes += delta
+        self.memory_bytes += delta
+
+    def _turn_bytes(self, turn: Dict) -> int:
+        size = len(turn.get("query_text") or "") + len(turn.get("response_text") or "")
+        audio = turn.get("response_audio")
+        if isinstance(audio, (bytes, bytearray)):
+            size += len(audio)
+        return size
+
+    def _enforce_budget(self, protect: str = None):
+        """Evict least recently used sessions until under budget"""
+        while self.memory_bytes > self.memory_budget_bytes and len(self._sessions) > 1:
+            session_id = next(iter(self._sessions))
+            if session_id == protect:
+                break
+            logger.warning(f"Evicting session {session_id} (memory budget exceeded)")
+            self._drop(session_id)
+            self.counters["evictions"] += 1
+
+    def _expire(self):
+        """Drop sessions idle for longer than the TTL (LRU head first)"""
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            logger.warning(f"Expiring idle session {session_id} ({len(session.turns)} turns)")
+            self._drop(session_id)
+            self.counters["expirations"] += 1
+
+    def _release(self, session: _Session):
+        self.memory_bytes -= session.memory_bytes
@@ -0,0 +1,270 @@
+"""
+Incremental ASR for query audio streamed while the user is speaking
+Energy VAD segments 16 kHz PCM16 and transcribes each segment as soon as it closes
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.audio_processing import FRAME_SECONDS, SAMPLE_RATE, frame_levels, pcm_to_wav
+
+logger = logging.getLogger(__name__)
+
+# Starting noise floor: low, so audio that starts mid-speech still counts as speech
+INITIAL_NOISE_FLOOR_DB = -60.0
+
+# Frames quieter than this are never speech, whatever the noise floor
+MIN_SPEECH_DB = -55.0
+
+
+class StreamingTranscriber:
+    """
+    Transcribes one utterance that arrives as raw PCM16 mono chunks
+
+    Each frame is classified as speech or silence against an adaptive noise
+    floor, which starts at INITIAL_NOISE_FLOOR_DB and rises in steady noise.
+    A segment closes after min_silence_seconds of silence (once it holds
+    min_segment_seconds of audio) or at max_segment_seconds, and its ASR
+    request starts immediately. Audio is only dropped when a segment closes
+    with no speech in it. When the stream ends only the tail segment is
+    still to transcribe; finish() joins the texts in order. A stream holds
+    at most max_stream_seconds of audio; feeding more raises ValueError.
+    """
+
+    def __init__(
+        self,
+        vllm,
+        session_id: str = None,
+        on_segment: Optional[Callable[[int, str], Awaitable[None]]] = None,
+        min_silence_seconds: float = None,
+        min_segment_seconds: float = None,
+        max_segment_seconds: float = None,
+        max_stream_seconds: float = None
+    ):
+        self.vllm = vllm
+        self.session_id = session_id
+        self.on_segment = on_segment
+        self.min_silence_seconds = min_silence_seconds or float(os.getenv('STREAM_ASR_MIN_SILENCE_SECONDS', '0.5'))
+        self.min_segment_seconds = min_segment_seconds or float(os.getenv('STREAM_ASR_MIN_SEGMENT_SECONDS', '2'))
+        self.max_segment_seconds = max_segment_seconds or float(os.getenv('STREAM_ASR_MAX_SEGMENT_SECONDS', '15'))
+        self.max_stream_seconds = max_stream_seconds or float(os.getenv('STREAM_ASR_MAX_STREAM_SECONDS', '120'))
+        self.speech_margin_db = float(os.getenv('STREAM_ASR_SPEECH_MARGIN_DB', '10'))
+
+        self.frame_bytes = int(SAMPLE_RATE * FRAME_SECONDS) * 2
+        self.max_bytes = int(self.max_stream_seconds * SAMPLE_RATE) * 2
+
+        self._remainder = bytearray()  # Incomplete frame
+        self._segment = bytearray()
+        self._voiced_frames = 0
+        self._silent_run = 0
+        self._noise_floor = INITIAL_NOISE_FLOOR_DB
+
+        self._tasks: List[asyncio.Task] = []
+        self._result: Optional[asyncio.Future] = None
+        self.ended = asyncio.Event()  # Set when the client has sent all audio
+        self.created_at = time.monotonic()
+        self.audio_bytes = 0
+
+    def feed(self, chunk: bytes):
+        """Add PCM16 audio; may start ASR for a completed segment"""
+        if self.ended.is_set():
+            return
+        if self.audio_bytes + len(chunk) > self.max_bytes:
+            raise ValueError(f"ASR stream exceeds {self.max_stream_seconds:.0f}s of audio")
+        self.audio_bytes += len(chunk)
+        self._remainder.extend(chunk)
+        count = len(self._remainder) // self.frame_bytes
+        if count == 0:
+            return
+
+        data = bytes(self._remainder[:count * self.frame_bytes])
+        del self._remainder[:count * self.frame_bytes]
+        levels = frame_levels(np.frombuffer(data, dtype=np.int16))
+
+        for i, level in enumerate(levels):
+            self._add_frame(data[i * self.frame_bytes:(i + 1) * self.frame_bytes], float(level))
+
+    async def finish(self) -> str:
+        """Close the tail segment and return the full transcript"""
+        self.ended.set()
+        if self._result is None:
+            self._result = asyncio.get_running_loop().create_future()
+            self._segment.extend(self._remainder)
+            self._remainder.clear()
+            self._close_segment()
+            try:
+                texts = await asyncio.gather(*self._tasks)
+                self._result.set_result(" ".join(text for text in texts if text))
+            except Exception as e:
+                self._result.set_exception(e)
+        return await asyncio.shield(self._result)
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def _add_frame(self, frame: bytes, level: float):
+        # Noise floor follows quiet frames quickly and loud frames slowly
+        # (about 1.7 dB/s, so steady background noise stops counting as
+        # speech within seconds while pauses keep pulling it back down)
+        if level < self._noise_floor + self.speech_margin_db:
+            self._noise_floor = 0.95 * self._noise_floor + 0.05 * level
+        else:
+            self._noise_floor += 0.05
+
+        voiced = level > max(self._noise_floor + self.speech_margin_db, MIN_SPEECH_DB)
+        self._segment.extend(frame)
+
+        if voiced:
+            self._voiced_frames += 1
+            self._silent_run = 0
+        else:
+            self._silent_run += 1
+
+        seconds = len(self._segment) / 2 / SAMPLE_RATE
+        if self._voiced_frames == 0:
+            # Nothing said yet: the segment closes (and is dropped) only at max length
+            if seconds >= self.max_segment_seconds:
+                self._close_segment()
+            return
+
+        paused = self._silent_run * FRAME_SECONDS >= self.min_silence_seconds
+        if (paused and seconds >= self.min_segment_seconds) or seconds >= self.max_segment_seconds:
+            self._close_segment()
+
+    def _close_segment(self):
+        if self._voiced_frames > 0:
+            index = len(self._tasks)
+            wav = pcm_to_wav(bytes(self._segment), SAMPLE_RATE)
+            self._tasks.append(asyncio.create_task(self._transcribe(index, wav)))
+            logger.info(f"Stream segment {index} closed ({len(self._segment) / 2 / SAMPLE_RATE:.1f}s)")
+
+        self._segment = bytearray()
+        self._voiced_frames = 0
+        self._silent_run = 0
+
+    async def _transcribe(self, index: int, wav: bytes) -> str:
+        text = await self.vllm.transcribe_audio(wav, mime_type="audio/wav", session_id=self.session_id)
+        if self.on_segment is not None:
+            try:
+                await self.on_segment(index, text)
+            except Exception as e:
+                logger.warning(f"Could not report stream segment {index}: {e}")
+        return text
+
+
+class StreamingASRRegistry:
+    """
+    Open and finished ASR streams, keyed by stream id
+
+    A stream is consumed by the /invoke query that references it; streams
+    never consumed are dropped after ttl_seconds, and at most max_open
+    streams exist at once. With a shared session store, uvicorn workers do
+    not share these streams: the worker holding the WebSocket publishes the
+    finished transcript to the store, and a query on another worker polls
+    the store for it.
+    """
+
+    def __init__(self, vllm, store=None, ttl_seconds: int = None, end_timeout: float = None):
+        self.vllm = vllm
+        self.store = store if store is not None and store.shared else None
+        self.ttl_seconds = ttl_seconds or int(os.getenv('STREAM_ASR_TTL_SECONDS', '120'))
+        self.max_open = int(os.getenv('STREAM_ASR_MAX_OPEN', '64'))
+        # How long a query waits for a stream that is still receiving audio
+        self.end_timeout = end_timeout or float(os.getenv('STREAM_ASR_END_TIMEOUT_SECONDS', '10'))
+        # How long a query on another worker waits for the published transcript
+        self.remote_timeout = float(os.getenv('STREAM_ASR_REMOTE_TIMEOUT_SECONDS', '30'))
+        self.poll_interval = 0.05
+        self._streams: Dict[str, StreamingTranscriber] = {}
+        self._claimed = set()  # Streams a local query is waiting for
+
+        self.counters = {
+            "streams": 0,
+            "consumed": 0,
+            "expired": 0,
+            "rejected": 0,
+            "published": 0,
+            "remote": 0
+        }
+
+    def create(
+        self,
+        session_id: str = None,
+        stream_id: str = None,
+        on_segment: Optional[Callable[[int, str], Awaitable[None]]] = None
+    ) -> Tuple[str, StreamingTranscriber]:
+        self._expire()
+        stream_id = stream_id or str(uuid.uuid4())
+        if stream_id in self._streams:
+            raise ValueError(f"ASR stream {stream_id} already exists")
+        if len(self._streams) >= self.max_open:
+            self.counters["rejected"] += 1
+            raise ValueError("Too many open ASR streams, please retry")
+
+        transcriber = StreamingTranscriber(self.vllm, session_id=session_id, on_segment=on_segment)
+        self._streams[stream_id] = transcriber
+        self.counters["streams"] += 1
+        return stream_id, transcriber
+
+    async def take(self, stream_id: str) -> str:
+        """Wait for a stream's transcript and remove the stream"""
+        transcriber = self._streams.get(stream_id)
+        if transcriber is None:
+            if self.store is None:
+                raise ValueError(f"Unknown or expired ASR stream: {stream_id}")
+            return await self._take_remote(stream_id)
+
+        self._claimed.add(stream_id)
+        try:
+            try:
+                await asyncio.wait_for(transcriber.ended.wait(), timeout=self.end_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"ASR stream {stream_id} did not end in time, using audio so far")
+            text = await transcriber.finish()
+        finally:
+            self._streams.pop(stream_id, None)
+            self._claimed.discard(stream_id)
+        self.counters["consumed"] += 1
+        return text
+
+    async def publish(self, stream_id: str, text: str):
+        """Hand a finished transcript to the store, unless a query on this worker is already waiting"""
+        if self.store is None or stream_id in self._claimed or stream_id not in self._streams:
+            return
+        await self.store.put_stream_text(stream_id, text, self.ttl_seconds)
+        self._streams.pop(stream_id, None)
+        self.counters["published"] += 1
+
+    def discard(self, stream_id: str):
+        transcriber = self._streams.pop(stream_id, None)
+        if transcriber is not None:
+            transcriber.cancel()
+
+    def stats(self) -> Dict:
+        return {**self.counters, "open": len(self._streams)}
+
+    async def _take_remote(self, stream_id: str) -> str:
+        """Poll the shared store for a transcript published by another worker"""
+        deadline = time.monotonic() + self.end_timeout + self.remote_timeout
+        while True:
+            text = await self.store.take_stream_text(stream_id)
+            if text is not None:
+                self.counters["consumed"] += 1
+                self.counters["remote"] += 1
+                return text
+            if time.monotonic() >= deadline:
+                raise ValueError(f"Unknown or expired ASR stream: {stream_id}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _expire(self):
+        now = time.monotonic()
+        for stream_id, transcriber in list(self._streams.items()):
+            if now - transcriber.created_at > self.ttl_seconds:
+                self.discard(stream_id)
+                self.counters["expired"] += 1
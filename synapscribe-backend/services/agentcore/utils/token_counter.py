@@ -0,0 +1,85 @@
+"""
+Token counting for prompt budgets
+Uses the model's tokenizer.json when the tokenizers package is installed, else an offline estimate
+"""
+
+import logging
+import os
+import re
+from typing import Dict, List
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # Optional; the estimate below needs nothing
+    Tokenizer = None
+
+logger = logging.getLogger(__name__)
+
+# ChatML framing per message: <|im_start|>, role, newline, <|im_end|>, newline
+MESSAGE_OVERHEAD_TOKENS = 5
+
+# Words (any script), single digits and single symbols, split roughly the way
+# Qwen's byte-level BPE pre-tokenizer splits text (digits are one token each)
+_PIECES = re.compile(r"[^\W\d_]+|\d|\S")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Tokenizer-free estimate, calibrated to slightly overcount Qwen2 on
+    English: common words are one token, long words about one per six
+    characters, non-Latin scripts about one per character.
+    """
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        if piece.isascii() and piece.isalpha():
+            tokens += 1 + (len(piece) - 1) // 6
+        elif piece.isalpha():
+            tokens += len(piece)
+        else:
+            tokens += 1
+    return tokens
+
+
+class TokenCounter:
+    """
+    Counts tokens of text and chat messages
+
+    Loads TOKENIZER_PATH (a local tokenizer.json, e.g. from the Qwen2.5-Omni
+    model directory) with the tokenizers package; nothing is downloaded.
+    Without either, estimate_tokens() is used.
+    """
+
+    def __init__(self, tokenizer_path: str = None):
+        self.tokenizer_path = tokenizer_path or os.getenv('TOKENIZER_PATH', '')
+        self._tokenizer = None
+
+        if self.tokenizer_path and Tokenizer is not None:
+            try:
+                self._tokenizer = Tokenizer.from_file(self.tokenizer_path)
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer {self.tokenizer_path}: {e}")
+        elif self.tokenizer_path:
+            logger.warning("TOKENIZER_PATH is set but the tokenizers package is not installed")
+
+        logger.info(f"TokenCounter using {self.method}")
+
+    @property
+    def method(self) -> str:
+        return "tokenizer" if self._tokenizer is not None else "estimate"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return estimate_tokens(text)
+
+    def count_messages(self, messages: List[Dict]) -> int:
+        """Prompt tokens of chat messages with text content"""
+        total = 0
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+            total += self.count(content or "") + MESSAGE_OVERHEAD_TOKENS
+        return total
@@ -0,0 +1,227 @@
+"""
+Content-addressed TTS audio cache
+Memory LRU tier, size-capped disk tier and single-flight request deduplication
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """
+    Cache of synthesized audio keyed by sha256(text, voice, format)
+
+    Lookups check the memory tier, then the disk tier (promoting hits to
+    memory). Concurrent requests for the same key share one synthesis; if
+    that one fails or is abandoned, its waiters retry (join() returns None
+    to the caller that should synthesize next).
+    """
+
+    def __init__(self, memory_bytes: int = None, disk_dir: str = None, disk_bytes: int = None):
+        self.memory_limit = memory_bytes or int(
+            os.getenv('TTS_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+        self.disk_dir = disk_dir or os.getenv('TTS_CACHE_DIR', '/tmp/synapscribe/tts')
+        self.disk_limit = disk_bytes or int(
+            os.getenv('TTS_CACHE_DISK_BYTES', str(1024 * 1024 * 1024)))
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # key -> size, LRU order
+        self._disk_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "abandoned": 0
+        }
+
+        os.makedirs(self.disk_dir, exist_ok=True)
+        self._scan_disk()
+
+    @staticmethod
+    def make_key(text: str, voice: str, response_format: str) -> str:
+        digest = hashlib.sha256()
+        for part in (text, voice, response_format):
+            digest.update(part.encode('utf-8'))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio or None"""
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return audio
+
+        if key in self._disk:
+            loop = asyncio.get_running_loop()
+            audio = await loop.run_in_executor(None, self._read_file, key)
+            if audio is not None:
+                self._disk.move_to_end(key)
+                self._put_memory(key, audio)
+                self.counters["disk_hits"] += 1
+                return audio
+            self._disk_bytes -= self._disk.pop(key, 0)
+
+        return None
+
+    async def put(self, key: str, audio: bytes):
+        """Store audio in both tiers"""
+        self._put_memory(key, audio)
+        if key in self._disk or len(audio) > self.disk_limit:
+            return
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_file, key, audio)
+        if key in self._disk:
+            return  # Written concurrently by another caller
+
+        self._disk[key] = len(audio)
+        self._disk_bytes += len(audio)
+        while self._disk_bytes > self.disk_limit:
+            evicted_key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+    async def join(self, key: str) -> Optional[bytes]:
+        """
+        Cached audio, or the audio of an identical synthesis in flight
+
+        Returns None when the caller has to synthesize (call begin() right
+        away): nothing is cached or in flight, or the synthesis it waited
+        for failed or was abandoned and no other caller has taken over.
+        """
+        while True:
+            audio = await self.get(key)
+            if audio is not None:
+                return audio
+
+            pending = self.inflight(key)
+            if pending is None:
+                return None
+            audio = await asyncio.shield(pending)
+            if audio is not None:
+                return audio
+
+    def inflight(self, key: str) -> Optional[asyncio.Future]:
+        """Future for an identical synthesis already in progress, if any"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+        return future
+
+    def begin(self, key: str) -> asyncio.Future:
+        """Register this caller as the one synthesizing key"""
+        self.counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    async def complete(self, key: str, audio: bytes):
+        """Publish a finished synthesis to waiters and the cache"""
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(audio)
+        await self.put(key, audio)
+
+    def fail(self, key: str):
+        """Release waiters of a failed or abandoned synthesis (they retry, see join())"""
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            self.counters["abandoned"] += 1
+            future.set_result(None)
+
+    async def get_or_create(self, key: str, factory: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Return cached audio, join an identical in-flight request, or synthesize"""
+        audio = await self.join(key)
+        if audio is not None:
+            return audio
+
+        self.begin(key)
+        try:
+            audio = await factory()
+        except BaseException:
+            self.fail(key)
+            raise
+        await self.complete(key, audio)
+        return audio
+
+    def stats(self) -> Dict:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        lookups = hits + self.counters["misses"] + self.counters["coalesced"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes
+        }
+
+    def _put_memory(self, key: str, audio: bytes):
+        if len(audio) > self.memory_limit:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.audio")
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_file(self, key: str, audio: bytes):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Unique temporary name: workers sharing TTS_CACHE_DIR may write the same key
+        fd, partial_path = tempfile.mkstemp(dir=directory, prefix=f"{key}.", suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(partial_path, path)
+        except BaseException:
+            try:
+                os.remove(partial_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _scan_disk(self):
+        """Rebuild the disk index (oldest first) from a previous run"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".audio"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        logger.info(f"TTS disk cache: {len(self._disk)} entries, {self._disk_bytes} bytes")
@@ -0,0 +1,244 @@
+"""
+Write-behind persistence for completed Q&A turns
+Response audio is uploaded to S3 and turn items are written to DynamoDB, in the background
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TurnPersister:
+    """
+    Background writer that makes each turn durable shortly after it completes
+
+    submit() returns immediately. The turn gets its number from the turns
+    table's atomic counter (TurnTable.allocate_turn), in submit order per
+    session, so numbers, S3 keys and turn items never repeat after session
+    memory is lost. Response audio is then uploaded on the
+    AsyncS3Client pool, at most upload_concurrency at a time; the turn then
+    joins a batch. A batch is written once batch_size turns are waiting or
+    batch_window seconds have passed, as one BatchWriteItem of turn items
+    (utils/turn_table.py) covering every session in it. Failed uploads and
+    writes are retried with backoff; rewriting a turn item is harmless.
+
+    flush(session_id) waits until a session's submitted turns are written,
+    so /end_session only has to finalize the session item.
+    """
+
+    def __init__(
+        self,
+        s3,
+        dynamodb,
+        turn_table,
+        s3_bucket: str,
+        dynamodb_table: str,
+        upload_concurrency: int = None,
+        batch_size: int = None,
+        batch_window: float = None,
+        max_attempts: int = None
+    ):
+        # s3 is an AsyncS3Client, turn_table a TurnTable
+        self.s3 = s3
+        self.dynamodb = dynamodb
+        self.turn_table = turn_table
+        self.s3_bucket = s3_bucket
+        self.dynamodb_table = dynamodb_table
+
+        self.upload_concurrency = upload_concurrency or int(os.getenv('PERSIST_UPLOAD_CONCURRENCY', '4'))
+        self.batch_size = batch_size or turn_table.MAX_BATCH_ITEMS
+        self.batch_window = batch_window or float(os.getenv('PERSIST_BATCH_WINDOW_SECONDS', '0.05'))
+        self.max_attempts = max_attempts or int(os.getenv('PERSIST_MAX_ATTEMPTS', '5'))
+
+        self._uploads: Optional[asyncio.Semaphore] = None
+        self._batch: List[Dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+        # Turns submitted but not yet written, flush() waiters and turn number
+        # allocation order, per session
+        self._pending: Dict[str, int] = {}
+        self._drained: Dict[str, asyncio.Event] = {}
+        self._allocating: Dict[str, asyncio.Lock] = {}
+
+        self.counters = {
+            "submitted": 0,
+            "uploaded": 0,
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed": 0
+        }
+
+    def submit(self, session_id: str, lecture_id: str, qa: Dict, audio: bytes):
+        """Queue a completed turn (qa holds the turn fields kept in session memory)"""
+        self._start()
+        self.counters["submitted"] += 1
+        self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        lock = self._allocating.setdefault(session_id, asyncio.Lock())
+
+        task = asyncio.create_task(self._persist(session_id, lecture_id, qa, audio, lock))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, session_id: str, timeout: float = 10.0) -> bool:
+        """Wait until a session's submitted turns are written; False on timeout"""
+        if not self._pending.get(session_id):
+            return True
+        event = self._drained.setdefault(session_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out flushing {self._pending.get(session_id, 0)} turns of session {session_id}")
+            return False
+
+    async def finalize(self, session_id: str, lecture_id: str, total_turns: int):
+        """Mark the session item ended (turns live in the turns table)"""
+        now = datetime.now()
+        await self._with_retries(
+            f"finalize session {session_id}",
+            self._update,
+            session_id,
+            "SET lectureId = :lectureId, totalTurns = :totalTurns, sessionStatus = :status, "
+            "turnLayout = :layout, createdAt = if_not_exists(createdAt, :now), "
+            "endedAt = :now, expiresAt = :expiresAt",
+            {
+                ":lectureId": lecture_id,
+                ":layout": "items",
+                ":totalTurns": total_turns,
+                ":status": "ended",
+                ":now": now.isoformat(),
+                ":expiresAt": self._expires_at(now)
+            }
+        )
+
+    async def close(self, timeout: float = 10.0):
+        """Write everything still queued, then stop the writer"""
+        for session_id in list(self._pending):
+            await self.flush(session_id, timeout=timeout)
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "queued_turns": sum(self._pending.values()),
+            "queued_sessions": len(self._pending)
+        }
+
+    def _start(self):
+        if self._writer is None:
+            self._uploads = asyncio.Semaphore(self.upload_concurrency)
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.create_task(self._write_batches())
+
+    async def _persist(self, session_id: str, lecture_id: str, qa: Dict, audio: bytes, lock: asyncio.Lock):
+        try:
+            async with lock:  # Tasks queue on the lock in submit order
+                turn = await self._with_retries(
+                    f"allocate a turn of session {session_id}",
+                    self.turn_table.allocate_turn,
+                    session_id
+                )
+            response_s3_key = f"responses/{session_id}/response-{turn}.mp3"
+            if audio:
+                async with self._uploads:
+                    await self._with_retries(
+                        f"upload {response_s3_key}",
+                        self.s3.put_object,
+                        Bucket=self.s3_bucket,
+                        Key=response_s3_key,
+                        Body=audio,
+                        ContentType='audio/mpeg'
+                    )
+                self.counters["uploaded"] += 1
+        except Exception:
+            self.counters["failed"] += 1
+            self._done(session_id, 1)
+            return
+
+        self._batch.append({
+            "session_id": session_id,
+            "lecture_id": lecture_id,
+            "entry": {
+                "turn": turn,
+                "turnId": qa['turn_id'],
+                "queryText": qa['query_text'],
+                "responseText": qa['response_text'],
+                "queryAudio": qa.get('query_audio_s3_key'),
+                "responseAudio": response_s3_key if audio else None,
+                "timestamp": qa['timestamp']
+            }
+        })
+        self._wakeup.set()
+
+    async def _write_batches(self):
+        while True:
+            await self._wakeup.wait()
+            if len(self._batch) < self.batch_size:
+                await asyncio.sleep(self.batch_window)  # Let turns of other sessions join
+            self._wakeup.clear()
+
+            batch, self._batch = self._batch[:self.batch_size], self._batch[self.batch_size:]
+            if self._batch:
+                self._wakeup.set()
+            if batch:
+                self.counters["batches"] += 1
+                await self._write(batch)
+
+    async def _write(self, batch: List[Dict]):
+        """One BatchWriteItem (up to 25 turns, any sessions) per batch"""
+        items = [self.turn_table.item(r["session_id"], r["lecture_id"], r["entry"]) for r in batch]
+        try:
+            await self._with_retries(f"write {len(items)} turns", self.turn_table.put_items, items)
+            self.counters["written"] += len(items)
+        except Exception:
+            self.counters["failed"] += len(items)
+        finally:
+            for record in batch:
+                self._done(record["session_id"], 1)
+
+    async def _update(self, session_id: str, expression: str, values: Dict):
+        table = self.dynamodb.Table(self.dynamodb_table)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: table.update_item(
+                Key={"sessionId": session_id},
+                UpdateExpression=expression,
+                ExpressionAttributeValues=values
+            )
+        )
+
+    async def _with_retries(self, description: str, function, *args, **kwargs):
+        for attempt in range(self.max_attempts):
+            try:
+                return await function(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts - 1:
+                    logger.error(f"Failed to {description}: {e}", exc_info=True)
+                    raise
+                self.counters["retries"] += 1
+                logger.warning(f"Retrying {description} ({e})")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    def _done(self, session_id: str, count: int):
+        remaining = self._pending.get(session_id, 0) - count
+        if remaining > 0:
+            self._pending[session_id] = remaining
+            return
+        self._pending.pop(session_id, None)
+        self._allocating.pop(session_id, None)
+        event = self._drained.pop(session_id, None)
+        if event is not None:
+            event.set()
+
+    def _expires_at(self, now: datetime) -> int:
+        return int((now + timedelta(days=self.turn_table.retention_days)).timestamp())
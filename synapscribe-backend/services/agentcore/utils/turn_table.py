@@ -0,0 +1,236 @@
+"""
+Per-turn conversation storage in DynamoDB
+One item per turn (sessionId + turn), so history reads fetch only the last N turns
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from boto3.dynamodb.conditions import Key
+
+logger = logging.getLogger(__name__)
+
+# Attributes needed to rebuild chat history
+HISTORY_PROJECTION = "#turn, turnId, queryText, responseText"
+
+
+class TurnTable:
+    """
+    Reads and writes turn items in the turns table (DYNAMODB_TURNS_TABLE)
+
+    Key schema: sessionId (HASH) + turn (RANGE, number), TTL on expiresAt.
+    recent() is a reverse Query with Limit and a projection of the text
+    fields, so its cost does not depend on how long the session is.
+
+    Turn numbers come from allocate_turn(), an atomic counter (nextTurn) on
+    the sessions item, so they never repeat when session memory is lost.
+
+    Sessions saved before this layout keep their turns in a "conversation"
+    list on the sessions table item. recent() falls back to that list when
+    a session has no turn items, and migrates the session in the background
+    so the next read is a plain Query.
+    """
+
+    # BatchWriteItem accepts at most 25 puts per call
+    MAX_BATCH_ITEMS = 25
+
+    def __init__(self, dynamodb, sessions_table: str, turns_table: str = None, max_attempts: int = None):
+        self.dynamodb = dynamodb
+        self.sessions_table = sessions_table
+        self.turns_table = turns_table or os.getenv('DYNAMODB_TURNS_TABLE', 'SynapScribe-Turns')
+        self.max_attempts = max_attempts or int(os.getenv('PERSIST_MAX_ATTEMPTS', '5'))
+        self.retention_days = 7
+
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='turns')
+        self._migrations: Dict[str, asyncio.Task] = {}
+
+        self.counters = {"queries": 0, "legacy_reads": 0, "migrated_sessions": 0, "unprocessed_retries": 0}
+
+    def item(self, session_id: str, lecture_id: str, entry: Dict) -> Dict:
+        """Turn item for a conversation entry ({"turn", "queryText", ...}); None values are left out"""
+        item = {key: value for key, value in entry.items() if value is not None}
+        item["sessionId"] = session_id
+        item["turn"] = int(entry["turn"])
+        if lecture_id:
+            item["lectureId"] = lecture_id
+        item.setdefault("expiresAt", int((datetime.now() + timedelta(days=self.retention_days)).timestamp()))
+        return item
+
+    async def allocate_turn(self, session_id: str) -> int:
+        """
+        Next turn number of a session (ADD nextTurn on the sessions item)
+
+        A session with turns but no counter yet (a legacy conversation list,
+        or items written before the counter) continues after its last turn.
+        """
+        turn = await self._run(self._add_next_turn, session_id)
+        if turn == 1:
+            last = await self._run(self._last_turn, session_id)
+            if last:
+                await self._run(self._seed_next_turn, session_id, last)
+                turn = await self._run(self._add_next_turn, session_id)
+        return turn
+
+    async def count(self, session_id: str) -> int:
+        """Number of turn items written for a session"""
+        return await self._run(self._count, session_id)
+
+    async def put_items(self, items: List[Dict]):
+        """Write turn items with BatchWriteItem, retrying unprocessed items"""
+        for start in range(0, len(items), self.MAX_BATCH_ITEMS):
+            await self._run(self._put_batch, items[start:start + self.MAX_BATCH_ITEMS])
+
+    async def recent(self, session_id: str, limit: int) -> Dict[int, tuple]:
+        """Last `limit` turns as {turn: (query_text, response_text, turn_id)}"""
+        self.counters["queries"] += 1
+        rows = await self._run(self._query_recent, session_id, limit)
+        if rows:
+            return {
+                int(row["turn"]): (row["queryText"], row["responseText"], row.get("turnId"))
+                for row in rows
+            }
+
+        conversation = await self._run(self._legacy_conversation, session_id)
+        if not conversation:
+            return {}
+        self.counters["legacy_reads"] += 1
+        self._schedule_migration(session_id, conversation)
+
+        turns = {}
+        for position, entry in enumerate(conversation, start=1):
+            turns[int(entry.get("turn", position))] = (entry["queryText"], entry["responseText"], None)
+        return dict(sorted(turns.items())[-limit:])
+
+    async def migrate(self, session_id: str, conversation: Optional[List[Dict]] = None):
+        """Copy a legacy conversation list into turn items, then drop the list"""
+        if conversation is None:
+            conversation = await self._run(self._legacy_conversation, session_id)
+        if not conversation:
+            return
+
+        items = [
+            self.item(session_id, entry.get("lectureId"), {"turn": position, **entry})
+            for position, entry in enumerate(conversation, start=1)
+        ]
+        await self.put_items(items)
+        await self._run(self._remove_conversation, session_id)
+        self.counters["migrated_sessions"] += 1
+        logger.info(f"Migrated {len(items)} turns of session {session_id} to {self.turns_table}")
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        return {**self.counters, "migrations_running": len(self._migrations)}
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    def _schedule_migration(self, session_id: str, conversation: List[Dict]):
+        if session_id in self._migrations:
+            return
+
+        async def run():
+            try:
+                await self.migrate(session_id, conversation)
+            except Exception as e:
+                logger.warning(f"Migration of session {session_id} failed (will retry on next read): {e}")
+
+        task = asyncio.create_task(run())
+        self._migrations[session_id] = task
+        task.add_done_callback(lambda _: self._migrations.pop(session_id, None))
+
+    def _query_recent(self, session_id: str, limit: int) -> List[Dict]:
+        table = self.dynamodb.Table(self.turns_table)
+        response = table.query(
+            KeyConditionExpression=Key("sessionId").eq(session_id),
+            ScanIndexForward=False,  # Newest first, so Limit keeps the last N
+            Limit=limit,
+            ProjectionExpression=HISTORY_PROJECTION,
+            ExpressionAttributeNames={"#turn": "turn"}
+        )
+        return response.get("Items", [])
+
+    def _add_next_turn(self, session_id: str) -> int:
+        table = self.dynamodb.Table(self.sessions_table)
+        response = table.update_item(
+            Key={"sessionId": session_id},
+            UpdateExpression="ADD nextTurn :one SET expiresAt = if_not_exists(expiresAt, :expiresAt)",
+            ExpressionAttributeValues={
+                ":one": 1,
+                ":expiresAt": int((datetime.now() + timedelta(days=self.retention_days)).timestamp())
+            },
+            ReturnValues="UPDATED_NEW"
+        )
+        return int(response["Attributes"]["nextTurn"])
+
+    def _seed_next_turn(self, session_id: str, last: int):
+        table = self.dynamodb.Table(self.sessions_table)
+        try:
+            table.update_item(
+                Key={"sessionId": session_id},
+                UpdateExpression="SET nextTurn = :last",
+                ConditionExpression="nextTurn < :last",
+                ExpressionAttributeValues={":last": last}
+            )
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass  # Another allocation already moved past it
+
+    def _last_turn(self, session_id: str) -> int:
+        table = self.dynamodb.Table(self.turns_table)
+        rows = table.query(
+            KeyConditionExpression=Key("sessionId").eq(session_id),
+            ScanIndexForward=False,
+            Limit=1,
+            ProjectionExpression="#turn",
+            ExpressionAttributeNames={"#turn": "turn"}
+        ).get("Items", [])
+        last = int(rows[0]["turn"]) if rows else 0
+        return max(last, len(self._legacy_conversation(session_id)))
+
+    def _count(self, session_id: str) -> int:
+        table = self.dynamodb.Table(self.turns_table)
+        kwargs = {"KeyConditionExpression": Key("sessionId").eq(session_id), "Select": "COUNT"}
+        total = 0
+        while True:
+            response = table.query(**kwargs)
+            total += response["Count"]
+            if "LastEvaluatedKey" not in response:
+                return total
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def _legacy_conversation(self, session_id: str) -> List[Dict]:
+        table = self.dynamodb.Table(self.sessions_table)
+        response = table.get_item(
+            Key={"sessionId": session_id},
+            ProjectionExpression="conversation, lectureId"
+        )
+        item = response.get("Item") or {}
+        lecture_id = item.get("lectureId")
+        return [{"lectureId": lecture_id, **entry} for entry in item.get("conversation") or []]
+
+    def _remove_conversation(self, session_id: str):
+        table = self.dynamodb.Table(self.sessions_table)
+        table.update_item(
+            Key={"sessionId": session_id},
+            UpdateExpression="REMOVE conversation SET turnLayout = :layout",
+            ConditionExpression="attribute_exists(sessionId)",
+            ExpressionAttributeValues={":layout": "items"}
+        )
+
+    def _put_batch(self, items: List[Dict]):
+        requests = [{"PutRequest": {"Item": item}} for item in items]
+        for attempt in range(self.max_attempts):
+            response = self.dynamodb.batch_write_item(RequestItems={self.turns_table: requests})
+            requests = response.get("UnprocessedItems", {}).get(self.turns_table, [])
+            if not requests:
+                return
+            self.counters["unprocessed_retries"] += 1
+            time.sleep(0.05 * 2 ** attempt)  # On the executor thread
+        raise RuntimeError(f"{len(requests)} turn items still unprocessed after {self.max_attempts} attempts")
@@ -4,20 +4,55 @@ Uses vLLM API with prompt engineering for transcription and Q&A
 """
 
 import aiohttp
+import asyncio
+import base64
+import json
 import logging
+import mimetypes
 import os
-from typing import List, Dict
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, List, Dict
+from urllib.parse import urlparse
+from utils.scheduler import RequestScheduler
+from utils.endpoint_pool import EndpointPool, UpstreamError
 
 logger = logging.getLogger(__name__)
 
+# Hosts that share AgentCore's filesystem, so file:// media URLs resolve there
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
 
 class VLLMClient:
     """Client for vLLM API with ASR and Q&A capabilities"""
 
-    def __init__(self, endpoint: str = None):
-        self.endpoint = endpoint or os.getenv("VLLM_ENDPOINT", "http://localhost:8000")
+    def __init__(self, endpoint: str = None, workers: int = 1):
+        # One or more vLLM replicas (VLLM_ENDPOINTS="http://a:8000,http://b:8000")
+        if endpoint:
+            self.pool = EndpointPool(EndpointPool.parse(endpoint), name="vllm")
+        else:
+            self.pool = EndpointPool.from_env(
+                "VLLM_ENDPOINTS", "VLLM_ENDPOINT", "http://localhost:8000", name="vllm"
+            )
         self.session = None
-        logger.info(f"VLLMClient initialized with endpoint: {self.endpoint}")
+
+        # Replicas on other hosts cannot read file:// lecture audio; their
+        # requests carry it inline as a data URL (VLLM_LOCAL_HOSTS adds hosts
+        # that mount the same LECTURE_CACHE_DIR)
+        local_hosts = LOCAL_HOSTS | set(EndpointPool.parse(os.getenv('VLLM_LOCAL_HOSTS', '')))
+        self.remote_endpoints = {
+            endpoint for endpoint in self.pool.endpoints if urlparse(endpoint).hostname not in local_hosts
+        }
+        self.inline_cache_entries = int(os.getenv('VLLM_INLINE_AUDIO_CACHE_ENTRIES', '4'))
+        self._inline_parts: "OrderedDict[str, Dict]" = OrderedDict()  # file URL -> data URL part
+
+        # Admission control sized to vLLM capacity (--max-num-seqs per replica,
+        # shared by the uvicorn workers)
+        self.scheduler = RequestScheduler(
+            metrics_source=self.get_metrics, replicas=len(self.pool), workers=workers
+        )
+
+        logger.info(f"VLLMClient initialized with endpoints: {', '.join(self.pool.endpoints)}")
 
     async def _get_session(self):
         """Get or create aiohttp session"""
@@ -27,24 +62,106 @@ class VLLMClient:
 
     async def close(self):
         """Close aiohttp session"""
+        await self.scheduler.close()
         if self.session and not self.session.closed:
             await self.session.close()
 
-    async def transcribe_audio(self, audio_path: str) -> str:
+    async def probe(self, endpoint: str, connections: int = 1) -> float:
+        """
+        GET /health on one replica with `connections` parallel requests
+
+        The connections stay in the session's keep-alive pool, so the first
+        real requests skip TCP setup. Returns the elapsed seconds.
+        """
+        session = await self._get_session()
+        started = time.perf_counter()
+
+        async def check():
+            async with session.get(f"{endpoint}/health", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status != 200:
+                    raise UpstreamError(f"vLLM health check failed: {response.status}", response.status)
+                await response.read()
+
+        await asyncio.gather(*(check() for _ in range(connections)))
+        return time.perf_counter() - started
+
+    async def get_metrics(self) -> Dict[str, float]:
+        """
+        Read scheduler-relevant gauges from every replica's /metrics
+
+        Request counts are summed across replicas; kv_cache_usage (0-1) is
+        the highest replica's value. Unreachable replicas are skipped.
+        """
+        metrics = {"num_requests_running": 0.0, "num_requests_waiting": 0.0, "kv_cache_usage": 0.0}
+        for endpoint in self.pool.endpoints:
+            try:
+                replica = await self._fetch_metrics(endpoint)
+            except Exception as e:
+                logger.warning(f"Could not read metrics from {endpoint}: {e}")
+                continue
+            metrics["num_requests_running"] += replica.get("num_requests_running", 0.0)
+            metrics["num_requests_waiting"] += replica.get("num_requests_waiting", 0.0)
+            metrics["kv_cache_usage"] = max(metrics["kv_cache_usage"], replica.get("kv_cache_usage", 0.0))
+        return metrics
+
+    async def _fetch_metrics(self, endpoint: str) -> Dict[str, float]:
+        """Parse one replica's Prometheus gauges, summed over label sets"""
+        session = await self._get_session()
+        async with session.get(
+            f"{endpoint}/metrics",
+            timeout=aiohttp.ClientTimeout(total=5)
+        ) as response:
+            if response.status != 200:
+                raise Exception(f"vLLM metrics error: {response.status}")
+            text = await response.text()
+
+        gauges = {
+            "vllm:num_requests_running": "num_requests_running",
+            "vllm:num_requests_waiting": "num_requests_waiting",
+            "vllm:gpu_cache_usage_perc": "kv_cache_usage",  # vLLM v0
+            "vllm:kv_cache_usage_perc": "kv_cache_usage"    # vLLM v1
+        }
+        metrics = {}
+        for line in text.splitlines():
+            if not line or line.startswith("#"):
+                continue
+            name = line.split("{", 1)[0].split(" ", 1)[0]
+            key = gauges.get(name)
+            if key is None:
+                continue
+            try:
+                metrics[key] = metrics.get(key, 0.0) + float(line.rsplit(" ", 1)[1])
+            except ValueError:
+                continue
+        return metrics
+
+    async def transcribe_audio(
+        self,
+        audio: bytes,
+        mime_type: str = "audio/webm",
+        session_id: str = None,
+        kind: str = "asr"
+    ) -> str:
         """
         Transcribe audio using vLLM chat completions with ASR prompt
 
-        Uses the validated Phase 0 approach: vLLM prompting for transcription
+        Uses the validated Phase 0 approach: vLLM prompting for transcription.
+        The audio is sent inline as a base64 data URL, so no temp file is needed.
+        kind is the scheduler priority ("batch" for offline lecture segments).
         """
         try:
-            logger.info(f"Transcribing audio: {audio_path}")
+            logger.info(f"Transcribing audio: {len(audio)} bytes ({mime_type})")
 
             session = await self._get_session()
 
+            audio_url = f"data:{mime_type};base64,{base64.b64encode(audio).decode('ascii')}"
+
             # Construct chat completions request with audio
             # Using the Phase 0 validated approach
-            async with session.post(
-                f"{self.endpoint}/v1/chat/completions",
+            async with self.scheduler.slot(kind, session_id), \
+                    self.pool.endpoint() as endpoint, \
+                    session.post(
+                f"{endpoint}/v1/chat/completions",
                 json={
                     "model": "Qwen/Qwen2.5-Omni-3B",
                     "messages": [
@@ -58,7 +175,7 @@ class VLLMClient:
                                 {
                                     "type": "audio_url",
                                     "audio_url": {
-                                        "url": f"file://{audio_path}"
+                                        "url": audio_url
                                     }
                                 }
                             ]
@@ -71,7 +188,7 @@ class VLLMClient:
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
-                    raise Exception(f"vLLM API error: {response.status} - {error_text}")
+                    raise UpstreamError(f"vLLM API error: {response.status} - {error_text}", response.status)
 
                 result = await response.json()
                 transcript = result["choices"][0]["message"]["content"]
@@ -86,39 +203,35 @@ class VLLMClient:
         self,
         lecture_id: str,
         query: str,
-        history: List[Dict] = None
+        history: List[Dict] = None,
+        context: List[Dict] = None,
+        session_id: str = None
     ) -> str:
         """
         Q&A with lecture context using vLLM
 
         Uses conversation history to maintain context with lecture audio
         Phase 0 validated that audio persists via conversation history
+
+        context is the lecture prefix (see agents/lecture_context.py); it is
+        sent unchanged ahead of the history so vLLM can reuse its KV cache
         """
         try:
             logger.info(f"Processing Q&A for lecture {lecture_id}")
 
             session = await self._get_session()
 
-            # Build messages with conversation history
-            # Audio context is in the first message of the history
-            messages = []
-
-            # Add conversation history (includes lecture audio in first message)
-            if history:
-                messages.extend(history)
-
-            # Add current query
-            messages.append({
-                "role": "user",
-                "content": query
-            })
+            messages = self._build_qa_messages(query, history, context)
 
             # Call vLLM chat completions
-            async with session.post(
-                f"{self.endpoint}/v1/chat/completions",
+            # lecture_id affinity keeps the lecture's cached prefix on one replica
+            async with self.scheduler.slot("qa", session_id), \
+                    self.pool.endpoint(lecture_id) as endpoint, \
+                    session.post(
+                f"{endpoint}/v1/chat/completions",
                 json={
                     "model": "Qwen/Qwen2.5-Omni-3B",
-                    "messages": messages,
+                    "messages": await self._messages_for(endpoint, messages),
                     "temperature": 0.7,
                     "max_tokens": 1024
                 },
@@ -126,7 +239,7 @@ class VLLMClient:
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
-                    raise Exception(f"vLLM API error: {response.status} - {error_text}")
+                    raise UpstreamError(f"vLLM API error: {response.status} - {error_text}", response.status)
 
                 result = await response.json()
                 answer = result["choices"][0]["message"]["content"]
@@ -136,3 +249,226 @@ class VLLMClient:
         except Exception as e:
             logger.error(f"Error in Q&A: {e}", exc_info=True)
             raise
+
+    async def qa_with_context_stream(
+        self,
+        lecture_id: str,
+        query: str,
+        history: List[Dict] = None,
+        context: List[Dict] = None,
+        session_id: str = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Streaming variant of qa_with_context
+
+        Reads the vLLM server-sent events (stream: true) and yields answer
+        text deltas as soon as they are generated. The scheduler slot is held
+        until the stream ends.
+        """
+        try:
+            logger.info(f"Streaming Q&A for lecture {lecture_id}")
+
+            session = await self._get_session()
+
+            messages = self._build_qa_messages(query, history, context)
+
+            # lecture_id affinity keeps the lecture's cached prefix on one replica
+            async with self.scheduler.slot("qa", session_id), \
+                    self.pool.endpoint(lecture_id) as endpoint, \
+                    session.post(
+                f"{endpoint}/v1/chat/completions",
+                json={
+                    "model": "Qwen/Qwen2.5-Omni-3B",
+                    "messages": await self._messages_for(endpoint, messages),
+                    "temperature": 0.7,
+                    "max_tokens": 1024,
+                    "stream": True
+                },
+                timeout=aiohttp.ClientTimeout(total=60)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise UpstreamError(f"vLLM API error: {response.status} - {error_text}", response.status)
+
+                total_chars = 0
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    choices = json.loads(data).get("choices") or []
+                    if not choices:
+                        continue
+
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        total_chars += len(delta)
+                        yield delta
+
+                logger.info(f"Q&A stream completed: {total_chars} chars")
+
+        except Exception as e:
+            logger.error(f"Error in streaming Q&A: {e}", exc_info=True)
+            raise
+
+    async def prime_prefix(self, prefix: List[Dict], lecture_id: str = None):
+        """
+        Prefill a prompt prefix so vLLM automatic prefix caching holds its KV blocks
+
+        Generates a single token; later requests starting with the same
+        messages skip the prefill of the shared part. Pass lecture_id so the
+        prefix is primed on the replica that will serve the lecture's Q&A.
+        """
+        try:
+            logger.info(f"Priming prefix ({len(prefix)} messages)")
+
+            session = await self._get_session()
+
+            async with self.scheduler.slot("prime"), \
+                    self.pool.endpoint(lecture_id) as endpoint, \
+                    session.post(
+                f"{endpoint}/v1/chat/completions",
+                json={
+                    "model": "Qwen/Qwen2.5-Omni-3B",
+                    "messages": await self._messages_for(endpoint, prefix),
+                    "temperature": 0.0,
+                    "max_tokens": 1
+                },
+                timeout=aiohttp.ClientTimeout(total=120)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise UpstreamError(f"vLLM API error: {response.status} - {error_text}", response.status)
+
+                result = await response.json()
+                prompt_tokens = result.get("usage", {}).get("prompt_tokens")
+                logger.info(f"Prefix primed: {prompt_tokens} prompt tokens")
+
+        except Exception as e:
+            logger.error(f"Error priming prefix: {e}", exc_info=True)
+            raise
+
+    async def summarize(self, prompt: str, max_tokens: int = 256, session_id: str = None) -> str:
+        """
+        Single-message completion for conversation summaries
+
+        Runs at "batch" priority, so summaries only use capacity that live
+        queries leave idle (see agents/context_assembler.py).
+        """
+        try:
+            session = await self._get_session()
+
+            async with self.scheduler.slot("batch", session_id), \
+                    self.pool.endpoint() as endpoint, \
+                    session.post(
+                f"{endpoint}/v1/chat/completions",
+                json={
+                    "model": "Qwen/Qwen2.5-Omni-3B",
+                    "messages": [{"role": "user", "content": prompt}],
+                    "temperature": 0.2,
+                    "max_tokens": max_tokens
+                },
+                timeout=aiohttp.ClientTimeout(total=120)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise UpstreamError(f"vLLM API error: {response.status} - {error_text}", response.status)
+
+                result = await response.json()
+                summary = result["choices"][0]["message"]["content"]
+                logger.info(f"Summary completed: {len(summary)} chars")
+                return summary.strip()
+
+        except Exception as e:
+            logger.error(f"Error summarizing: {e}", exc_info=True)
+            raise
+
+    async def _messages_for(self, endpoint: str, messages: List[Dict]) -> List[Dict]:
+        """Messages as the chosen replica can read them (local files inlined only for remote ones)"""
+        if endpoint not in self.remote_endpoints:
+            return messages
+        return await self._inline_local_media(messages)
+
+    async def _inline_local_media(self, messages: List[Dict]) -> List[Dict]:
+        """
+        Copy of messages with file:// audio replaced by base64 data URLs
+
+        Used for replicas on other hosts, once the pool has picked one.
+        Returns messages itself when nothing refers to a local file. Encoded
+        parts are cached per file URL, so a lecture's audio is read and
+        encoded once.
+        """
+        if not any(self._file_parts(message) for message in messages):
+            return messages
+
+        inline = []
+        for message in messages:
+            if not self._file_parts(message):
+                inline.append(message)
+                continue
+            content = []
+            for part in message["content"]:
+                url = part.get("audio_url", {}).get("url", "") if isinstance(part, dict) else ""
+                content.append(await self._inline_part(url) if url.startswith("file://") else part)
+            inline.append({**message, "content": content})
+        return inline
+
+    async def _inline_part(self, url: str) -> Dict:
+        part = self._inline_parts.get(url)
+        if part is None:
+            path = url[len("file://"):]
+            loop = asyncio.get_running_loop()
+            encoded = await loop.run_in_executor(None, self._encode_file, path)
+            mime_type = mimetypes.guess_type(path)[0] or "audio/mpeg"
+            part = {"type": "audio_url", "audio_url": {"url": f"data:{mime_type};base64,{encoded}"}}
+            self._inline_parts[url] = part
+            while len(self._inline_parts) > self.inline_cache_entries:
+                self._inline_parts.popitem(last=False)
+        self._inline_parts.move_to_end(url)
+        return part
+
+    @staticmethod
+    def _encode_file(path: str) -> str:
+        with open(path, 'rb') as f:
+            return base64.b64encode(f.read()).decode('ascii')
+
+    @staticmethod
+    def _file_parts(message: Dict) -> bool:
+        content = message.get("content")
+        return isinstance(content, list) and any(
+            isinstance(part, dict) and part.get("audio_url", {}).get("url", "").startswith("file://")
+            for part in content
+        )
+
+    def _build_qa_messages(
+        self,
+        query: str,
+        history: List[Dict] = None,
+        context: List[Dict] = None
+    ) -> List[Dict]:
+        """
+        Build chat messages for Q&A
+
+        Lecture context prefix first, then conversation history, then the query
+        """
+        messages = []
+
+        # Add lecture context prefix (lecture audio, byte-identical per lecture)
+        if context:
+            messages.extend(context)
+
+        # Add conversation history
+        if history:
+            messages.extend(history)
+
+        # Add current query
+        messages.append({
+            "role": "user",
+            "content": query
+        })
+
+        return messages